@@ -0,0 +1,227 @@
+# Description:  Vectorized batch simulator. Holds the state of N independent single player games as numpy arrays and
+#               advances all of them one turn per step, following the same rules as move_player in game_of_life.py.
+#               Players never interact with each other, so a game with several players is just several of these rows.
+
+import numpy as np
+
+import game_of_life as life
+
+# career codes, 0 is always the unemployed starting career
+CAREERS = [life.UNEMPLOYED] + life.career_list
+CAREER_SALARY = np.array([career.salary for career in CAREERS], dtype=np.int64)
+
+# education codes index into life.education_list (the GED everyone has is not counted)
+EDUCATIONS = list(life.education_list)
+EDUCATION_BONUS = np.array([education.bonus for education in EDUCATIONS], dtype=np.float64)
+EDUCATION_COST = np.array([education.cost for education in EDUCATIONS], dtype=np.int64)
+
+# the furthest a single roll can move a player
+MAX_ROLL = 6
+
+# a compact struct-of-arrays stand in for a list of Player objects, one row per player (or single player game)
+# careers and educations are stored as small integer codes (see CAREERS and EDUCATIONS), the educations column counts
+# how many times each education was taken. Every column is a plain typed numpy array, so analysis code can read
+# them directly, and a slice of the table (table[a:b]) is a view sharing the same memory
+class PlayerTable:
+    # column name -> (dtype, extra dimensions)
+    COLUMNS = {
+        'position': (np.int32, ()),
+        'balance': (np.int64, ()),
+        'career': (np.int8, ()),
+        'salary': (np.int32, ()),
+        'total_bonus': (np.float64, ()),
+        'educations': (np.uint8, (len(EDUCATIONS),)),
+        'married': (np.bool_, ()),
+        'kids': (np.int32, ()),
+        'retired': (np.bool_, ()),
+        'turns': (np.int32, ()),
+    }
+
+    def __init__(self, n_players: int = 0, columns: dict = None):
+        if columns is None:
+            columns = {name: np.zeros((n_players,) + shape, dtype) for name, (dtype, shape) in self.COLUMNS.items()}
+            fresh = life.Player('')
+            columns['balance'][:] = fresh.balance
+            columns['total_bonus'][:] = fresh.total_bonus
+        for name, column in columns.items():
+            setattr(self, name, column)
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    # zero-copy view of some rows (a slice gives a view, an index array a copy, as in numpy)
+    def __getitem__(self, rows) -> 'PlayerTable':
+        return PlayerTable(columns={name: getattr(self, name)[rows] for name in self.COLUMNS})
+
+    # the columns as a dict of arrays, without copying
+    def columns(self) -> dict:
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    # bytes used by the table
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns().values())
+
+    # materializes row i as a Player (named name), for the few rows someone wants to look at
+    def player(self, i: int, name: str = '') -> life.Player:
+        player = life.Player(name)
+        player.position = int(self.position[i])
+        player.balance = int(self.balance[i])
+        player.career = CAREERS[self.career[i]]
+        player.total_bonus = float(self.total_bonus[i])
+        for code, count in enumerate(self.educations[i]):
+            player.education += [EDUCATIONS[code]] * int(count)
+        player.married = bool(self.married[i])
+        player.kids = int(self.kids[i])
+        player.retired = bool(self.retired[i])
+        player.initialized = True
+        return player
+
+    # the opposite of player(), copies Player objects into a new table
+    @classmethod
+    def from_players(cls, players: list) -> 'PlayerTable':
+        table = cls(len(players))
+        for i, player in enumerate(players):
+            table.position[i] = player.position
+            table.balance[i] = player.balance
+            table.career[i] = CAREERS.index(player.career)
+            table.salary[i] = player.career.salary
+            table.total_bonus[i] = player.total_bonus
+            for education in player.education:
+                if education in EDUCATIONS:
+                    table.educations[i, EDUCATIONS.index(education)] += 1
+            table.married[i] = player.married
+            table.kids[i] = player.kids
+            table.retired[i] = player.retired
+        return table
+
+# turns whatever a policy answered (a bool or a bool array) into one answer per game
+def _answers(answer, count: int) -> np.ndarray:
+    return np.broadcast_to(np.asarray(answer, dtype=bool), (count,))
+
+# equivalent of draw_career_card for the games in idx
+def _career_card(state: PlayerTable, idx: np.ndarray, policy: life.Policy, rng: np.random.Generator, choice_to_pick: bool) -> None:
+    drawn = rng.integers(1, len(CAREERS), size=len(idx)).astype(np.int8)
+    if choice_to_pick:
+        # only a different career can be switched to
+        differs = drawn != state.career[idx]
+        idx, drawn = idx[differs], drawn[differs]
+        take = _answers(policy.batch_switch_career(state, idx, CAREER_SALARY[drawn]), len(idx))
+        idx, drawn = idx[take], drawn[take]
+    state.career[idx] = drawn
+    state.salary[idx] = CAREER_SALARY[drawn]
+
+# equivalent of draw_college_card for the games in idx
+def _college_card(state: PlayerTable, idx: np.ndarray, policy: life.Policy, rng: np.random.Generator, choice_to_pick: bool) -> None:
+    drawn = rng.integers(0, len(EDUCATIONS), size=len(idx))
+    if choice_to_pick:
+        take = _answers(policy.batch_pursue_education(state, idx, EDUCATION_COST[drawn]), len(idx))
+        idx, drawn = idx[take], drawn[take]
+        state.balance[idx] -= EDUCATION_COST[drawn]
+    # a game appears at most once in idx, so plain fancy indexing is safe here
+    state.educations[idx, drawn] += 1
+    state.total_bonus[idx] += EDUCATION_BONUS[drawn]
+
+# pay squares, only employed players get paid
+def _pay(state: PlayerTable, idx: np.ndarray, policy: life.Policy, rng: np.random.Generator) -> None:
+    idx = idx[state.career[idx] != 0]
+    state.balance[idx] += (state.salary[idx] * state.total_bonus[idx]).astype(np.int64)
+
+# career change squares, unemployed players take the card without a choice
+def _career_change(state: PlayerTable, idx: np.ndarray, policy: life.Policy, rng: np.random.Generator) -> None:
+    unemployed = state.career[idx] == 0
+    _career_card(state, idx[~unemployed], policy, rng, True)
+    _career_card(state, idx[unemployed], policy, rng, False)
+
+def _education_chance(state: PlayerTable, idx: np.ndarray, policy: life.Policy, rng: np.random.Generator) -> None:
+    _college_card(state, idx, policy, rng, True)
+
+# equivalent of handle_relationship
+def _relationship(state: PlayerTable, idx: np.ndarray, policy: life.Policy, rng: np.random.Generator) -> None:
+    idx = idx[~state.married[idx]]
+    idx = idx[_answers(policy.batch_attempt_marriage(state, idx), len(idx))]
+    state.married[idx] = rng.integers(0, 2, size=len(idx), dtype=np.int8).astype(bool)
+
+# equivalent of handle_children
+def _children(state: PlayerTable, idx: np.ndarray, policy: life.Policy, rng: np.random.Generator) -> None:
+    idx = idx[state.married[idx]]
+    idx = idx[_answers(policy.batch_attempt_children(state, idx), len(idx))]
+    state.kids[idx] += rng.integers(life.MIN_KIDS, life.MAX_KIDS + 1, size=len(idx), dtype=np.int16)
+
+# what each event does to a batch of games, the pay square handler is applied like any other event here
+BATCH_HANDLERS = {
+    life.PAY_SQUARE: _pay,
+    life.CAREER_CHANGE: _career_change,
+    life.EDUCATION_CHANCE: _education_chance,
+    life.RELATIONSHIP: _relationship,
+    life.CHILDREN: _children,
+}
+
+# the (bit, handler) pairs of a compiled board in the order move_player resolves them, made once per board
+_board_handlers = {}
+
+def board_handlers(board: life.CompiledBoard) -> list[tuple]:
+    if board not in _board_handlers:
+        handlers = [(board.bits[board.pay_event], BATCH_HANDLERS[board.pay_event])] if board.pay_event in board.bits else []
+        handlers += [(board.bits[event], BATCH_HANDLERS[event]) for event in board.events if event is not board.pay_event]
+        _board_handlers[board] = handlers
+    return _board_handlers[board]
+
+# a policy whose batch_* methods don't make its choices would be played as the default policy, so it's refused
+def require_batched(policy: life.Policy) -> None:
+    if not policy.batched:
+        raise ValueError(f"{type(policy).__name__} can't be played by the batch engine, it only decides for a Player")
+
+# equivalent of start_player for every game in the batch
+def start_batch(state: PlayerTable, policy: life.Policy, rng: np.random.Generator) -> None:
+    require_batched(policy)
+    idx = np.arange(len(state))
+    career_path = _answers(policy.batch_starting_path(state, idx), len(idx))
+    _career_card(state, idx[career_path], policy, rng, False)
+    _college_card(state, idx[~career_path], policy, rng, False)
+
+# moves every game that hasn't retired yet by one roll and resolves the squares passed on the way
+def step_batch(state: PlayerTable, policy: life.Policy, rng: np.random.Generator, board: life.CompiledBoard = life.BOARD) -> int:
+    require_batched(policy)
+    idx = np.flatnonzero(~state.retired)
+    if len(idx) == 0:
+        return 0
+    handlers = board_handlers(board)
+
+    start = state.position[idx]
+    target = start + rng.integers(1, MAX_ROLL + 1, size=len(idx), dtype=np.int16)
+    finished = target >= board.length
+    end = np.where(finished, board.length, target).astype(np.int32)
+    state.position[idx] = end
+    state.retired[idx[finished]] = True
+    state.turns[idx] += 1
+
+    # walk the passed squares one step at a time so events resolve in board order, as in move_player
+    for offset in range(1, MAX_ROLL + 1):
+        square = start + offset
+        passing = square <= end
+        if not passing.any():
+            break
+        # the event bits come from the board's sparse event index, looked up for the whole batch at once
+        events = board.masks_at(square[passing])
+        on_event = events != 0
+        if not on_event.any():
+            continue
+        games, events = idx[passing][on_event], events[on_event]
+        for bit, handler in handlers:
+            hit = (events & bit) != 0
+            if hit.any():
+                handler(state, games[hit], policy, rng)
+    return len(idx)
+
+# plays n_games complete games, chunk_size games at a time to keep the arrays cache friendly
+def simulate_batch(n_games: int, policy: life.Policy = None, rng=None, chunk_size: int = 1 << 18, board: life.CompiledBoard = life.BOARD) -> PlayerTable:
+    policy = policy if policy is not None else life.Policy()
+    rng = np.random.default_rng(rng)
+    results = PlayerTable(n_games)
+    for first in range(0, n_games, chunk_size):
+        # each chunk is played in place, on a view of its rows
+        state = results[first:first + chunk_size]
+        start_batch(state, policy, rng)
+        while step_batch(state, policy, rng, board):
+            pass
+    return results
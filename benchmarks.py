@@ -0,0 +1,166 @@
+# Description:  Benchmark suite. Times the hot paths with fixed seeds (no network, no input): one turn through move_player,
+#               whole games through the headless engine, print_board, map redraws, and batch throughput at several sizes.
+#               Results are written as JSON, and can be compared against a stored baseline so a slower hot path fails.
+#
+#               python benchmarks.py --out bench.json
+#               python benchmarks.py --baseline bench.json --tolerance 0.2
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+
+import game_of_life as life
+
+# fixed seed so every run does the same work
+SEED = 1234
+
+# runs fn (which does `ops` operations) `repeat` times and returns the best rate in operations per second
+def measure(fn, ops: int, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return ops / best
+
+# one move_player call (Player.move plus resolving the squares passed) from every position on the board
+def bench_turn(scale: int) -> dict:
+    engine = life.Engine(rng=random.Random(SEED))
+    player = life.Player('bench')
+    life.start_player(player, engine)
+    moves = 2000 * scale
+
+    def run() -> None:
+        for turn in range(moves):
+            player.position = turn % life.END_OF_GAME
+            player.retired = False
+            life.move_player(player, engine)
+
+    return {'unit': 'turns/s', 'rate': measure(run, moves, 5)}
+
+# whole games through simulate_game with a given number of players
+def bench_game(scale: int, players: int) -> dict:
+    rng = random.Random(SEED)
+    names = [f'p{number}' for number in range(players)]
+    games = 200 * scale
+
+    def run() -> None:
+        for _ in range(games):
+            life.simulate_game(names, rng=rng)
+
+    return {'unit': 'games/s', 'rate': measure(run, games, 5)}
+
+# print_board with its output thrown away, four players on the map
+def bench_print_board(scale: int) -> dict:
+    players = _map_players()
+    renders = 500 * scale
+
+    def run() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(renders):
+                life.print_board(players[0], players)
+
+    return {'unit': 'renders/s', 'rate': measure(run, renders, 5)}
+
+# ANSI delta redraws of a map where one player moves each frame
+def bench_board_delta(scale: int) -> dict:
+    players = _map_players()
+    frames = 5000 * scale
+
+    def run() -> None:
+        view = life.BoardView()
+        for frame in range(frames):
+            players[frame % len(players)].position = frame % (life.END_OF_GAME + 1)
+            view.redraw(players)
+
+    return {'unit': 'frames/s', 'rate': measure(run, frames, 5)}
+
+def _map_players() -> list[life.Player]:
+    players = []
+    for number, position in enumerate([0, 5, 18, 30]):
+        player = life.Player(f'p{number}')
+        player.character = 'ABCD'[number]
+        player.position = position
+        players.append(player)
+    return players
+
+# the numpy batch engine at a given batch size
+def bench_batch(scale: int, batch_size: int) -> dict:
+    import batch_engine
+    batches = max(1, scale * 200000 // batch_size)
+
+    def run() -> None:
+        for batch in range(batches):
+            batch_engine.simulate_batch(batch_size, rng=SEED + batch)
+
+    return {'unit': 'games/s', 'rate': measure(run, batches * batch_size, 3)}
+
+# every benchmark by name
+def benchmarks(scale: int) -> dict:
+    return {
+        'turn': lambda: bench_turn(scale),
+        'game_1_player': lambda: bench_game(scale, 1),
+        'game_4_players': lambda: bench_game(scale, 4),
+        'game_16_players': lambda: bench_game(scale, 16),
+        'print_board': lambda: bench_print_board(scale),
+        'board_delta': lambda: bench_board_delta(scale),
+        'batch_1k': lambda: bench_batch(scale, 1000),
+        'batch_64k': lambda: bench_batch(scale, 1 << 16),
+        'batch_1m': lambda: bench_batch(scale, 1 << 20),
+    }
+
+# runs the selected benchmarks (all of them by default)
+def run_benchmarks(names: list[str] = None, scale: int = 1) -> dict:
+    available = benchmarks(scale)
+    results = {}
+    for name in names or available:
+        results[name] = available[name]()
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'scale': scale,
+        'results': results,
+    }
+
+# the benchmarks that got slower than the baseline by more than tolerance (0.2 = 20% fewer operations per second)
+def regressions(current: dict, baseline: dict, tolerance: float) -> dict:
+    slower = {}
+    for name, result in current['results'].items():
+        if name in baseline['results']:
+            ratio = result['rate'] / baseline['results'][name]['rate']
+            if ratio < 1.0 - tolerance:
+                slower[name] = ratio
+    return slower
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the game engine's hot paths")
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default: all)')
+    parser.add_argument('--out', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results stored by an earlier --out')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown against the baseline (default 0.2)')
+    parser.add_argument('--scale', type=int, default=1, help='multiplies the work done by each benchmark')
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.names, args.scale)
+    for name, result in current['results'].items():
+        print(f"{name:<18} {result['rate']:>14,.0f} {result['unit']}")
+    if args.out:
+        with open(args.out, 'w') as out:
+            json.dump(current, out, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            slower = regressions(current, json.load(baseline), args.tolerance)
+        for name, ratio in slower.items():
+            print(f"REGRESSION {name}: {ratio:.0%} of the baseline rate")
+        if slower:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
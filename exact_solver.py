@@ -0,0 +1,342 @@
+# Description:  Exact solver. The game is a finite Markov chain, so instead of sampling games this pushes probability mass
+#               through every reachable player state, square by square, for a fixed decision policy. The same rules as
+#               move_player in game_of_life.py are applied, but every random draw branches into all of its outcomes.
+
+import hashlib
+import os
+import pickle
+from fractions import Fraction
+
+import game_of_life as life
+
+# a player state is a tuple (position, career, educations, total_bonus, married, kids, balance)
+# where educations is a tuple of the Education cards taken, in order
+POSITION, CAREER, EDUCATIONS, TOTAL_BONUS, MARRIED, KIDS, BALANCE = range(7)
+
+# the faces of the die roll_die uses
+DIE_FACES = range(1, 7)
+
+# the state every player has before choosing their starting path
+def initial_state() -> tuple:
+    player = life.Player('')
+    return (0, player.career, (), player.total_bonus, player.married, player.kids, player.balance)
+
+# a throwaway Player with the fields of a state, so policies can be asked about it
+def as_player(state: tuple) -> life.Player:
+    player = life.Player('')
+    player.position = state[POSITION]
+    player.career = state[CAREER]
+    player.education = [life.GED, *state[EDUCATIONS]]
+    player.total_bonus = state[TOTAL_BONUS]
+    player.married = state[MARRIED]
+    player.kids = state[KIDS]
+    player.balance = state[BALANCE]
+    player.initialized = True
+    return player
+
+# the state after taking an education card (cost is 0 for the starting college card)
+def _with_education(state: tuple, drawn_college: life.Education, cost: int) -> tuple:
+    return state[:EDUCATIONS] + (
+        state[EDUCATIONS] + (drawn_college,),
+        state[TOTAL_BONUS] + drawn_college.bonus,
+    ) + state[MARRIED:BALANCE] + (state[BALANCE] - cost,)
+
+def _with_career(state: tuple, career: life.Career) -> tuple:
+    return state[:CAREER] + (career,) + state[CAREER + 1:]
+
+# every way a start_player can go, as (state, probability) pairs
+def start_outcomes(state: tuple, policy: life.Policy, one=1.0) -> list[tuple]:
+    if policy.starting_path(as_player(state)) == life.CAREER:
+        share = one / len(life.career_list)
+        return [(_with_career(state, career), share) for career in life.career_list]
+    share = one / len(life.education_list)
+    return [(_with_education(state, college, 0), share) for college in life.education_list]
+
+# every way the events of one square can go for a state, as (state, probability) pairs
+def event_outcomes(state: tuple, event: life.Event, policy: life.Policy, one=1.0) -> list[tuple]:
+    if event is life.CAREER_CHANGE:
+        share = one / len(life.career_list)
+        outcomes = []
+        for drawn_career in life.career_list:
+            # unemployed players take the card, employed ones are asked if it is a different career
+            if state[CAREER] == life.UNEMPLOYED or (
+                drawn_career != state[CAREER] and policy.switch_career(as_player(state), drawn_career)
+            ):
+                outcomes.append((_with_career(state, drawn_career), share))
+            else:
+                outcomes.append((state, share))
+        return outcomes
+
+    if event is life.EDUCATION_CHANCE:
+        share = one / len(life.education_list)
+        outcomes = []
+        for drawn_college in life.education_list:
+            if policy.pursue_education(as_player(state), drawn_college):
+                outcomes.append((_with_education(state, drawn_college, drawn_college.cost), share))
+            else:
+                outcomes.append((state, share))
+        return outcomes
+
+    if event is life.RELATIONSHIP:
+        if state[MARRIED] or not policy.attempt_marriage(as_player(state)):
+            return [(state, one)]
+        married = state[:MARRIED] + (True,) + state[MARRIED + 1:]
+        return [(married, one / 2), (state, one / 2)]
+
+    if event is life.CHILDREN:
+        if not state[MARRIED] or not policy.attempt_children(as_player(state)):
+            return [(state, one)]
+        share = one / (life.MAX_KIDS - life.MIN_KIDS + 1)
+        return [
+            (state[:KIDS] + (state[KIDS] + kids,) + state[KIDS + 1:], share)
+            for kids in range(life.MIN_KIDS, life.MAX_KIDS + 1)
+        ]
+
+    raise ValueError(f"no exact rule for the {event.name} event")
+
+# the state after cashing count paychecks
+def _paid(state: tuple, count: int) -> tuple:
+    if count == 0 or state[CAREER] == life.UNEMPLOYED:
+        return state
+    amount = int(state[CAREER].salary * state[TOTAL_BONUS]) * count
+    return state[:BALANCE] + (state[BALANCE] + amount,)
+
+# every way a move from state to end_position can go, squares resolved in the same order as move_player
+def move_outcomes(state: tuple, end_position: int, policy: life.Policy, board: life.CompiledBoard, one=1.0) -> dict:
+    start_position = state[POSITION]
+    branches = {state[:POSITION] + (end_position,) + state[POSITION + 1:]: one}
+    paid = board.paychecks_through(start_position)
+    for index in range(board.decisions_through(start_position), board.decisions_through(end_position)):
+        count = board.decision_paychecks[index] - paid
+        paid = board.decision_paychecks[index]
+        branches = _merged((_paid(branch, count), mass) for branch, mass in branches.items())
+        for event in board.decision_events[index]:
+            step = {}
+            for branch, mass in branches.items():
+                for outcome, share in event_outcomes(branch, event, policy, one):
+                    step[outcome] = step.get(outcome, 0) + mass * share
+            branches = step
+    count = board.paychecks_through(end_position) - paid
+    return _merged((_paid(branch, count), mass) for branch, mass in branches.items())
+
+# adds up the mass of identical states
+def _merged(pairs) -> dict:
+    merged = {}
+    for state, mass in pairs:
+        merged[state] = merged.get(state, 0) + mass
+    return merged
+
+# what exact_distribution returns, every distribution is a dict of value -> probability
+class ExactResult:
+    def __init__(self, board: life.CompiledBoard):
+        self.final_states = {}
+        self.balance = {}
+        self.kids = {}
+        self.careers = {}
+        self.married = 0
+        # probability of a player's move ending on each square, and of passing over it (landing included)
+        self.landing = [0] * (board.length + 1)
+        self.passing = [0] * (board.length + 1)
+
+    # expected final balance
+    def mean_balance(self):
+        return sum(balance * mass for balance, mass in self.balance.items())
+
+# the exact outcome distribution of one player using policy (exact=True gives Fraction probabilities)
+def exact_distribution(policy: life.Policy = None, board: life.CompiledBoard = None, exact: bool = False) -> ExactResult:
+    policy = policy if policy is not None else life.Policy()
+    board = board if board is not None else life.BOARD
+    one = Fraction(1) if exact else 1.0
+    result = ExactResult(board)
+
+    # states waiting at each square, every move goes forward so one pass over the squares is enough
+    waiting = [{} for _ in range(board.length + 1)]
+    waiting[0] = _merged(start_outcomes(initial_state(), policy, one))
+    for position in range(board.length):
+        for state, mass in waiting[position].items():
+            for face in DIE_FACES:
+                end_position = min(position + face, board.length)
+                roll_mass = mass / len(DIE_FACES)
+                result.landing[end_position] += roll_mass
+                for square in range(position + 1, end_position + 1):
+                    result.passing[square] += roll_mass
+                bucket = waiting[end_position]
+                for outcome, share in move_outcomes(state, end_position, policy, board, one).items():
+                    bucket[outcome] = bucket.get(outcome, 0) + roll_mass * share
+        # states behind the last player can be dropped as we go
+        waiting[position] = None
+
+    result.final_states = waiting[board.length]
+    for state, mass in result.final_states.items():
+        result.balance[state[BALANCE]] = result.balance.get(state[BALANCE], 0) + mass
+        result.kids[state[KIDS]] = result.kids.get(state[KIDS], 0) + mass
+        result.careers[state[CAREER].name] = result.careers.get(state[CAREER].name, 0) + mass
+        if state[MARRIED]:
+            result.married += mass
+    return result
+
+# the value table is keyed on the canonical part of a state, the fields that can still change the final balance:
+# career, total_bonus and married (nothing in the rules reads the balance or the kids, and the balance only adds up,
+# so the value of a state is its balance plus the expected gain stored for its canonical key)
+def canonical(state: tuple) -> tuple:
+    return (state[CAREER].name, state[TOTAL_BONUS], state[MARRIED])
+
+# hashes of the rules a value depends on, suffix[p] covers everything that can happen after square p
+# (a state at rest on p only ever passes the squares after it), so changing a square only invalidates the states before it
+def rule_fingerprints(board: life.CompiledBoard) -> list[str]:
+    rules = repr((
+        [(career.name, career.salary) for career in [life.UNEMPLOYED] + life.career_list],
+        [(college.name, college.bonus, college.cost) for college in life.education_list],
+        life.MIN_KIDS, life.MAX_KIDS, list(DIE_FACES), board.length,
+    ))
+    suffix = [''] * (board.length + 1)
+    suffix[board.length] = hashlib.sha1(rules.encode()).hexdigest()
+    for position in range(board.length - 1, -1, -1):
+        square = [event.name for event in board.events if board.mask_at(position + 1) & board.bits[event]]
+        suffix[position] = hashlib.sha1(repr((suffix[position + 1], square)).encode()).hexdigest()
+    return suffix
+
+# backward induction from the end of the game, choosing at every decision whatever maximizes the expected final balance
+# the value table (and the value of every choice seen) can be kept in a file between runs, see save()
+class OptimalSolver:
+    def __init__(self, board: life.CompiledBoard = None, cache_path: str = None):
+        self.board = board if board is not None else life.BOARD
+        self.cache_path = cache_path
+        self.fingerprints = rule_fingerprints(self.board)
+        # (fingerprint, position, canonical state) -> expected gain from resting there until the end
+        self.values = {}
+        # (fingerprint, square, event name, canonical state, drawn card name) -> {choice: expected gain of that choice}
+        self.choices = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, 'rb') as cache:
+                saved = pickle.load(cache)
+            self.values, self.choices = saved['values'], saved['choices']
+        # how many rest states this solver had to work out, and how many came from the table
+        self.computed = 0
+        self.reused = 0
+
+    # writes the value table to cache_path (or path)
+    def save(self, path: str = None) -> None:
+        path = path or self.cache_path
+        with open(path, 'wb') as cache:
+            pickle.dump({'values': self.values, 'choices': self.choices}, cache, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # expected final balance of a state resting on its position, playing optimally from there
+    def value(self, state: tuple) -> float:
+        position = state[POSITION]
+        if position == self.board.length:
+            return state[BALANCE]
+        key = (self.fingerprints[position], position, canonical(state))
+        if key in self.values:
+            self.reused += 1
+        else:
+            self.computed += 1
+            # solve it as if the state had no money, which is what makes it shareable
+            base = state[:BALANCE] + (0,)
+            total = 0.0
+            for face in DIE_FACES:
+                end_position = min(position + face, self.board.length)
+                total += self._resolve(base, end_position, self.board.decisions_through(position), position, 0)
+            self.values[key] = total / len(DIE_FACES)
+        return state[BALANCE] + self.values[key]
+
+    # expected final balance of the best starting path, and the start decision is recorded like the others
+    def solve(self) -> float:
+        state = initial_state()
+        values = {}
+        for path in (life.CAREER, life.EDUCATION):
+            fixed = FixedStart(path)
+            values[path] = sum(share * self.value(outcome) for outcome, share in start_outcomes(state, fixed))
+        self._record(0, 'Start', state, None, values)
+        return max(values.values())
+
+    # the choices recorded for the current rules, as {(square, event name, canonical state, card name): {choice: gain}}
+    def decisions(self) -> dict:
+        return {
+            key[1:]: values for key, values in self.choices.items()
+            if key[0] == self.fingerprints[max(key[1] - 1, 0)]
+        }
+
+    # the best choice for a recorded decision
+    def best_choice(self, square: int, event_name: str, state: tuple, card_name: str = None):
+        values = self.decisions()[(square, event_name, canonical(state), card_name)]
+        return max(values, key=values.get)
+
+    def _record(self, square: int, event_name: str, state: tuple, card_name, values: dict) -> None:
+        # a choice on square s only depends on square s and what comes after it
+        fingerprint = self.fingerprints[max(square - 1, 0)]
+        gains = {choice: value - state[BALANCE] for choice, value in values.items()}
+        self.choices[(fingerprint, square, event_name, canonical(state), card_name)] = gains
+
+    # expected final balance of a move in progress: the decision squares from index on are still to be resolved,
+    # starting with event number event_index on the current one
+    def _resolve(self, state: tuple, end_position: int, index: int, paid_up_to: int, event_index: int) -> float:
+        board = self.board
+        if index == board.decisions_through(end_position):
+            state = _paid(state, board.paychecks_through(end_position) - board.paychecks_through(paid_up_to))
+            return self.value(state[:POSITION] + (end_position,) + state[POSITION + 1:])
+
+        square = board.decision_squares[index]
+        state = _paid(state, board.decision_paychecks[index] - board.paychecks_through(paid_up_to))
+        events = board.decision_events[index]
+        if event_index == len(events):
+            return self._resolve(state, end_position, index + 1, square, 0)
+        event = events[event_index]
+
+        # what the rest of the move is worth once this event is settled
+        def rest(after: tuple) -> float:
+            return self._resolve(after, end_position, index, square, event_index + 1)
+
+        if event is life.CAREER_CHANGE:
+            total = 0.0
+            for drawn_career in life.career_list:
+                if state[CAREER] == life.UNEMPLOYED or drawn_career == state[CAREER]:
+                    total += rest(_with_career(state, drawn_career))
+                else:
+                    values = {'switch': rest(_with_career(state, drawn_career)), 'keep': rest(state)}
+                    self._record(square, event.name, state, drawn_career.name, values)
+                    total += max(values.values())
+            return total / len(life.career_list)
+
+        if event is life.EDUCATION_CHANCE:
+            total = 0.0
+            for drawn_college in life.education_list:
+                values = {'study': rest(_with_education(state, drawn_college, drawn_college.cost)), 'skip': rest(state)}
+                self._record(square, event.name, state, drawn_college.name, values)
+                total += max(values.values())
+            return total / len(life.education_list)
+
+        if event is life.RELATIONSHIP:
+            if state[MARRIED]:
+                return rest(state)
+            married = state[:MARRIED] + (True,) + state[MARRIED + 1:]
+            values = {'try': (rest(married) + rest(state)) / 2, 'pass': rest(state)}
+            self._record(square, event.name, state, None, values)
+            return max(values.values())
+
+        if event is life.CHILDREN:
+            if not state[MARRIED]:
+                return rest(state)
+            outcomes = range(life.MIN_KIDS, life.MAX_KIDS + 1)
+            tried = sum(rest(state[:KIDS] + (state[KIDS] + kids,) + state[KIDS + 1:]) for kids in outcomes)
+            values = {'try': tried / len(outcomes), 'pass': rest(state)}
+            self._record(square, event.name, state, None, values)
+            return max(values.values())
+
+        raise ValueError(f"no exact rule for the {event.name} event")
+
+# a policy that only knows which path to start on, used to value each starting path
+class FixedStart(life.Policy):
+    def __init__(self, path: str):
+        self.path = path
+
+    def starting_path(self, player: life.Player) -> str:
+        return self.path
+
+# solves the game for the best expected final balance, reusing (and updating) the value table in cache_path if given
+def solve_optimal(board: life.CompiledBoard = None, cache_path: str = None) -> OptimalSolver:
+    solver = OptimalSolver(board, cache_path)
+    solver.expected_balance = solver.solve()
+    if cache_path is not None:
+        solver.save()
+    return solver
@@ -0,0 +1,469 @@
+# Description:  Event-sourced game logs. A LoggedEngine plays a game like any other engine, and also records every
+#               draw (rolls and cards), decision, square hit and change to a player's fields. Each one becomes a
+#               fixed 12 byte record. The state at any record is rebuilt by summing and selecting over those records
+#               with numpy, without running any of the game logic. Logs are appended to an archive file with a
+#               fixed-record (game_id, offset, size) index, so any game can be read back on its own.
+#
+#               python game_log.py record games.log --games 10000 --seed 1
+#               python game_log.py show games.log 42 --turn 5
+#               python game_log.py verify games.log
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+import game_of_life as life
+
+# one record: kind, player (index in the game's player list), field, value
+RECORD = np.dtype([('kind', 'u1'), ('player', '<u2'), ('field', 'u1'), ('value', '<i8')])
+_RECORD = struct.Struct('<BHBq')
+
+# record kinds
+DRAW, DECISION, EVENT, CHANGE = 0, 1, 2, 3
+
+# DRAW fields are the GameRng stream numbers, the value is the roll, the index of the card in its list,
+# 1/0 for the marriage coin, or the number of kids
+ROLL, CAREER_CARD, COLLEGE_CARD, COIN, KIDS = range(5)
+
+# DECISION fields, the value is 1 for yes (for the starting path, 1 is the CAREER path)
+STARTING_PATH, SWITCH_CAREER, PURSUE_EDUCATION, ATTEMPT_MARRIAGE, ATTEMPT_CHILDREN = range(5)
+
+# EVENT records have the event's bit number on the board as the field and the square as the value
+
+# CHANGE fields, the first three hold the change in the value, the rest hold the new value
+# (careers and educations as their index in SNAPSHOT_CAREERS / SNAPSHOT_EDUCATIONS, total_bonus as the bits of the double)
+POSITION, BALANCE, KIDS_HAD, CAREER, TOTAL_BONUS, MARRIED, RETIRED, INITIALIZED, EDUCATION = range(9)
+DELTA_FIELDS = {POSITION: 'position', BALANCE: 'balance', KIDS_HAD: 'kids'}
+FLAG_FIELDS = {MARRIED: 'married', RETIRED: 'retired', INITIALIZED: 'initialized'}
+
+def _double_bits(value: float) -> int:
+    return struct.unpack('<q', struct.pack('<d', value))[0]
+
+# the fields of a player a log follows, in the order they are compared
+def _fields(player: life.Player) -> tuple:
+    return (player.position, player.balance, player.kids, player.career, player.total_bonus,
+            player.married, player.retired, player.initialized, len(player.education))
+
+# the rng of a LoggedEngine, records every draw for whichever player is acting
+class _RecordingRng:
+    def __init__(self, log: 'GameLog', rng):
+        self.log = log
+        self.rng = rng
+
+    def roll(self, low: int, high: int) -> int:
+        # a roll starts a move, so whatever is left of the mover's last move is written out first
+        self.log.flush(self.log.active)
+        rolled = self.rng.roll(low, high)
+        self.log.record(DRAW, self.log.active, ROLL, rolled)
+        return rolled
+
+    def career_card(self, cards: list) -> life.Career:
+        card = self.rng.career_card(cards)
+        self.log.record(DRAW, self.log.active, CAREER_CARD, cards.index(card))
+        return card
+
+    def college_card(self, cards: list) -> life.Education:
+        card = self.rng.college_card(cards)
+        self.log.record(DRAW, self.log.active, COLLEGE_CARD, cards.index(card))
+        return card
+
+    def coin(self) -> bool:
+        outcome = self.rng.coin()
+        self.log.record(DRAW, self.log.active, COIN, int(outcome))
+        return outcome
+
+    def kids(self, low: int, high: int) -> int:
+        outcome = self.rng.kids(low, high)
+        self.log.record(DRAW, self.log.active, KIDS, outcome)
+        return outcome
+
+# the policy of a LoggedEngine, records every answer of the policy it wraps
+class _RecordingPolicy(life.Policy):
+    def __init__(self, log: 'GameLog', policy: life.Policy):
+        self.log = log
+        self.policy = policy
+
+    def _answer(self, field: int, player: life.Player, answer):
+        self.log.record(DECISION, self.log.index(player), field, int(answer == life.CAREER if field == STARTING_PATH else answer))
+        return answer
+
+    def pause(self, prompt: str) -> None:
+        self.policy.pause(prompt)
+
+    def starting_path(self, player: life.Player) -> str:
+        return self._answer(STARTING_PATH, player, self.policy.starting_path(player))
+
+    def switch_career(self, player: life.Player, drawn_career: life.Career) -> bool:
+        return self._answer(SWITCH_CAREER, player, self.policy.switch_career(player, drawn_career))
+
+    def pursue_education(self, player: life.Player, drawn_college: life.Education) -> bool:
+        return self._answer(PURSUE_EDUCATION, player, self.policy.pursue_education(player, drawn_college))
+
+    def attempt_marriage(self, player: life.Player) -> bool:
+        return self._answer(ATTEMPT_MARRIAGE, player, self.policy.attempt_marriage(player))
+
+    def attempt_children(self, player: life.Player) -> bool:
+        return self._answer(ATTEMPT_CHILDREN, player, self.policy.attempt_children(player))
+
+# the records of one game as it is played
+class GameLog:
+    def __init__(self, game_id: int = 0, seed: int = 0, board: life.CompiledBoard = None):
+        self.game_id = game_id
+        self.seed = seed
+        self.board = board if board is not None else life.BOARD
+        self.records = bytearray()
+        self.players = []
+        # player index -> the fields last written for it
+        self.known = []
+        # player index -> (square, event) still to be hit on the current move, in the order move_player hits them
+        self.pending = []
+        # index of the player whose draws are being recorded
+        self.active = None
+
+    def record(self, kind: int, player: int, field: int, value: int) -> None:
+        self.records += _RECORD.pack(kind, player, field, value)
+
+    # the index of a player, seen for the first time it's added with the fields of a new player
+    def index(self, player: life.Player) -> int:
+        for number, each in enumerate(self.players):
+            if each is player:
+                return number
+        self.players.append(player)
+        self.known.append(_fields(life.Player(player.name)))
+        self.pending.append([])
+        return len(self.players) - 1
+
+    # makes player the one acting, finishing off whoever was acting before
+    def act(self, player: life.Player) -> int:
+        number = self.index(player)
+        if number != self.active:
+            self.flush(self.active)
+            self.active = number
+        return number
+
+    # writes a CHANGE record for every field of the player that changed since it was last written
+    def sync(self, number: int, only_moves: bool = False) -> None:
+        player = self.players[number]
+        old, new = self.known[number], _fields(player)
+        if old == new:
+            return
+        if new[POSITION] != old[POSITION]:
+            self.record(CHANGE, number, POSITION, new[POSITION] - old[POSITION])
+            self.pending[number] = self._hits(old[POSITION], new[POSITION])
+        if new[RETIRED] != old[RETIRED]:
+            self.record(CHANGE, number, RETIRED, int(new[RETIRED]))
+        if only_moves:
+            self.known[number] = old[:POSITION] + (new[POSITION],) + old[POSITION + 1:RETIRED] + (new[RETIRED],) + old[RETIRED + 1:]
+            return
+        for field in (BALANCE, KIDS_HAD):
+            if new[field] != old[field]:
+                self.record(CHANGE, number, field, new[field] - old[field])
+        if new[CAREER] != old[CAREER]:
+            self.record(CHANGE, number, CAREER, life.SNAPSHOT_CAREERS.index(new[CAREER]))
+        if new[TOTAL_BONUS] != old[TOTAL_BONUS]:
+            self.record(CHANGE, number, TOTAL_BONUS, _double_bits(new[TOTAL_BONUS]))
+        for field in (MARRIED, INITIALIZED):
+            if new[field] != old[field]:
+                self.record(CHANGE, number, field, int(new[field]))
+        for education in player.education[old[EDUCATION]:]:
+            self.record(CHANGE, number, EDUCATION, life.SNAPSHOT_EDUCATIONS.index(education))
+        self.known[number] = new
+
+    # the (square, event) pairs a move from start to end hits, paychecks first on a square as in move_player
+    def _hits(self, start: int, end: int) -> list:
+        board = self.board
+        low, high = np.searchsorted(board.event_squares, [start + 1, end + 1])
+        hits = []
+        for square, mask in zip(board.event_squares[low:high].tolist(), board.event_masks[low:high].tolist()):
+            if board.pay_event in board.bits and mask & board.bits[board.pay_event]:
+                hits.append((square, board.pay_event))
+            hits += [(square, event) for event in board.events_at(square, mask)]
+        return hits
+
+    # writes the squares hit up to (and including) the given event, the paychecks among them are settled first
+    def hit(self, number: int, event: life.Event = None) -> None:
+        self.sync(number, only_moves=True)
+        pending = self.pending[number]
+        while pending and pending[0][1] is self.board.pay_event:
+            square, pay_event = pending.pop(0)
+            self.record(EVENT, number, self.board.bits[pay_event].bit_length() - 1, square)
+        self.sync(number)
+        if event is not None and pending:
+            square, hit_event = pending.pop(0)
+            self.record(EVENT, number, self.board.bits[hit_event].bit_length() - 1, square)
+
+    # writes out everything left of a player's current move
+    def flush(self, number: int) -> None:
+        if number is not None:
+            self.hit(number)
+
+    # the finished log, every player brought up to date
+    def finish(self) -> 'LoggedGame':
+        for number in range(len(self.players)):
+            self.flush(number)
+        self.active = None
+        names = [player.name for player in self.players]
+        characters = [player.character for player in self.players]
+        records = np.frombuffer(bytes(self.records), dtype=RECORD)
+        return LoggedGame(self.game_id, self.seed, names, characters, records)
+
+# an engine that records everything that happens into a GameLog
+class LoggedEngine(life.Engine):
+    def __init__(self, log: GameLog, policy: life.Policy = None, rng=None, say=life.silent):
+        super().__init__(policy, rng if rng is not None else life.GameRng(log.seed, log.game_id), say, log.board)
+        self.log = log
+        self.rng = _RecordingRng(log, self.rng)
+        self._policies = {}
+        self.handlers = {event: self._logged_handler(event) for event in life.EVENT_HANDLERS}
+
+    def policy_for(self, player: life.Player) -> life.Policy:
+        self.log.act(player)
+        policy = super().policy_for(player)
+        if id(policy) not in self._policies:
+            self._policies[id(policy)] = _RecordingPolicy(self.log, policy)
+        return self._policies[id(policy)]
+
+    def _logged_handler(self, event: life.Event):
+        def logged(target_player: life.Player, engine: life.Engine) -> None:
+            number = self.log.act(target_player)
+            self.log.hit(number, event)
+            # looked up on every call, so an instrumented handler is still the one that runs
+            life.EVENT_HANDLERS[event](target_player, engine)
+            self.log.sync(number)
+        return logged
+
+# plays a game with GameRng(seed, game_id) and returns its log
+def record_game(players: list, game_id: int = 0, seed: int = 0, policy: life.Policy = None,
+                board: life.CompiledBoard = None) -> 'LoggedGame':
+    log = GameLog(game_id, seed, board)
+    engine = LoggedEngine(log, policy)
+    players = [each if isinstance(each, life.Player) else life.Player(each) for each in players]
+    for each in players:
+        log.index(each)
+    life.simulate_game(players, engine=engine)
+    return log.finish()
+
+####################
+# Replay
+####################
+
+# a recorded game, records is a RECORD array (straight on top of the archive's memory map when read from one)
+class LoggedGame:
+    def __init__(self, game_id: int, seed: int, names: list[str], characters: list[str], records: np.ndarray):
+        self.game_id = game_id
+        self.seed = seed
+        self.names = names
+        self.characters = characters
+        self.records = records
+
+    # the players as they were after the first `until` records (all of them by default), no game logic is run:
+    # the delta fields are summed, and the last value written wins for the others
+    def replay(self, until: int = None) -> list[life.Player]:
+        players = []
+        for name, character in zip(self.names, self.characters):
+            player = life.Player(name)
+            player.character = character
+            players.append(player)
+        records = self.records[:until]
+        changes = records[records['kind'] == CHANGE]
+        who, field, value = changes['player'], changes['field'], changes['value']
+
+        for code, attribute in DELTA_FIELDS.items():
+            chosen = field == code
+            totals = np.zeros(len(players), np.int64)
+            np.add.at(totals, who[chosen], value[chosen])
+            for player, total in zip(players, totals.tolist()):
+                setattr(player, attribute, getattr(player, attribute) + total)
+        for code, values in _last_values(who, field, value, CAREER).items():
+            players[code].career = life.SNAPSHOT_CAREERS[values]
+        for code, values in _last_values(who, field, value, TOTAL_BONUS).items():
+            players[code].total_bonus = struct.unpack('<d', struct.pack('<q', values))[0]
+        for flag, attribute in FLAG_FIELDS.items():
+            for code, values in _last_values(who, field, value, flag).items():
+                setattr(players[code], attribute, bool(values))
+        educations = field == EDUCATION
+        for code, education in zip(who[educations].tolist(), value[educations].tolist()):
+            players[code].education.append(life.SNAPSHOT_EDUCATIONS[education])
+        return players
+
+    # the number of records before each round starts, so replay(turns()[k]) is the state after k rounds
+    # (a round starts with the first roll of a player's next move)
+    def turns(self) -> list[int]:
+        rolls = np.flatnonzero((self.records['kind'] == DRAW) & (self.records['field'] == ROLL))
+        moves = [0] * len(self.names)
+        starts = []
+        for index, player in zip(rolls.tolist(), self.records['player'][rolls].tolist()):
+            moves[player] += 1
+            if moves[player] > len(starts):
+                starts.append(index)
+        return starts + [len(self.records)]
+
+    # the records as bytes, in the layout of the archive
+    def encode(self) -> bytes:
+        parts = [_varint(self.game_id), _varint(self.seed), _varint(len(self.names))]
+        for name, character in zip(self.names, self.characters):
+            for text in (name, character):
+                encoded = text.encode()
+                parts += [_varint(len(encoded)), encoded]
+        parts += [_varint(len(self.records)), self.records.tobytes()]
+        return b''.join(parts)
+
+    @classmethod
+    def decode(cls, data, offset: int = 0) -> 'LoggedGame':
+        game_id, offset = _read_varint(data, offset)
+        seed, offset = _read_varint(data, offset)
+        count, offset = _read_varint(data, offset)
+        texts = []
+        for _ in range(2 * count):
+            length, offset = _read_varint(data, offset)
+            texts.append(bytes(data[offset:offset + length]).decode())
+            offset += length
+        records, offset = _read_varint(data, offset)
+        return cls(game_id, seed, texts[0::2], texts[1::2], np.frombuffer(data, dtype=RECORD, count=records, offset=offset))
+
+# player -> the last value written to a field
+def _last_values(who: np.ndarray, field: np.ndarray, value: np.ndarray, code: int) -> dict:
+    chosen = np.flatnonzero(field == code)
+    return dict(zip(who[chosen].tolist(), value[chosen].tolist()))
+
+def _varint(number: int) -> bytes:
+    out = bytearray()
+    while number >= 0x80:
+        out.append((number & 0x7f) | 0x80)
+        number >>= 7
+    out.append(number)
+    return bytes(out)
+
+def _read_varint(data, offset: int) -> tuple:
+    number = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        number |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return number, offset
+        shift += 7
+
+####################
+# Archive
+####################
+
+# (game_id, where the game starts in the archive, its size in bytes) per game, in the order they were written
+INDEX = np.dtype([('game_id', '<u8'), ('offset', '<u8'), ('size', '<u8')])
+
+def _index_path(path: str) -> str:
+    return path + '.idx'
+
+# appends games to an archive, use it as a context manager or call close()
+class LogWriter:
+    def __init__(self, path: str):
+        self.data = open(path, 'ab')
+        self.index = open(_index_path(path), 'ab')
+        # a game whose index entry never made it to disk is cut off, and so is an index entry whose game didn't
+        # make it to disk whole, so the two files always agree
+        entries = np.fromfile(_index_path(path), dtype=INDEX, count=os.path.getsize(_index_path(path)) // INDEX.itemsize)
+        ends = entries['offset'] + entries['size']
+        # games are written one after the other, so the ends only go up
+        kept = int(np.searchsorted(ends, os.path.getsize(path), side='right'))
+        self.index.truncate(kept * INDEX.itemsize)
+        end = int(ends[kept - 1]) if kept else 0
+        self.data.truncate(end)
+        # an append mode file still reports the size it was opened with, and write() takes its offsets from that
+        self.data.seek(end)
+
+    # the game goes to disk before its index entry does, so the index never points past the data
+    def write(self, game: LoggedGame) -> None:
+        encoded = game.encode()
+        offset = self.data.tell()
+        self.data.write(encoded)
+        self.data.flush()
+        self.index.write(struct.pack('<QQQ', game.game_id, offset, len(encoded)))
+
+    def close(self) -> None:
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self) -> 'LogWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# reads games out of an archive by game_id, the archive is memory-mapped and only the game asked for is touched
+class LogArchive:
+    def __init__(self, path: str):
+        self.path = path
+        self.index = np.fromfile(_index_path(path), dtype=INDEX)
+        self.ids = self.index['game_id']
+        # archives written in game_id order are searched directly, anything else through a sorted copy
+        self.order = None if np.all(self.ids[1:] >= self.ids[:-1]) else np.argsort(self.ids, kind='stable')
+        if self.order is not None:
+            self.ids = self.ids[self.order]
+        with open(path, 'rb') as data:
+            self.data = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self):
+        for entry in self.index:
+            yield LoggedGame.decode(self.data, int(entry['offset']))
+
+    def game(self, game_id: int) -> LoggedGame:
+        position = int(np.searchsorted(self.ids, game_id))
+        if position == len(self.ids) or self.ids[position] != game_id:
+            raise KeyError(f"game {game_id} is not in {self.path}")
+        entry = self.index[position if self.order is None else self.order[position]]
+        return LoggedGame.decode(self.data, int(entry['offset']))
+
+# plays the game again from its seed (with the default policy unless told otherwise) and checks the log matches
+def verify(game: LoggedGame, policy: life.Policy = None, board: life.CompiledBoard = None) -> bool:
+    replayed = record_game(game.names, game.game_id, game.seed, policy, board)
+    return replayed.records.tobytes() == game.records.tobytes()
+
+# the players after a round as text, with the map
+def describe(game: LoggedGame, turn: int = None, board: life.CompiledBoard = None) -> str:
+    turns = game.turns()
+    players = game.replay(turns[min(turn, len(turns) - 1)] if turn is not None else None)
+    lines = [f"game {game.game_id} (seed {game.seed})" + (f" after round {turn}" if turn is not None else ", finished")]
+    lines += [player.info_text() + '\n' for player in players]
+    lines.append(life.board_renderer(board or life.BOARD).render(players, players[0].position))
+    return '\n'.join(lines)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Record, inspect and verify game logs')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help='play games and append their logs to an archive')
+    record.add_argument('path')
+    record.add_argument('--games', type=int, default=1000)
+    record.add_argument('--players', type=int, default=2)
+    record.add_argument('--seed', type=int, default=0)
+    record.add_argument('--first-id', type=int, default=0, help='game_id of the first game')
+    show = commands.add_parser('show', help='replay a game from an archive')
+    show.add_argument('path')
+    show.add_argument('game_id', type=int)
+    show.add_argument('--turn', type=int, help='show the state after this many rounds (default: the end)')
+    check = commands.add_parser('verify', help='replay every game of an archive from its seed and compare the logs')
+    check.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        names = [f'player {number + 1}' for number in range(args.players)]
+        with LogWriter(args.path) as writer:
+            for game_id in range(args.first_id, args.first_id + args.games):
+                writer.write(record_game(names, game_id, args.seed))
+        print(f"recorded {args.games} games into {args.path}")
+    elif args.command == 'show':
+        print(describe(LogArchive(args.path).game(args.game_id), args.turn))
+    else:
+        bad = [game.game_id for game in LogArchive(args.path) if not verify(game)]
+        print(f"{len(bad)} games did not match" + (f": {bad[:20]}" if bad else ""))
+        return 1 if bad else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,8 +7,14 @@
 #               such as object oriented programming, lists, loops, functions, etc. There may be edge cases not considered, and the UI
 #               is quite clunky, but it was my first time attempting to code a larger project in Python.
 
+import bisect
+import functools
+import json
+import os
 import random
-import numpy as np
+import struct
+import sys
+import time
 
 CAREER = DISP_INFO = ADD_PLAYER = '1'
 EDUCATION = MOVE = REMOVE_PLAYER = '2'
@@ -22,6 +28,8 @@ DIVIDER = '\n--------------------------------------\n'
 # Player Conditions
 ####################
 player_list = []
+# the balance every player starts with
+STARTING_BALANCE = 100000
 
 ####################
 # Board Conditions
@@ -32,8 +40,7 @@ COLUMNS = 18
 # game length
 END_OF_GAME = (ROWS*COLUMNS)
 
-# this initializes a "visualization" of the board state
-board = np.full((ROWS,COLUMNS), '_', str)
+# the "visualization" of the board state (a numpy grid) is made by initialize_board, nothing is built on import
 ACTION_POSITIONS = [5,6,10,13,20,30]
 
 # this refers to the different action tiles on the board
@@ -62,6 +69,172 @@ ALL_EVENT_SQUARES = set().union(
     CHILDREN.positions
 )
 
+# the board compiled once into a sparse event index so a move never has to search the Event position lists.
+# only squares that have an event are stored (sorted plain lists for the bisect lookups of the scalar engine, and
+# the same as numpy arrays, made the first time they're asked for), so memory grows with the number of events and
+# not with the length of the board. Compiling needs no numpy, so a quick job that never asks for the arrays never
+# imports it. positions maps an event to the squares it is on, for boards that don't use the events' own lists
+class CompiledBoard:
+    # longest board masks_at keeps a dense table for
+    DENSE_LENGTH = 1 << 16
+
+    def __init__(self, events: list[Event], length: int, pay_event: Event = PAY_SQUARE, positions: dict = None):
+        self.events = events
+        self.length = length
+        self.pay_event = pay_event
+        # one bit per event, in the order of the events list
+        self.bits = {event: 1 << bit for bit, event in enumerate(events)}
+
+        masks = {}
+        for event in events:
+            locations = positions[event] if positions is not None else event.positions
+            locations = locations.tolist() if hasattr(locations, 'tolist') else locations
+            if locations and (min(locations) < 1 or max(locations) > length):
+                raise ValueError(f"{event.name} has squares outside of a board of length {length}")
+            bit = self.bits[event]
+            for location in locations:
+                masks[location] = masks.get(location, 0) | bit
+        # every square with at least one event, and the event bits on each
+        self.event_square_list = sorted(masks)
+        self.event_mask_list = [masks[square] for square in self.event_square_list]
+        pay_bit = self.bits.get(pay_event, 0)
+        self.pay_square_list = [square for square, mask in zip(self.event_square_list, self.event_mask_list) if mask & pay_bit]
+
+        # squares with an event that needs resolving (everything besides paychecks) in board order, the events on
+        # each of them in the events list order, and the number of pay squares up to and including each of them
+        # (squares with the same events share one list)
+        decision_bits = sum(bit for event, bit in self.bits.items() if event is not pay_event)
+        shared = {}
+        self.decision_squares = []
+        self.decision_events = []
+        for square, mask in zip(self.event_square_list, self.event_mask_list):
+            if mask & decision_bits:
+                self.decision_squares.append(square)
+                self.decision_events.append(shared.setdefault(mask, self.events_at(square, mask)))
+        self.decision_paychecks = [bisect.bisect_right(self.pay_square_list, square) for square in self.decision_squares]
+        # a board this short also gets a plain array of the event bits of every square (see masks_at)
+        self._dense_masks = None
+
+    # the numpy versions of the lists, for the batch engine and the renderer
+    @functools.cached_property
+    def event_squares(self):
+        import numpy as np
+        return np.array(self.event_square_list, dtype=np.int64)
+
+    @functools.cached_property
+    def event_masks(self):
+        import numpy as np
+        return np.array(self.event_mask_list, dtype=np.uint8 if len(self.events) <= 8 else np.uint64)
+
+    @functools.cached_property
+    def pay_squares(self):
+        import numpy as np
+        return np.array(self.pay_square_list, dtype=np.int64)
+
+    # the event bits on a square
+    def mask_at(self, square: int) -> int:
+        index = bisect.bisect_left(self.event_square_list, square)
+        if index < len(self.event_square_list) and self.event_square_list[index] == square:
+            return self.event_mask_list[index]
+        return 0
+
+    # the event bits on each square of an array of squares, short boards index a dense copy instead of searching
+    def masks_at(self, squares):
+        import numpy as np
+        if self.length <= self.DENSE_LENGTH:
+            if self._dense_masks is None:
+                self._dense_masks = np.zeros(self.length + 1, dtype=self.event_masks.dtype)
+                self._dense_masks[self.event_squares] = self.event_masks
+            return self._dense_masks[squares]
+        if len(self.event_squares) == 0:
+            return np.zeros(np.shape(squares), dtype=self.event_masks.dtype)
+        index = np.minimum(np.searchsorted(self.event_squares, squares), len(self.event_squares) - 1)
+        return np.where(self.event_squares[index] == squares, self.event_masks[index], 0).astype(self.event_masks.dtype)
+
+    # the events on a square that need resolving, in the events list order
+    def events_at(self, square: int, mask: int = None) -> list[Event]:
+        mask = self.mask_at(square) if mask is None else mask
+        return [event for event in self.events if event is not self.pay_event and mask & self.bits[event]]
+
+    # the number of pay squares in 1..square
+    def paychecks_through(self, square: int) -> int:
+        return bisect.bisect_right(self.pay_square_list, square)
+
+    # the number of decision squares in 1..square
+    def decisions_through(self, square: int) -> int:
+        return bisect.bisect_right(self.decision_squares, square)
+
+    # the squares each event is on, as plain lists
+    def layout(self) -> dict:
+        return {
+            event: [square for square, mask in zip(self.event_square_list, self.event_mask_list) if mask & bit]
+            for event, bit in self.bits.items()
+        }
+
+# the standard board, compiled the first time it's needed (also there as BOARD, see __getattr__ at the bottom)
+_standard = []
+
+def standard_board() -> CompiledBoard:
+    if not _standard:
+        _standard.append(CompiledBoard(LIST_OF_EVENTS, END_OF_GAME))
+    return _standard[0]
+
+# the standard events by name, for board files
+EVENTS_BY_NAME = {event.name: event for event in LIST_OF_EVENTS}
+
+# a board of any length that repeats the layout of base (the standard board) every base.length squares
+def tiled_board(length: int, base: CompiledBoard = None) -> CompiledBoard:
+    import numpy as np
+    base = base if base is not None else standard_board()
+    positions = {}
+    for event, squares in base.layout().items():
+        squares = np.asarray(squares, dtype=np.int64)
+        starts = np.arange(0, length, base.length, dtype=np.int64)
+        tiled = (starts[:, None] + squares[None, :]).ravel()
+        positions[event] = tiled[tiled <= length]
+    return CompiledBoard(base.events, length, base.pay_event, positions)
+
+# a board of any length with every event scattered at random, by default each event covers the same share of
+# the squares as on the standard board. densities maps an event to the chance a square has it
+def random_board(length: int, seed: int = 0, densities: dict = None) -> CompiledBoard:
+    if densities is None:
+        densities = {event: len(event.positions) / END_OF_GAME for event in LIST_OF_EVENTS}
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    positions = {}
+    for event, density in densities.items():
+        # drawn a block at a time so a board of millions of squares never needs a full length array
+        found = []
+        for first in range(0, length, 1 << 20):
+            block = min(1 << 20, length - first)
+            found.append(np.flatnonzero(rng.random(block) < density) + first + 1)
+        positions[event] = np.concatenate(found) if found else np.zeros(0, np.int64)
+    return CompiledBoard([event for event in LIST_OF_EVENTS if event in densities], length, PAY_SQUARE, positions)
+
+# reads a board file, JSON with the length and the squares of each event by name:
+#   {"length": 1000000, "events": {"Paycheck": [6, 10], "Love Interest": [4]}, "repeat": 36}
+# with "repeat", the event squares are a pattern that is tiled every that many squares up to the length
+def load_board(path: str) -> CompiledBoard:
+    with open(path) as layout_file:
+        layout = json.load(layout_file)
+    unknown = set(layout['events']) - set(EVENTS_BY_NAME)
+    if unknown:
+        raise ValueError(f"{path} has unknown events: {', '.join(sorted(unknown))}")
+    events = [event for event in LIST_OF_EVENTS if event.name in layout['events']]
+    positions = {event: layout['events'][event.name] for event in events}
+    if 'repeat' in layout:
+        pattern = CompiledBoard(events, layout['repeat'], PAY_SQUARE, positions)
+        return tiled_board(layout['length'], pattern)
+    return CompiledBoard(events, layout['length'], PAY_SQUARE, positions)
+
+# writes a board in the format load_board reads
+def save_board(board: CompiledBoard, path: str) -> None:
+    with open(path, 'w') as layout_file:
+        json.dump({
+            'length': board.length,
+            'events': {event.name: squares for event, squares in board.layout().items()},
+        }, layout_file)
+
 # this is in reference to the 3 included careers a player can have
 class Career:
     def __init__(self, career_name: str, base_salary: int, description: str):
@@ -107,11 +280,17 @@ GED = Education("GED", 1.0, 0)
 education_list = [COMMUNITY_COLLEGE, STATE_UNIVERSITY, GRADUATE_SCHOOL]
 
 class Player:
+    # fixed attributes (no per instance __dict__), large batches use batch_engine.PlayerTable instead
+    __slots__ = (
+        'name', 'balance', 'kids', 'education', 'career', 'retired', 'initialized',
+        'position', 'character', 'married', 'total_bonus', 'policy',
+    )
+
     # initialize the player and attributes
     def __init__(self, player_name: str):
         self.name = player_name
         # starting balance
-        self.balance = 100000
+        self.balance = STARTING_BALANCE
         self.kids = 0
         # GED = basic, everyone starts with atleast this
         self.education = [GED]
@@ -128,6 +307,8 @@ class Player:
         #ask players if they want to start with a college or career path
         #self.starting_path = ''
         self.total_bonus = 1.0
+        # who answers this player's decisions, None means the engine's default policy
+        self.policy = None
     
     # WILL replace when the education is added, to avoid double counting
     # This will calculate the total bonus 
@@ -136,45 +317,52 @@ class Player:
             self.total_bonus =+ education.bonus
             
     # this moves the player the given distance
-    def move(self, distance: int) -> None:
+    def move(self, distance: int, say=None, end_of_game: int = END_OF_GAME) -> None:
         
+        say = say or TERMINAL
         # if the player would go past the end of the game...
-        if (self.position + distance >= END_OF_GAME):
+        if (self.position + distance >= end_of_game):
             # instead set their position to the last tile
-            self.position = END_OF_GAME
+            self.position = end_of_game
             # set them to retired...
             self.retired = True
-            print(f"{self.name} has reached the end of the game!\n")
+            say("{} has reached the end of the game!\n", self.name)
         # if they would not move past the end of the game...
         else:
             # move them the appropriate distance
             self.position += distance
-            print(f"{self.name} has reached position {self.position}\n")
+            say("{} has reached position {}\n", self.name, self.position)
     
     # print all relevent information about the player
     def full_info(self) -> None:
-        print(
-            f'Player: {self.name}\n' +
-            f'Balance: {self.balance}\n' +
-            f'Career: {self.career.name}\n' +
-            f'Kids: {self.kids}\n' +
-            f'Board Position: {self.position}'
-        )
-        print("Accreditations:")
-        # print each of the academic achievements of the person
+        print(self.info_text())
+
+    # the text full_info prints
+    def info_text(self) -> str:
+        lines = [
+            f'Player: {self.name}',
+            f'Balance: {self.balance}',
+            f'Career: {self.career.name}',
+            f'Kids: {self.kids}',
+            f'Board Position: {self.position}',
+            "Accreditations:",
+        ]
+        # each of the academic achievements of the person
         for degree in self.education:
-            print('\t' + degree.name)
-            
+            lines.append('\t' + degree.name)
+
         # handle the situation if they're married or not
         if self.married:
-            print("Married")
+            lines.append("Married")
         else:
-            print("Unmarried")
+            lines.append("Unmarried")
+        return '\n'.join(lines)
     # print(f"\nAre you sure you want to start with the following players? {', '.join(initial_players)} ")    
     
-    def pay(self) -> None:
-        amount = int(self.career.salary * self.total_bonus)
-        print(f"{self.name} has recieved ${amount}\n")
+    # pays the player's salary, times paychecks at once
+    def pay(self, say=None, times: int = 1) -> None:
+        amount = int(self.career.salary * self.total_bonus) * times
+        (say or TERMINAL)("{} has recieved ${}\n", self.name, amount)
         self.balance += amount
     
     def spend(self, cost: int) -> None:
@@ -198,198 +386,803 @@ def end_game() -> None:
     else:
         print("Returning to game...\n")
 
+####################
+# Narration
+####################
+# everything the engine narrates goes to a sink: sink(text, *values), where text is a str.format template for the
+# values (or the plain text when there are none). The template is only filled in by a sink that shows or keeps the
+# text, so a headless game passing values to silent never formats a single message
+
+# the null sink, throws narration away without formatting it, this is what headless games use
+def silent(*args, **kwargs) -> None:
+    pass
+
+# prints every message, the interactive game's sink
+class TerminalSink:
+    def __call__(self, text: str, *values) -> None:
+        print(text.format(*values) if values else text)
+
+TERMINAL = TerminalSink()
+
+# keeps the messages as (template, values) events, for tools that want to know what happened rather than read it
+class EventSink:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, text: str, *values) -> None:
+        self.events.append((text, values))
+
+    def clear(self) -> None:
+        self.events.clear()
+
+# keeps the messages and only formats them when the text is asked for (or written out with flush)
+class BufferedSink(EventSink):
+    # the formatted messages, from message `start` on
+    def lines(self, start: int = 0) -> list[str]:
+        return [text.format(*values) if values else text for text, values in self.events[start:]]
+
+    def getvalue(self) -> str:
+        return ''.join(line + '\n' for line in self.lines())
+
+    # prints everything kept so far (to file, stdout by default) and empties the buffer
+    def flush(self, file=None) -> None:
+        print(self.getvalue(), end='', file=file)
+        self.clear()
+
+# the draws the engine makes, each from its own stream: roll(low, high) for the die, career_card(cards),
+# college_card(cards), coin() for the marriage attempt and kids(low, high)
+
+# the engine's draws taken from the random module (or a random.Random), exactly as the game always did
+class StdlibRng:
+    def __init__(self, source=random):
+        self.source = source
+
+    def roll(self, low: int, high: int) -> int:
+        return self.source.randint(low, high)
+
+    def career_card(self, cards: list) -> Career:
+        return self.source.choice(cards)
+
+    def college_card(self, cards: list) -> Education:
+        return self.source.choice(cards)
+
+    def coin(self) -> bool:
+        return bool(self.source.getrandbits(1))
+
+    def kids(self, low: int, high: int) -> int:
+        return self.source.randint(low, high)
+
+# a per game rng, (seed, game_id) always reproduces the exact same game. Stream layout:
+#   the game owns one generator, numpy.random.Generator(PCG64(SeedSequence(seed, spawn_key=(game_id,)))), read in
+#   blocks of G.random((5, BLOCK)): row k of every block is appended to stream k, so stream k is the concatenation
+#   of row k of block 0, 1, 2... whatever order the streams get used in. The streams and how a double u in [0, 1)
+#   becomes a draw:
+#     k = 0 die rolls          low + floor(u * (high - low + 1))
+#     k = 1 career cards       cards[floor(u * len(cards))]
+#     k = 2 college cards      cards[floor(u * len(cards))]
+#     k = 3 marriage attempts  success when u < 0.5
+#     k = 4 kids               low + floor(u * (high - low + 1))
+#   so a different choice in one place never shifts the draws of another kind (which is what makes the same
+#   (seed, game_id) common random numbers for comparing policies)
+# the rng keeps the last block it read as plain lists and each stream holds on to the row it is reading, so a draw is
+# a list lookup and memory stays at two blocks however long the game. A stream that needs a block other than the last
+# one read jumps the generator (PCG64.advance) to it, so a snapshot restores by jumping straight to each stream's block
+# an antithetic GameRng mirrors every draw of the plain one with the same (seed, game_id): it rolls high + low - r
+# wherever that one rolls r (7 - r for a die), draws the card at the other end of the list, and flips the coin
+class GameRng:
+    STREAMS = ('dice', 'career', 'college', 'marriage', 'kids')
+    BLOCK = 64
+
+    def __init__(self, seed: int = 0, game_id: int = 0, antithetic: bool = False):
+        self.seed = seed
+        self.game_id = game_id
+        self.antithetic = antithetic
+        import numpy as np
+        self.generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(game_id,))))
+        # how many values the generator has put out, and the last block read from it (its number and rows)
+        self.output = 0
+        self.block = -1
+        self.block_rows = None
+        # per stream: the row of the block being read and where the next value is in it (BLOCK when it needs another)
+        self.rows = [None] * len(self.STREAMS)
+        self.offsets = [self.BLOCK] * len(self.STREAMS)
+        # values read from each stream so far
+        self.used = [0] * len(self.STREAMS)
+
+    # the next value of a stream, reading its row of another block when it runs out
+    def draw(self, stream: int) -> float:
+        offset = self.offsets[stream]
+        if offset == self.BLOCK:
+            offset = self._read_row(stream)
+        self.offsets[stream] = offset + 1
+        self.used[stream] += 1
+        return self.rows[stream][offset]
+
+    # moves the stream on to the row of the block its next value is in and returns where that value is in the row
+    def _read_row(self, stream: int) -> int:
+        block, offset = divmod(self.used[stream], self.BLOCK)
+        if block != self.block:
+            # every value is one 64 bit output, and the generator's period is 2 ** 128, so going back to an earlier
+            # block is going forward by the rest of the period
+            start = block * len(self.STREAMS) * self.BLOCK
+            if start != self.output:
+                self.generator.bit_generator.advance((start - self.output) % (1 << 128))
+            self.block_rows = self.generator.random((len(self.STREAMS), self.BLOCK)).tolist()
+            self.block = block
+            self.output = start + len(self.STREAMS) * self.BLOCK
+        self.rows[stream] = self.block_rows[stream]
+        return offset
+
+    # moves each stream on to the given number of values read, used when restoring a snapshot. Nothing is drawn
+    # here, a stream that leaves its current block reads the block it lands in on its next draw
+    def skip_to(self, used: list[int]) -> None:
+        for stream, count in enumerate(used):
+            if count > self.used[stream]:
+                self.offsets[stream] = min(self.offsets[stream] + count - self.used[stream], self.BLOCK)
+                self.used[stream] = count
+
+    # floor(u * count) from a stream, counted from the other end when antithetic
+    def pick(self, stream: int, count: int) -> int:
+        index = int(self.draw(stream) * count)
+        return count - 1 - index if self.antithetic else index
+
+    def roll(self, low: int, high: int) -> int:
+        return low + self.pick(0, high - low + 1)
+
+    def career_card(self, cards: list) -> Career:
+        return cards[self.pick(1, len(cards))]
+
+    def college_card(self, cards: list) -> Education:
+        return cards[self.pick(2, len(cards))]
+
+    def coin(self) -> bool:
+        return self.pick(3, 2) == 0
+
+    def kids(self, low: int, high: int) -> int:
+        return low + self.pick(4, high - low + 1)
+
+# answers every decision a player can face during the game without any terminal I/O
+# subclass this (or pass a different one to the engine) to try out other strategies
+class Policy:
+    # called wherever the interactive game waits for a key press
+    def pause(self, prompt: str) -> None:
+        pass
+
+    # CAREER or EDUCATION, the path the player starts on
+    def starting_path(self, player: Player) -> str:
+        return CAREER
+
+    # True to take the drawn career over the current one
+    def switch_career(self, player: Player, drawn_career: Career) -> bool:
+        return drawn_career.salary > player.career.salary
+
+    # True to pay for the drawn education
+    def pursue_education(self, player: Player, drawn_college: Education) -> bool:
+        return player.balance >= drawn_college.cost
+
+    # True to try and get married (50% chance)
+    def attempt_marriage(self, player: Player) -> bool:
+        return True
+
+    # True to try for children (0-3 kids)
+    def attempt_children(self, player: Player) -> bool:
+        return True
+
+    # False for a policy whose batch_* methods don't make its choices (one that can only decide for a Player),
+    # the batch engine refuses those rather than play them as the default policy
+    batched = True
+
+    # True for a policy that looks at the engine it's deciding for (the square being resolved, the board),
+    # Engine.policy_for sets its engine attribute to that engine before every decision
+    follows_engine = False
+
+    # the batch_* versions answer the same questions for many games at once (see batch_engine.py),
+    # state holds one numpy array per player field and idx are the games asking
+    # they return a bool or a bool array, and must make the same choices as the methods above
+    # (True from batch_starting_path means the CAREER path)
+    def batch_starting_path(self, state, idx):
+        return True
+
+    def batch_switch_career(self, state, idx, drawn_salary):
+        return drawn_salary > state.salary[idx]
+
+    def batch_pursue_education(self, state, idx, cost):
+        return state.balance[idx] >= cost
+
+    def batch_attempt_marriage(self, state, idx):
+        return True
+
+    def batch_attempt_children(self, state, idx):
+        return True
+
+# the human at the keyboard, every decision is asked through input()
+class InteractivePolicy(Policy):
+    def pause(self, prompt: str) -> None:
+        input(prompt)
+
+    def starting_path(self, player: Player) -> str:
+        display_starting_choices()
+        start_choice = input("Choose the path you want to start: ")
+        while start_choice not in [CAREER, EDUCATION]:
+            display_starting_choices()
+            start_choice = input(f"Please input either {CAREER} or {EDUCATION} to continue")
+        return start_choice
+
+    def switch_career(self, player: Player, drawn_career: Career) -> bool:
+        decision = input(f"Would you like to switch your career to {drawn_career.name}?\n1: Switch\n2: Keep\n")
+
+        # this will run as long as they are not providing a valid response
+        while decision not in ['1', '2']:
+            decision = input("Please enter a valid option:\n1: Switch\n2: Keep")
+        return decision == '1'
+
+    def pursue_education(self, player: Player, drawn_college: Education) -> bool:
+        decision = input(
+            f"Would you like to recieve education at a {drawn_college.name}? It will cost ${drawn_college.cost}\n" +
+            "(Note that these effects do compound and stack)\n" +
+            "Press 1 if Yes, 2 if No: "
+        )
+        # this loop will ensure that the user puts in a valid answer
+        while decision not in ['1','2']:
+            decision = input("Please choose a valid answer:\n1: Change\n2:Keep")
+        return decision == '1'
+
+    def attempt_marriage(self, player: Player) -> bool:
+        choice = input("Press 1 if you wish to attempt to get married (50%/ chance), press 2 otherwise: ")
+        while choice not in ['1', '2']:
+            choice = input("Please input valid response, 1 or 2: ")
+        return choice == '1'
+
+    def attempt_children(self, player: Player) -> bool:
+        choice = input(
+            f"Do you want to try for children (outcome {MIN_KIDS}-{MAX_KIDS})?\n" +
+            "1: Yes\n" +
+            "2: No" + '\n'
+            )
+        # this will ensure the choice is valid
+        while choice not in ['1','2']:
+            choice = input("Please enter a valid answer: 1 or 2")
+        return choice == '1'
+
+# everything a game needs besides its players: who answers decisions, where the randomness
+# comes from (a GameRng or StdlibRng, or the random module / a random.Random which get wrapped in a StdlibRng),
+# where narration goes and the compiled board it is played on
+class Engine:
+    def __init__(self, policy: Policy = None, rng=random, say=silent, board: CompiledBoard = None):
+        self.policy = policy if policy is not None else Policy()
+        self.rng = rng if hasattr(rng, 'career_card') else StdlibRng(rng)
+        self.say = say
+        self._board = board
+        # the square whose events move_player is resolving, for policies that look ahead from it (see mcts_bot.py)
+        self.square = 0
+        # what move_player runs for each event, None for EVENT_HANDLERS (an engine can swap in its own, see game_log.py)
+        self.handlers = None
+
+    # the standard board is only compiled when a game first needs it, not when an engine is made
+    @property
+    def board(self) -> CompiledBoard:
+        if self._board is None:
+            self._board = standard_board()
+        return self._board
+
+    # a player's own policy wins over the engine's default one, a policy that looks at the engine asking it
+    # (Policy.follows_engine) is told which engine that is
+    def policy_for(self, player: Player) -> Policy:
+        policy = player.policy if player.policy is not None else self.policy
+        if policy.follows_engine:
+            policy.engine = self
+        return policy
+
+# min and max number of children from a single attempt
+MIN_KIDS = 0
+MAX_KIDS = 3
+
+# the engine used by the interactive game
+CONSOLE = Engine(InteractivePolicy(), random, TERMINAL)
+
 # may want to impliment this option in the Player class
-def move_player(target_player: Player) -> None:
+def move_player(target_player: Player, engine: Engine = None) -> None:
+    engine = engine or CONSOLE
+    board = engine.board
     start_position = target_player.position
-    input("Press any key to roll the die ")
-    target_player.move(roll_die())
+    engine.policy_for(target_player).pause("Press any key to roll the die ")
+    target_player.move(roll_die(engine.rng, engine.say), engine.say, board.length)
     end_position = target_player.position
-    
-    # this will handle if you hit any action square
-    if any(x in ALL_EVENT_SQUARES for x in (list(range(start_position+1,end_position+1)))):
-        # this will iterate through every square you passed while moving
-        for passed_square in (list(range(start_position+1,end_position+1))):
-            
-            # handles if you hit a pay square during moving
-            if passed_square in PAY_SQUARE.positions:
-                if target_player.career != UNEMPLOYED:
-                    print(f"{target_player} has recieved a paycheck!")
-                    target_player.pay()
-                else:
-                    print("if you had a job, you would have gotten paid...")
-                print(DIVIDER)
-        
-            # handles if you hit a Career Change square
-            if passed_square in CAREER_CHANGE.positions:
-                print("You've hit a Career Change square!")
-                
-                # draw a career card for the current player, if they're employed, they get a choice
-                if target_player.career != UNEMPLOYED:
-                    draw_career_card(target_player, True)
-                    
-                # draw a card and if the player is unemployed, they don't get a choice if they take the job
-                else:
-                    draw_career_card(target_player, False)
-                print(DIVIDER)
-                
-            # handles if you hit an Education Change square
-            if passed_square in EDUCATION_CHANCE.positions:
-                print("You've hit an Education tile!")
-                # draw a college card for the current player, with the option to pursue it (for a price)
-                draw_college_card(target_player, True)
-                print(DIVIDER)
-        
-            # handles if you hit a relationship square
-            if passed_square in RELATIONSHIP.positions:
-                print("You've hit a Romance opportunity tile!")
-                handle_relationship(target_player)
-                print(DIVIDER)
-            
-            # handles if you hit a children square
-            if passed_square in CHILDREN.positions:
-                print("You've ran into an opportunity to have children!")
-                handle_children(target_player)
-                print(DIVIDER)
-    
+
+    # only the squares with a decision on them are walked, the paychecks passed in between
+    # are counted from the pay squares index (a pay square is resolved before the other events on it)
+    # (the bisects are paychecks_through and decisions_through inlined, this runs on every move)
+    decision_squares = board.decision_squares
+    handlers = engine.handlers or EVENT_HANDLERS
+    paid = bisect.bisect_right(board.pay_square_list, start_position)
+    for index in range(bisect.bisect_right(decision_squares, start_position), bisect.bisect_right(decision_squares, end_position)):
+        handle_paychecks(target_player, board.decision_paychecks[index] - paid, engine)
+        paid = board.decision_paychecks[index]
+        engine.square = decision_squares[index]
+        for event in board.decision_events[index]:
+            handlers[event](target_player, engine)
+    handle_paychecks(target_player, bisect.bisect_right(board.pay_square_list, end_position) - paid, engine)
+
 # roll a single 6 sided die
-def roll_die() -> int:
+def roll_die(rng=None, say=None) -> int:
+    # the random module unless told otherwise, as it always was
+    if not hasattr(rng, 'roll'):
+        rng = StdlibRng(rng if rng is not None else random)
+    say = say or TERMINAL
     min = 1
     max = 6
-    print("Rolling die!")
-    dice_roll = random.randint(min,max)
-    print(str(dice_roll) + '!')
-    
+    say("Rolling die!")
+    dice_roll = rng.roll(min,max)
+    say("{}!", dice_roll)
+
     return dice_roll
 
 # roll to see if you are romantically successful
-def handle_relationship(target_player: Player) -> None:
-    
+def handle_relationship(target_player: Player, engine: Engine = None) -> None:
+    engine = engine or CONSOLE
+    say = engine.say
+
     # if the player is not currently married
     if not target_player.married:
-        choice = input("Press 1 if you wish to attempt to get married (50%/ chance), press 2 otherwise: ")
-        while choice not in ['1', '2']:
-            choice = input("Please input valid response, 1 or 2: ")
-    
         # if they want to attempt getting married
-        if choice == '1':
+        if engine.policy_for(target_player).attempt_marriage(target_player):
             # generate a random boolena
-            outcome = bool(random.getrandbits(1))
+            outcome = engine.rng.coin()
             # if they were successful in the marriage attempt
             if outcome == True:
-                print("You got married!")
+                say("You got married!")
                 target_player.married = True
             # if they were unsuccessful
             else:
-                print("You were not successful!")
+                say("You were not successful!")
         # if they do not want to attempt getting married
         else:
-            print("You passed up on the chance to get married")
-    
+            say("You passed up on the chance to get married")
+
     # if they are already married, they cannot try to marry again
     else:
-        print("However, you are already married!")
-        
-    print(DIVIDER)
+        say("However, you are already married!")
+
+    say(DIVIDER)
 
 # handles the having children decision
-def handle_children(target_player: Player) -> None:
-    # min and max number of children
-    min = 0
-    max = 3
+def handle_children(target_player: Player, engine: Engine = None) -> None:
+    engine = engine or CONSOLE
+    say = engine.say
     # we only allow kids with married players
     if target_player.married:
-        choice = input(
-            f"Do you want to try for children (outcome {min}-{max})?\n" +
-            "1: Yes\n" +
-            "2: No" + '\n'
-            )
-        # this will ensure the choice is valid
-        while choice not in ['1','2']:
-            choice = input("Please enter a valid answer: 1 or 2")
-        
         # if they want to have children...
-        if choice == '1':
-            outcome = random.randint(min,max)
+        if engine.policy_for(target_player).attempt_children(target_player):
+            outcome = engine.rng.kids(MIN_KIDS,MAX_KIDS)
             # if you have children...
             if outcome > 0:
-                print(f"You had {outcome} kid(s)!")
+                say("You had {} kid(s)!", outcome)
                 target_player.kids += outcome
             # if you do not have children...
             else:
-                print("Unfortunately, you did not have any children this time")
+                say("Unfortunately, you did not have any children this time")
         # if they do not want children...
         else:
-            print("You chose not to try for children at this time")
+            say("You chose not to try for children at this time")
     # if the player is unmarried
     else:
-        print("Unfortunately, you are not married and don't feel comfortable having kids")
- 
+        say("Unfortunately, you are not married and don't feel comfortable having kids")
+
 # draw a career card and handle the situation
-def draw_career_card(active_player: Player, choice_to_pick: bool) -> None:
-    print('\n' + DIVIDER)
-    input("Press any key to draw your career card... ")
-    print(DIVIDER)
-    decision = '0'
-    drawn_career = random.choice(career_list)
-    print(f"You've drawn:\n{drawn_career}\n")
+def draw_career_card(active_player: Player, choice_to_pick: bool, engine: Engine = None) -> None:
+    engine = engine or CONSOLE
+    say = engine.say
+    say("\n{}", DIVIDER)
+    engine.policy_for(active_player).pause("Press any key to draw your career card... ")
+    say(DIVIDER)
+    drawn_career = engine.rng.career_card(career_list)
+    say("You've drawn:\n{}\n", drawn_career)
     if not choice_to_pick:
         active_player.career = drawn_career
-        print(f'{active_player} is now a(n) {drawn_career.name}')
-        
+        say("{} is now a(n) {}", active_player, drawn_career.name)
+
     else:
         # will handle if they dont already have this career
         if drawn_career != active_player.career:
-            decision = input(f"Would you like to switch your career to {drawn_career.name}?\n1: Switch\n2: Keep\n")
-            
-            # this will run as long as they are not providing a valid response
-            while decision not in ['1', '2']:
-                decision = input("Please enter a valid option:\n1: Switch\n2: Keep")
-        
             # if they choose to change careers...
-            if decision == '1':
+            if engine.policy_for(active_player).switch_career(active_player, drawn_career):
                 active_player.career = drawn_career
-                print(f"You've decided to switch to {active_player.career.name}")
+                say("You've decided to switch to {}", active_player.career.name)
             else:
-                print(f"You've decided to stay a(n) {active_player.career.name}")
+                say("You've decided to stay a(n) {}", active_player.career.name)
         # this will handle if they already have this career
         else:
-            print(f"You already are a(n) {drawn_career.name}, so moving on!\n")
-    
+            say("You already are a(n) {}, so moving on!\n", drawn_career.name)
+
 # draw a random college card
-def draw_college_card(active_player: Player, choice_to_pick: bool) -> None:
-    print(DIVIDER)
-    input("Press any key to draw a college card... ")
-    print(DIVIDER)
-    decision = '0'
-    drawn_college = random.choice(education_list)
-    print(f"You've drawn\n{drawn_college.full_info()}")
+def draw_college_card(active_player: Player, choice_to_pick: bool, engine: Engine = None) -> None:
+    engine = engine or CONSOLE
+    say = engine.say
+    say(DIVIDER)
+    engine.policy_for(active_player).pause("Press any key to draw a college card... ")
+    say(DIVIDER)
+    drawn_college = engine.rng.college_card(education_list)
+    # (the text of drawn_college.full_info())
+    say("You've drawn\n{0.name}\n({0.name} multiplies your salary by {1})", drawn_college, 1.0 + drawn_college.bonus)
     if not choice_to_pick:
         active_player.education.append(drawn_college)
         active_player.total_bonus += drawn_college.bonus
-        print(f"{active_player} starts off having studied at {drawn_college.name}\n")
-        
-    else:
-        decision = input(
-            f"Would you like to recieve education at a {drawn_college.name}? It will cost ${drawn_college.cost}\n" +
-            "(Note that these effects do compound and stack)\n" +
-            "Press 1 if Yes, 2 if No: "
-        )
-        # this loop will ensure that the user puts in a valid answer
-        while decision not in ['1','2']:
-            decision = input("Please choose a valid answer:\n1: Change\n2:Keep")
+        say("{} starts off having studied at {}\n", active_player, drawn_college.name)
 
+    else:
         # if they decide to recieve the education
-        if decision == '1':
+        if engine.policy_for(active_player).pursue_education(active_player, drawn_college):
             # add the education to their list of educations
             active_player.education.append(drawn_college)
             # the player spends the amount the education costs
             active_player.spend(drawn_college.cost)
             # this will update the player's education bonus
             active_player.total_bonus += drawn_college.bonus
-            print(f"You've decided to recieve education at {drawn_college.name} and spent {drawn_college.cost}")
+            say("You've decided to recieve education at {} and spent {}", drawn_college.name, drawn_college.cost)
         else:
-            print(f"You've decided to not to pursue further education\n")
-            
+            say("You've decided to not to pursue further education\n")
+
+# sets up a player's starting path, a career card or a college card depending on the choice
+def start_player(active_player: Player, engine: Engine = None) -> None:
+    engine = engine or CONSOLE
+    # if they choose to start with a career
+    if engine.policy_for(active_player).starting_path(active_player) == CAREER:
+        draw_career_card(active_player, False, engine)
+
+    # if they choose to start with college
+    else:
+        draw_college_card(active_player, False, engine)
+    active_player.initialized = True
+
+# handles the pay squares passed on the way to a square, count is how many of them there were
+def handle_paychecks(target_player: Player, count: int, engine: Engine) -> None:
+    if count:
+        say = engine.say
+        # a headless game says nothing, so the paychecks passed are paid in one go,
+        # everywhere else each paycheck is still announced on its own
+        if say is silent:
+            if target_player.career != UNEMPLOYED:
+                target_player.pay(say, count)
+            return
+        for _ in range(count):
+            if target_player.career != UNEMPLOYED:
+                say("{} has recieved a paycheck!", target_player)
+                target_player.pay(say)
+            else:
+                say("if you had a job, you would have gotten paid...")
+            say(DIVIDER)
+
+# handles if you hit a Career Change square
+def handle_career_change(target_player: Player, engine: Engine) -> None:
+    engine.say("You've hit a Career Change square!")
+    # draw a career card for the current player, if they're employed, they get a choice
+    # if the player is unemployed, they don't get a choice if they take the job
+    draw_career_card(target_player, target_player.career != UNEMPLOYED, engine)
+    engine.say(DIVIDER)
+
+# handles if you hit an Education Change square
+def handle_education_chance(target_player: Player, engine: Engine) -> None:
+    engine.say("You've hit an Education tile!")
+    # draw a college card for the current player, with the option to pursue it (for a price)
+    draw_college_card(target_player, True, engine)
+    engine.say(DIVIDER)
+
+# handles if you hit a relationship square
+def handle_romance(target_player: Player, engine: Engine) -> None:
+    engine.say("You've hit a Romance opportunity tile!")
+    handle_relationship(target_player, engine)
+    engine.say(DIVIDER)
+
+# handles if you hit a children square
+def handle_children_square(target_player: Player, engine: Engine) -> None:
+    engine.say("You've ran into an opportunity to have children!")
+    handle_children(target_player, engine)
+    engine.say(DIVIDER)
+
+# what move_player runs for each event on a passed square (paychecks are counted separately by handle_paychecks)
+EVENT_HANDLERS = {
+    CAREER_CHANGE: handle_career_change,
+    EDUCATION_CHANCE: handle_education_chance,
+    RELATIONSHIP: handle_romance,
+    CHILDREN: handle_children_square,
+}
+
+# plays a whole game with no human involved, every decision goes to the policy
+# players can be names or Player objects, the finished players are returned
+# (or on engine, if one is given, instead of one made from policy, rng, say and board)
+# this plays one game at a time in plain Python, around 20k one-player games a second on a core. For balance analysis
+# at hundreds of thousands of games a second use batch_engine.simulate_batch (or monte_carlo.run_monte_carlo across
+# cores), which plays the same rules for a whole array of games at once, around 370k games a second on a core
+def simulate_game(players: list, policy: Policy = None, rng=random, say=silent, board: CompiledBoard = None,
+                  engine: Engine = None) -> list[Player]:
+    engine = engine or Engine(policy, rng, say, board)
+    players = [each if isinstance(each, Player) else Player(each) for each in players]
+    for each in players:
+        if not each.initialized:
+            start_player(each, engine)
+
+    # every round each player who hasn't retired yet takes one move
+    active = [each for each in players if not each.retired]
+    rounds = 0
+    while active:
+        rounds += 1
+        for each in active:
+            move_player(each, engine)
+        active = [each for each in active if not each.retired]
+    _record_game(rounds)
+    return players
+
+####################
+# Instrumentation
+####################
+# opt-in counters and timers for the engine. Nothing here runs until enable_instrumentation() swaps the
+# instrumented versions of the handlers in, and disable_instrumentation() puts the plain ones back, so a
+# game played without instrumentation pays nothing for it
+
+# the handlers whose cumulative time is measured, module functions by name plus Player.pay
+TIMED_HANDLERS = ['handle_relationship', 'handle_children', 'draw_career_card', 'draw_college_card']
+
+# what the instrumentation has collected since it was enabled (or last reset)
+class Metrics:
+    def __init__(self):
+        # event name -> number of times it fired (every paycheck counts)
+        self.events = {event.name: 0 for event in LIST_OF_EVENTS}
+        # handler name -> [calls, seconds]
+        self.handlers = {name: [0, 0.0] for name in TIMED_HANDLERS + ['Player.pay']}
+        # number of rounds -> number of games that took that many
+        self.turns_per_game = {}
+
+    # a plain dict copy of everything, safe to keep while the game carries on
+    def snapshot(self) -> dict:
+        games = sum(self.turns_per_game.values())
+        turns = sum(turns * count for turns, count in self.turns_per_game.items())
+        return {
+            'events': dict(self.events),
+            'handlers': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in self.handlers.items()},
+            'games': games,
+            'turns': turns,
+            'turns_per_game': dict(sorted(self.turns_per_game.items())),
+        }
+
+    # the snapshot in the Prometheus text exposition format
+    def prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = ['# TYPE game_of_life_events_total counter']
+        lines += [f'game_of_life_events_total{{event="{name}"}} {count}' for name, count in snapshot['events'].items()]
+        lines.append('# TYPE game_of_life_handler_calls_total counter')
+        lines += [f'game_of_life_handler_calls_total{{handler="{name}"}} {handler["calls"]}' for name, handler in snapshot['handlers'].items()]
+        lines.append('# TYPE game_of_life_handler_seconds_total counter')
+        lines += [f'game_of_life_handler_seconds_total{{handler="{name}"}} {handler["seconds"]:.9f}' for name, handler in snapshot['handlers'].items()]
+        lines.append('# TYPE game_of_life_turns_per_game histogram')
+        cumulative = 0
+        for turns, count in snapshot['turns_per_game'].items():
+            cumulative += count
+            lines.append(f'game_of_life_turns_per_game_bucket{{le="{turns}"}} {cumulative}')
+        lines.append(f'game_of_life_turns_per_game_bucket{{le="+Inf"}} {snapshot["games"]}')
+        lines.append(f'game_of_life_turns_per_game_sum {snapshot["turns"]}')
+        lines.append(f'game_of_life_turns_per_game_count {snapshot["games"]}')
+        return '\n'.join(lines) + '\n'
+
+# the metrics being collected, None while instrumentation is off
+METRICS = None
+# the plain versions of everything that was swapped out, to put back on disable
+_uninstrumented = {}
+
+# called by simulate_game with the number of rounds each finished game took, a no-op unless instrumented
+def _record_game(rounds: int) -> None:
+    pass
+
+def _timed(name: str, handler):
+    @functools.wraps(handler)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            totals = METRICS.handlers[name]
+            totals[0] += 1
+            totals[1] += time.perf_counter() - start
+    return timed
+
+def _counted(name: str, handler):
+    @functools.wraps(handler)
+    def counted(target_player: Player, engine: Engine) -> None:
+        METRICS.events[name] += 1
+        handler(target_player, engine)
+    return counted
+
+def _counted_paychecks(target_player: Player, count: int, engine: Engine) -> None:
+    METRICS.events[PAY_SQUARE.name] += count
+    _uninstrumented['handle_paychecks'](target_player, count, engine)
+
+def _recorded_game(rounds: int) -> None:
+    METRICS.turns_per_game[rounds] = METRICS.turns_per_game.get(rounds, 0) + 1
+
+# starts collecting metrics (from zero), returns the Metrics object being filled in
+def enable_instrumentation() -> Metrics:
+    global METRICS
+    disable_instrumentation()
+    METRICS = Metrics()
+    module = globals()
+    for name in TIMED_HANDLERS + ['handle_paychecks', '_record_game']:
+        _uninstrumented[name] = module[name]
+    _uninstrumented['Player.pay'] = Player.pay
+    _uninstrumented['EVENT_HANDLERS'] = dict(EVENT_HANDLERS)
+
+    for name in TIMED_HANDLERS:
+        module[name] = _timed(name, module[name])
+    Player.pay = _timed('Player.pay', Player.pay)
+    module['handle_paychecks'] = _counted_paychecks
+    module['_record_game'] = _recorded_game
+    for event, handler in EVENT_HANDLERS.items():
+        EVENT_HANDLERS[event] = _counted(event.name, handler)
+    return METRICS
+
+# stops collecting and puts the plain handlers back, returns the final metrics (None if it wasn't enabled)
+def disable_instrumentation():
+    global METRICS
+    if _uninstrumented:
+        module = globals()
+        Player.pay = _uninstrumented.pop('Player.pay')
+        EVENT_HANDLERS.update(_uninstrumented.pop('EVENT_HANDLERS'))
+        for name, handler in _uninstrumented.items():
+            module[name] = handler
+        _uninstrumented.clear()
+    metrics, METRICS = METRICS, None
+    return metrics
+
+# writes the current metrics to a local file, as 'prometheus' text or 'json'
+def export_metrics(path: str, format: str = 'prometheus') -> None:
+    if METRICS is None:
+        raise RuntimeError("instrumentation is not enabled")
+    if format == 'prometheus':
+        text = METRICS.prometheus()
+    elif format == 'json':
+        text = json.dumps(METRICS.snapshot(), indent=1)
+    else:
+        raise ValueError(f"unknown metrics format {format!r}")
+    # write next to the target and swap it in, so a scraper never reads half a file
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as out:
+        out.write(text)
+    os.replace(temporary, path)
+
+####################
+# Snapshots
+####################
+# a game's full state (players, whose turn it is, the rng) packed into a small versioned binary blob, cheap enough
+# to take every turn: resume a session later, or restore the same snapshot many times to fork what-if games
+SNAPSHOT_MAGIC = b'GOLS'
+SNAPSHOT_VERSION = 1
+
+# cards are stored as their index in these lists
+SNAPSHOT_CAREERS = [UNEMPLOYED] + career_list
+SNAPSHOT_EDUCATIONS = [GED] + education_list
+
+# header: magic, version, whose turn it is, number of players
+_SNAPSHOT_HEADER = struct.Struct('<4sHII')
+# per player after the name and character: balance, kids, position, total_bonus, career, flags, number of educations
+_SNAPSHOT_PLAYER = struct.Struct('<qiidBBB')
+_RETIRED, _INITIALIZED, _MARRIED = 1, 2, 4
+
+# how the rng state is stored
+RNG_NONE, RNG_RANDOM, RNG_NUMPY, RNG_GAME, RNG_GAME_ANTITHETIC = 0, 1, 2, 3, 4
+# random.Random state: version, the 625 word Mersenne Twister state, whether there's a cached gauss value, and that value
+_MT_STATE = struct.Struct('<B625IBd')
+
+def _pack_text(text: str) -> bytes:
+    encoded = text.encode()
+    return struct.pack('<H', len(encoded)) + encoded
+
+def _unpack_text(data: bytes, offset: int) -> tuple:
+    (length,) = struct.unpack_from('<H', data, offset)
+    offset += 2
+    return data[offset:offset + length].decode(), offset + length
+
+# a GameRng is stored as its seed, game id and how far each stream has been read
+_GAME_RNG = struct.Struct('<Q' + 'I' * len(GameRng.STREAMS))
+
+# packs the state of a GameRng, a StdlibRng, a random.Random (or the random module itself) or a numpy Generator
+def _pack_rng(rng) -> bytes:
+    if rng is None:
+        return bytes([RNG_NONE])
+    if isinstance(rng, GameRng):
+        kind = RNG_GAME_ANTITHETIC if rng.antithetic else RNG_GAME
+        return bytes([kind]) + _pack_text(str(rng.seed)) + _GAME_RNG.pack(rng.game_id, *rng.used)
+    if isinstance(rng, StdlibRng):
+        rng = rng.source
+    if hasattr(rng, 'bit_generator'):
+        state = json.dumps(rng.bit_generator.state).encode()
+        return bytes([RNG_NUMPY]) + struct.pack('<I', len(state)) + state
+    version, words, gauss_next = rng.getstate()
+    return bytes([RNG_RANDOM]) + _MT_STATE.pack(version, *words, gauss_next is not None, gauss_next or 0.0)
+
+# restores an rng state, into rng if one is given (it must be the same kind) or a new one, a GameRng is always rebuilt
+def _unpack_rng(data: bytes, offset: int, rng=None) -> tuple:
+    kind = data[offset]
+    offset += 1
+    if kind == RNG_NONE:
+        return rng, offset
+    if kind == RNG_NUMPY:
+        (length,) = struct.unpack_from('<I', data, offset)
+        state = json.loads(data[offset + 4:offset + 4 + length])
+        if rng is None:
+            import numpy
+            rng = numpy.random.Generator(getattr(numpy.random, state['bit_generator'])())
+        rng.bit_generator.state = state
+        return rng, offset + 4 + length
+    if kind in (RNG_GAME, RNG_GAME_ANTITHETIC):
+        seed, offset = _unpack_text(data, offset)
+        game_id, *used = _GAME_RNG.unpack_from(data, offset)
+        # every stream jumps to where it was, nothing is replayed
+        rng = GameRng(int(seed), game_id, kind == RNG_GAME_ANTITHETIC)
+        rng.skip_to(used)
+        return rng, offset + _GAME_RNG.size
+    if kind == RNG_RANDOM:
+        fields = _MT_STATE.unpack_from(data, offset)
+        rng = rng if rng is not None else random.Random()
+        if isinstance(rng, StdlibRng):
+            rng.source.setstate((fields[0], fields[1:626], fields[627] if fields[626] else None))
+            return rng, offset + _MT_STATE.size
+        rng.setstate((fields[0], fields[1:626], fields[627] if fields[626] else None))
+        return rng, offset + _MT_STATE.size
+    raise ValueError(f"unknown rng kind {kind} in snapshot")
+
+# packs players, the index of the player whose turn it is, and the rng the game draws from
+def snapshot_game(players: list[Player], turn: int = 0, rng=None) -> bytes:
+    parts = [_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, turn, len(players))]
+    for player in players:
+        flags = (_RETIRED if player.retired else 0) | (_INITIALIZED if player.initialized else 0) | (_MARRIED if player.married else 0)
+        parts.append(_pack_text(player.name))
+        parts.append(_pack_text(player.character))
+        parts.append(_SNAPSHOT_PLAYER.pack(
+            player.balance, player.kids, player.position, player.total_bonus,
+            SNAPSHOT_CAREERS.index(player.career), flags, len(player.education),
+        ))
+        parts.append(bytes(SNAPSHOT_EDUCATIONS.index(education) for education in player.education))
+    parts.append(_pack_rng(rng))
+    return b''.join(parts)
+
+# the opposite of snapshot_game, returns (players, turn, rng); pass rng to load the saved state into an existing one
+def restore_game(data: bytes, rng=None) -> tuple:
+    magic, version, turn, count = _SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not a game snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot version {version} is not supported (expected {SNAPSHOT_VERSION})")
+    offset = _SNAPSHOT_HEADER.size
+    players = []
+    for _ in range(count):
+        name, offset = _unpack_text(data, offset)
+        character, offset = _unpack_text(data, offset)
+        balance, kids, position, total_bonus, career, flags, educations = _SNAPSHOT_PLAYER.unpack_from(data, offset)
+        offset += _SNAPSHOT_PLAYER.size
+        player = Player(name)
+        player.character = character
+        player.balance = balance
+        player.kids = kids
+        player.position = position
+        player.total_bonus = total_bonus
+        player.career = SNAPSHOT_CAREERS[career]
+        player.retired = bool(flags & _RETIRED)
+        player.initialized = bool(flags & _INITIALIZED)
+        player.married = bool(flags & _MARRIED)
+        player.education = [SNAPSHOT_EDUCATIONS[code] for code in data[offset:offset + educations]]
+        offset += educations
+        players.append(player)
+    rng, offset = _unpack_rng(data, offset, rng)
+    return players, turn, rng
+
+# snapshot_game straight to a file
+def save_game(path: str, players: list[Player], turn: int = 0, rng=None) -> None:
+    with open(path, 'wb') as save_file:
+        save_file.write(snapshot_game(players, turn, rng))
+
+# restore_game straight from a file
+def load_game(path: str, rng=None) -> tuple:
+    with open(path, 'rb') as save_file:
+        return restore_game(save_file.read(), rng)
+
 # display the options a player has during their turn
 def display_options() -> None:
     print(
@@ -418,27 +1211,27 @@ def player_creation(active_player: Player)-> None:
             print("Your choice must be a valid alphabet letter")
         else:
             active_player.character = character_choice
-    display_starting_choices()
-    start_choice = input("Choose the path you want to start: ")
-    while start_choice not in [CAREER, EDUCATION]:
-        display_starting_choices()
-        start_choice = input(f"Please input either {CAREER} or {EDUCATION} to continue")
-    # if they choose to start with a career
-    if start_choice == CAREER:
-        draw_career_card(active_player, False)
+    # the starting path is asked and drawn by the engine
+    start_player(active_player, CONSOLE)
 
-    # if they choose to start with college
-    else:
-        draw_college_card(active_player, False)
-    
     print("You are now ready to begin your journey!")
-    active_player.initialized = True
     
 # this handles the actions a player chooses
 def action_handler(player_list: list[Player] , active_player: int) -> None:
     curr_player = player_list[active_player]
     passed = False
     already_moved = False
+
+    # a player with a policy of their own (a bot) gets no menu, it sets up if it hasn't yet, moves and then passes
+    # (a human sets up and moves in the same turn too)
+    if not isinstance(CONSOLE.policy_for(curr_player), InteractivePolicy):
+        if not curr_player.initialized:
+            curr_player.character = curr_player.name[:1]
+            start_player(curr_player, CONSOLE)
+        if not curr_player.retired:
+            move_player(curr_player, CONSOLE)
+        print("Passing the turn\n")
+        return
     
     #once someone passes the turn, leave action menu
     while not passed:
@@ -455,14 +1248,14 @@ def action_handler(player_list: list[Player] , active_player: int) -> None:
                 # handles if they want to move their player
                 elif (player_choice is MOVE):
                     if(already_moved is False):
-                        move_player(curr_player)
+                        move_player(curr_player, CONSOLE)
                         already_moved = True
                     else:
                         print("You've already moved!")
                 
                 # handles if they want to print the map
                 elif player_choice == SHOW_YOUR_MAP:
-                    print_board(board, curr_player)
+                    print_board(curr_player, player_list)
                 
                 # handles if they want to pass their turn
                 elif player_choice == PASS:
@@ -490,56 +1283,171 @@ def action_handler(player_list: list[Player] , active_player: int) -> None:
     #this occurs at the end of a player's turn
     print("Passing the turn\n")
             
-# potentially prints the board
-def print_board(board: list[list[any]], curr_player: Player) -> None:
-    
-    # handle the placement of the players character at player's current position
-    row = 0
-    
-    # if they are on a position that is greater than 18, snake them down a row on the map heading back to the left
-    if curr_player.position > COLUMNS:
-        row = 1
-        location = ( curr_player.positon - 18 )
-        old_symbol = board[row][-location]
-        board[row][-location] = curr_player.character
-    elif curr_player.position == 0:
-        location = curr_player.position
-        old_symbol = board[row][location]
-        board[row][location] = curr_player.character
-    else:
-        location = curr_player.position
-        old_symbol = board[row][location]
-        board[row][location] = curr_player.character
-    
-    
-    print(DIVIDER)
-    print(
-        "The map starts in the top left (position 0), flows to the right, and then snakes down and back to the left\n\n" +
-        "Legend:\n" +
-        "'_' = regular tile     | '$' = Payday                 | '<' = Opportunity for Children | '@' = Chance to Change Career\n" +
-        "'?' = Education Chance | '!' = Romance Opportunity    |\n " 
+####################
+# Board Rendering
+####################
+
+# ANSI escapes for redrawing a frame in place
+ANSI_HOME = '\x1b[H'
+ANSI_CLEAR_SCREEN = '\x1b[2J'
+ANSI_CLEAR_LINE = '\x1b[K'
+
+# shown on a square with more than one player on it
+SHARED_SQUARE = '*'
+
+# rows of a long map drawn either side of the player it's drawn for
+WINDOW_ROWS = 4
+
+# the map text of a compiled board, the squares snake in rows of `columns` (left to right, then back to the left).
+# each row of the empty map is built from the event index the first time it is drawn and kept, a frame only copies
+# the rows that have a player on them. a board too long to show whole is drawn as a window of rows around one player
+class BoardRenderer:
+    # characters before the first square of a row
+    INDENT = 2
+    # empty rows kept, enough for every row of boards many times the standard length
+    ROW_CACHE = 1 << 12
+
+    def __init__(self, board: CompiledBoard, columns: int = COLUMNS, window_rows: int = WINDOW_ROWS):
+        self.board = board
+        self.columns = columns
+        self.rows = -(-board.length // columns)
+        # rows drawn either side of the focused player's row when the map doesn't fit
+        self.window_rows = window_rows
+        self.windowed = self.rows > 2 * window_rows + 1
+        self._row_lines = {}
+        # the symbol of each combination of event bits, when events share a square the last one in the events list shows
+        self._symbols = {}
+
+        legend = ["'_' = Regular Tile"] + [f"'{event.symbol}' = {event.name}" for event in board.events]
+        legend.append(f"'{SHARED_SQUARE}' = More Than One Player")
+        self.header = (
+            "Players who haven't moved yet are on the start line. The map starts in the top left (position 1), flows to the right, " +
+            "and then snakes down and back to the left\n\n" +
+            "Legend:\n" +
+            '\n'.join(' | '.join(f'{entry:<22}' for entry in legend[first:first + 4]).rstrip() for first in range(0, len(legend), 4)) +
+            '\n'
         )
-    print(board)
-    print(f"{curr_player} is currently as position {curr_player.position}")
+
+    def symbol(self, mask: int) -> str:
+        if mask not in self._symbols:
+            self._symbols[mask] = '_'
+            for event in self.board.events:
+                if mask & self.board.bits[event]:
+                    self._symbols[mask] = event.symbol
+        return self._symbols[mask]
+
+    # the (row, character offset) of a square, the start (square 0) has no row
+    def cell(self, square: int) -> tuple:
+        if square <= 0:
+            return (None, None)
+        row, column = divmod(min(square, self.board.length) - 1, self.columns)
+        if row % 2:
+            column = self.columns - 1 - column
+        return (row, self.INDENT + 2 * column)
+
+    # the empty map text of one row
+    def row_line(self, row: int) -> str:
+        line = self._row_lines.get(row)
+        if line is None:
+            board = self.board
+            first = row * self.columns + 1
+            last = min(first + self.columns - 1, board.length)
+            cells = ['_'] * (last - first + 1) + [' '] * (self.columns - (last - first + 1))
+            if row % 2:
+                cells.reverse()
+            low = bisect.bisect_left(board.event_square_list, first)
+            high = bisect.bisect_right(board.event_square_list, last)
+            for square, mask in zip(board.event_square_list[low:high], board.event_mask_list[low:high]):
+                cells[(self.cell(square)[1] - self.INDENT) // 2] = self.symbol(mask)
+            line = ' ' * self.INDENT + ' '.join(cells)
+            if len(self._row_lines) >= self.ROW_CACHE:
+                self._row_lines.clear()
+            self._row_lines[row] = line
+        return line
+
+    # the rows to draw, all of them or a window around the square focus is on
+    def window(self, focus: int = 0) -> range:
+        if not self.windowed:
+            return range(self.rows)
+        row = max(self.cell(focus)[0] or 0, 0)
+        first = min(max(row - self.window_rows, 0), self.rows - (2 * self.window_rows + 1))
+        return range(first, first + 2 * self.window_rows + 1)
+
+    # the lines of the map (the start line, the squares shown if it's a window, then the rows)
+    # with every player's character on their square
+    def lines(self, players: list, rows: range = None) -> list[str]:
+        rows = rows if rows is not None else self.window()
+        lines = ['Start:']
+        if self.windowed:
+            last = min((rows[-1] + 1) * self.columns, self.board.length)
+            lines.append(f"Squares {rows[0] * self.columns + 1} to {last} of {self.board.length}")
+        top = len(lines)
+        lines += [self.row_line(row) for row in rows]
+
+        markers = {}
+        for player in players:
+            marker = player.character or '?'
+            row, offset = self.cell(player.position)
+            if row is None:
+                lines[0] += ' ' + marker
+            elif row in rows:
+                cell = (top + row - rows[0], offset)
+                markers[cell] = SHARED_SQUARE if cell in markers else marker
+        for (line, offset), marker in markers.items():
+            lines[line] = lines[line][:offset] + marker + lines[line][offset + 1:]
+        return lines
+
+    # the map as one string, windowed around the square focus is on
+    def render(self, players: list, focus: int = 0) -> str:
+        return self.header + '\n' + '\n'.join(self.lines(players, self.window(focus)))
+
+# one renderer per compiled board, built the first time the board is drawn
+_renderers = {}
+
+def board_renderer(board: CompiledBoard = None) -> BoardRenderer:
+    board = board if board is not None else standard_board()
+    if board not in _renderers:
+        _renderers[board] = BoardRenderer(board)
+    return _renderers[board]
+
+# a map kept on an ANSI terminal, each redraw only sends the lines that changed since the last one
+class BoardView:
+    def __init__(self, board: CompiledBoard = None):
+        self.renderer = board_renderer(board)
+        # what is on the screen, None until the first redraw
+        self.shown = None
+        # terminal line (1 based) of the start line, below the header and a blank line
+        self.top = self.renderer.header.count('\n') + 2
+
+    # the escape sequence that brings the screen up to date, the first one clears the screen and draws everything
+    # focus is the square the window of a long map follows
+    def redraw(self, players: list, status: str = '', focus: int = 0) -> str:
+        lines = self.renderer.lines(players, self.renderer.window(focus)) + [status]
+        shown, self.shown = self.shown, lines
+        if shown is None:
+            return ANSI_HOME + ANSI_CLEAR_SCREEN + self.renderer.header + '\n' + '\n'.join(lines)
+        changes = []
+        for number, (old, new) in enumerate(zip(shown, lines)):
+            if old != new:
+                changes.append(f'\x1b[{self.top + number};1H{new}{ANSI_CLEAR_LINE}')
+        return ''.join(changes)
+
+# prints the map with every player in players (just curr_player if not given) on it
+def print_board(curr_player: Player, players: list[Player] = None, board: CompiledBoard = None) -> None:
+    print(DIVIDER)
+    print(board_renderer(board).render(players if players is not None else [curr_player], curr_player.position))
+    print(f"{curr_player} is currently at position {curr_player.position}")
     print(DIVIDER)
-    
-    # re-establishes the map
-    board[row][location] = old_symbol
 
 def initialize_board() -> None:
-    # place action squares
-    for event in LIST_OF_EVENTS:
-        row = 0
-        for location in event.positions:
-            # 18 is the last column
-            if location > 18:
-                row = 1
-                # this way we can do negative index of it going back 
-                location = ( location - 18 )
-                board[row][-location] = event.symbol
-            # if supposed to be in the top row
-            else:
-                board[row][location-1] = event.symbol
+    import numpy as np
+    global board
+    # the map text is built here once, print_board only splices the players into it
+    renderer = board_renderer()
+    # and the numpy grid gets the action squares, a row of the map is every other character after the indent
+    board = np.full((ROWS,COLUMNS), '_', str)
+    for row in range(ROWS):
+        board[row] = list(renderer.row_line(row)[renderer.INDENT::2])
 
 # this is the menu for editing players at the start
 def display_player_menu():
@@ -630,32 +1538,119 @@ def initialization(player_list: list[Player]) -> None:
 def active_game(player_list: list[Player])-> None:
     #may make this random
     active_player = 0
-    all_players_retired = False
+    # how many players haven't retired yet, counted down as they retire (see lobby.py for games with thousands of players)
+    remaining_players = sum(not each.retired for each in player_list)
     # as long as there is 1 eligible player...
-    while not all_players_retired:
+    while remaining_players:
         # loop through each player in the list in order
         for active_player in range(len(player_list)):
-            remaining_player = False
             # if the given player is not retired...
             if not player_list[active_player].retired:
-                remaining_player = True
                 print(f"{player_list[active_player]}'s Turn\n")
                 action_handler(player_list, active_player)
+                if player_list[active_player].retired:
+                    remaining_players -= 1
             # if the player is retired...
             else:
                 print(f"{player_list[active_player]} is retired, continuing...\n")
-        
-        # this could be combined with all_players_retired I think
-        if not remaining_player:
-            all_players_retired = True
             
     print("All players are retired! Thank you for playing!\n")
 
-def main():
+def main(bots: list[Player] = ()):
     initialization(player_list)
+    # computer players join after the people who signed up
+    player_list.extend(bots)
     initialize_board()
     active_game(player_list)
-    
+
+# BOARD and board are made the first time something asks for them
+def __getattr__(name: str):
+    if name == 'BOARD':
+        return standard_board()
+    if name == 'board':
+        initialize_board()
+        return globals()['board']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+####################
+# Command Line
+####################
+
+# headless games straight from the command line, for scripts and quick checks:
+#   python -m game_of_life                 the interactive game
+#   python -m game_of_life simulate --games 1000 --seed 1 --policy no_college --out games.csv
+# only the standard library is imported for this, numpy and the renderer are never touched
+
+# one csv row per player per game
+SIMULATE_COLUMNS = ['game', 'player', 'balance', 'career', 'education', 'kids', 'married']
+
+def simulate_games(games: int, seed: int = 0, policy: Policy = None, players: int = 1, out=None) -> list[int]:
+    rng = random.Random(seed)
+    engine = Engine(policy, rng)
+    names = [f'player {number + 1}' for number in range(players)]
+    balances = []
+    if out is not None:
+        out.write(','.join(SIMULATE_COLUMNS) + '\n')
+    for game in range(games):
+        for player in simulate_game(names, engine=engine):
+            balances.append(player.balance)
+            if out is not None:
+                education = '+'.join(each.name for each in player.education)
+                out.write(f'{game},{player.name},{player.balance},{player.career.name},{education},{player.kids},{int(player.married)}\n')
+    return balances
+
+def cli(argv: list[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        main()
+        return 0
+
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m game_of_life', description='The Game of Life')
+    commands = parser.add_subparsers(dest='command', required=True)
+    simulate = commands.add_parser('simulate', help='play games with no input and report the balances')
+    simulate.add_argument('--games', type=int, default=1000)
+    simulate.add_argument('--seed', type=int, default=0)
+    simulate.add_argument('--policy', default='default', help='a strategy from tournament.py (default: default)')
+    simulate.add_argument('--players', type=int, default=1, help='players per game')
+    simulate.add_argument('--out', help='write every player of every game to this csv file')
+    play = commands.add_parser('play', help='the interactive game, with computer players at the table')
+    play.add_argument('--bots', type=int, default=1, help='computer players (Monte Carlo tree search, see mcts_bot.py)')
+    play.add_argument('--budget', type=float, default=0.5, help='seconds a computer player may think per decision')
+    play.add_argument('--workers', type=int, help='processes running the rollouts (default: all cores)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'play':
+        import mcts_bot
+        bots = mcts_bot.bot_players(args.bots, args.budget, args.workers)
+        try:
+            main(bots)
+        finally:
+            if bots:
+                print(mcts_bot.format_metrics(bots[0].policy))
+                bots[0].policy.close()
+        return 0
+
+    # the strategies live with the tournament, only imported when one is asked for
+    policy = Policy()
+    if args.policy != 'default':
+        import tournament
+        if args.policy not in tournament.STRATEGIES:
+            parser.error(f"unknown policy {args.policy}, choose from: {', '.join(tournament.STRATEGIES)}")
+        policy = tournament.STRATEGIES[args.policy]()
+
+    if args.out:
+        with open(args.out, 'w') as out:
+            balances = simulate_games(args.games, args.seed, policy, args.players, out)
+    else:
+        balances = simulate_games(args.games, args.seed, policy, args.players)
+    if balances:
+        print(f"{args.games:,} games, {len(balances):,} players, mean balance {sum(balances) / len(balances):,.0f} " +
+              f"(min {min(balances):,}, max {max(balances):,})")
+    return 0
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    # tournament.py and mcts_bot.py import game_of_life, which has to be this module rather than a second copy of it,
+    # so their policies subclass the same Policy and there is only one CONSOLE
+    sys.modules['game_of_life'] = sys.modules[__name__]
+    sys.exit(cli())
\ No newline at end of file
@@ -0,0 +1,377 @@
+# Description:  Asyncio game server. Hosts many tables at once over a plain TCP line protocol, every table is a coroutine
+#               that awaits its players' answers instead of blocking on input(), and uses the same menu as the terminal
+#               game (DISP_INFO, MOVE, PASS, SHOW_YOUR_MAP, END). Also has a scripted client to load test a server.
+#
+#               Protocol: the client's first line is "JOIN <table> <name>". After that the server sends text lines,
+#               and a line starting with "? " is a prompt: the client answers it with one line. Answers are the same
+#               keys the terminal game uses ('1', '2', 'X'...).
+#
+#               python game_server.py serve --port 7777 --seats 2
+#               python game_server.py load --clients 2000 --concurrency 500
+
+import argparse
+import asyncio
+import contextlib
+import time
+
+import game_of_life as life
+
+# how long a connection may sit on a prompt before it is dropped, in seconds
+IDLE_TIMEOUT = 300.0
+# longest line a client may send
+MAX_LINE = 1024
+
+# raised when a player leaves, times out or disconnects
+class PlayerGone(Exception):
+    pass
+
+# one player's connection
+class Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, idle_timeout: float):
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+
+    # sends lines and waits for the socket buffer to drain, so a slow client slows down its own table only,
+    # and a client that stops reading altogether is dropped after the idle timeout like one that stops answering
+    async def send(self, *lines: str) -> None:
+        if self.writer.is_closing():
+            raise PlayerGone()
+        self.writer.write(''.join(line + '\n' for line in '\n'.join(lines).split('\n')).encode())
+        try:
+            await asyncio.wait_for(self.writer.drain(), self.idle_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            self.writer.close()
+            raise PlayerGone()
+
+    async def read_line(self) -> str:
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            await self.send("Timed out, leaving the table")
+            raise PlayerGone()
+        except (ConnectionError, ValueError):
+            raise PlayerGone()
+        if not line:
+            raise PlayerGone()
+        return line.decode(errors='replace').strip()
+
+    # sends a prompt and waits for one of the valid answers
+    async def ask(self, prompt: str, valid: list[str] = None) -> str:
+        while True:
+            await self.send('? ' + prompt)
+            answer = await self.read_line()
+            if valid is None or answer in valid:
+                return answer
+            await self.send("Invalid input")
+
+    def close(self) -> None:
+        self.writer.close()
+
+# raised by RemotePolicy when a decision comes up that the player hasn't answered yet
+class _NeedAnswer(Exception):
+    def __init__(self, prompt: str, valid: list[str]):
+        self.prompt = prompt
+        self.valid = valid
+
+# a policy that can't wait: it replays the answers gathered so far and asks for the next one by raising _NeedAnswer
+class RemotePolicy(life.Policy):
+    def __init__(self, answers: list[str]):
+        self.answers = answers
+        self.asked = 0
+
+    def _answer(self, prompt: str, valid: list[str]) -> str:
+        if self.asked == len(self.answers):
+            raise _NeedAnswer(prompt, valid)
+        self.asked += 1
+        return self.answers[self.asked - 1]
+
+    def starting_path(self, player: life.Player) -> str:
+        return self._answer(f"path {life.CAREER}:career {life.EDUCATION}:college", [life.CAREER, life.EDUCATION])
+
+    def switch_career(self, player: life.Player, drawn_career: life.Career) -> bool:
+        return self._answer(f"switch career to {drawn_career.name}? 1:switch 2:keep", ['1', '2']) == '1'
+
+    def pursue_education(self, player: life.Player, drawn_college: life.Education) -> bool:
+        return self._answer(f"study at {drawn_college.name} for ${drawn_college.cost}? 1:yes 2:no", ['1', '2']) == '1'
+
+    def attempt_marriage(self, player: life.Player) -> bool:
+        return self._answer("try to get married (50% chance)? 1:yes 2:no", ['1', '2']) == '1'
+
+    def attempt_children(self, player: life.Player) -> bool:
+        return self._answer(f"try for children ({life.MIN_KIDS}-{life.MAX_KIDS})? 1:yes 2:no", ['1', '2']) == '1'
+
+# one game, played by the players that joined it
+class Table:
+    def __init__(self, table_id: str, seats: int, rng: life.GameRng, board: life.CompiledBoard = None):
+        self.table_id = table_id
+        self.seats = seats
+        self.rng = rng
+        self.board = board if board is not None else life.BOARD
+        self.players = []
+        self.connections = []
+        self.started = False
+
+    def full(self) -> bool:
+        return len(self.players) == self.seats
+
+    async def broadcast(self, *lines: str) -> None:
+        for connection in list(self.connections):
+            with contextlib.suppress(PlayerGone):
+                await connection.send(*lines)
+
+    # runs an engine step (start_player or move_player) for a remote player. The engine can't await, so whenever it
+    # reaches a decision it hasn't got an answer for, the player and rng are put back as they were, the narration so
+    # far is sent, the answer is awaited, and the step is run again from the start with one more answer
+    async def resolve(self, step, player: life.Player, connection: Connection) -> None:
+        saved = life.snapshot_game([player], 0, self.rng)
+        answers = []
+        sent = 0
+        while True:
+            narration = life.BufferedSink()
+            engine = life.Engine(RemotePolicy(answers), self.rng, narration, self.board)
+            try:
+                step(player, engine)
+            except _NeedAnswer as need:
+                await connection.send(*narration.lines(sent))
+                sent = len(narration.events)
+                answers.append(await connection.ask(need.prompt, need.valid))
+                restored, _, self.rng = life.restore_game(saved)
+                for field in life.Player.__slots__:
+                    if field != 'policy':
+                        setattr(player, field, getattr(restored[0], field))
+                continue
+            await connection.send(*narration.lines(sent))
+            return
+
+    async def setup_player(self, player: life.Player, connection: Connection) -> None:
+        character = ''
+        while not character.isalpha():
+            character = await connection.ask("Choose a letter to represent your character")
+        player.character = character
+        await self.resolve(life.start_player, player, connection)
+        await connection.send("You are now ready to begin your journey!")
+
+    # the action menu of one turn, same choices as action_handler
+    async def take_turn(self, player: life.Player, connection: Connection) -> None:
+        already_moved = False
+        menu = f"{life.DISP_INFO}:info {life.MOVE}:move {life.PASS}:pass {life.SHOW_YOUR_MAP}:map {life.END}:end"
+        while not player.retired:
+            choice = await connection.ask(menu)
+            if choice == life.DISP_INFO:
+                await connection.send(player.info_text())
+            elif choice == life.MOVE:
+                if already_moved:
+                    await connection.send("You've already moved!")
+                else:
+                    await self.resolve(life.move_player, player, connection)
+                    already_moved = True
+            elif choice == life.SHOW_YOUR_MAP:
+                await connection.send(render_map(player, self.players, self.board))
+            elif choice == life.PASS:
+                return
+            elif choice == life.END:
+                if await connection.ask("Are you sure you would like to leave the game? Y/N", ['Y', 'N']) == 'Y':
+                    raise PlayerGone()
+                await connection.send("Returning to game...")
+            else:
+                await connection.send("Not a valid choice")
+        await connection.send(
+            f"You've reached the end of the game as a {player.career.name} and retired with a balance of ${player.balance}!",
+            f"You also had {player.kids} kids!",
+        )
+
+    # the whole game, the players still playing are kept in order and dropped as they retire or leave
+    async def run(self) -> None:
+        self.started = True
+        seated = list(zip(self.players, self.connections))
+        await self.broadcast("Starting with players: " + ', '.join(player.name for player in self.players))
+        playing = []
+        for player, connection in seated:
+            try:
+                await self.setup_player(player, connection)
+                playing.append((player, connection))
+            except PlayerGone:
+                self.leave(player, connection)
+
+        while playing:
+            still_playing = []
+            for player, connection in playing:
+                await self.broadcast(f"{player}'s Turn")
+                try:
+                    await self.take_turn(player, connection)
+                except PlayerGone:
+                    self.leave(player, connection)
+                    continue
+                if not player.retired:
+                    still_playing.append((player, connection))
+            playing = still_playing
+
+        await self.broadcast("All players are retired! Thank you for playing!")
+        for connection in self.connections:
+            connection.close()
+
+    def leave(self, player: life.Player, connection: Connection) -> None:
+        player.retired = True
+        if connection in self.connections:
+            self.connections.remove(connection)
+        connection.close()
+
+# the map with everyone at the table on it, as text
+def render_map(player: life.Player, players: list[life.Player], board: life.CompiledBoard = None) -> str:
+    renderer = life.board_renderer(board or life.BOARD)
+    return renderer.render(players) + f"\n{player} is currently at position {player.position}"
+
+# accepts connections and seats them at tables
+class GameServer:
+    def __init__(self, seats: int = 1, seed: int = 0, idle_timeout: float = IDLE_TIMEOUT, board: life.CompiledBoard = None):
+        self.seats = seats
+        self.seed = seed
+        self.idle_timeout = idle_timeout
+        self.board = board
+        # tables still waiting for players
+        self.tables = {}
+        self.tables_started = 0
+        self.running = set()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = Connection(reader, writer, self.idle_timeout)
+        try:
+            words = (await connection.read_line()).split(maxsplit=2)
+            while len(words) != 3 or words[0] != 'JOIN':
+                await connection.send("Send: JOIN <table> <name>")
+                words = (await connection.read_line()).split(maxsplit=2)
+        except PlayerGone:
+            connection.close()
+            return
+        _, table_id, name = words
+
+        table = self.tables.get(table_id)
+        if table is None:
+            table = Table(table_id, self.seats, life.GameRng(self.seed, self.tables_started), self.board)
+            self.tables_started += 1
+            self.tables[table_id] = table
+        table.players.append(life.Player(name))
+        table.connections.append(connection)
+        # the table is taken off the waiting list before the await below, which lets the other players join
+        full = table.full()
+        if full:
+            del self.tables[table_id]
+        with contextlib.suppress(PlayerGone):
+            await connection.send(f"Joined table {table_id} ({len(table.players)}/{table.seats})")
+        if full:
+            task = asyncio.create_task(table.run())
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 7777) -> None:
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+####################
+# Load testing
+####################
+# a scripted player: takes the career path, always says yes, moves then passes every turn
+# returns the seconds it took the server to answer each of its prompts
+async def scripted_client(host: str, port: int, table: str, name: str) -> list[float]:
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    latencies = []
+    moved = False
+    writer.write(f"JOIN {table} {name}\n".encode())
+    await writer.drain()
+    sent_at = time.perf_counter()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            line = line.decode().rstrip('\n')
+            if not line.startswith('? '):
+                if line.endswith("'s Turn"):
+                    moved = False
+                continue
+            latencies.append(time.perf_counter() - sent_at)
+            prompt = line[2:]
+            if prompt.startswith('Choose a letter'):
+                answer = 'A'
+            elif prompt.startswith(f'{life.DISP_INFO}:info'):
+                answer = life.PASS if moved else life.MOVE
+                moved = True
+            else:
+                answer = '1'
+            writer.write((answer + '\n').encode())
+            await writer.drain()
+            sent_at = time.perf_counter()
+    finally:
+        writer.close()
+    return latencies
+
+# connects `clients` scripted players, at most `concurrency` at once, seats players at tables of `seats`
+# and returns the prompt latency percentiles (seconds) and how long the whole run took
+# a table only starts once every seat is taken, so players are let in a whole table at a time
+async def load_test(host: str, port: int, clients: int, concurrency: int, seats: int = 1) -> dict:
+    if concurrency < seats:
+        raise ValueError(f"a concurrency of {concurrency} can't fill a table of {seats} seats")
+    limit = asyncio.Semaphore(concurrency // seats)
+    latencies = []
+
+    async def one(number: int) -> None:
+        latencies.extend(await scripted_client(host, port, f"load{number // seats}", f"bot{number}"))
+
+    async def table(first: int) -> None:
+        async with limit:
+            await asyncio.gather(*(one(number) for number in range(first, min(first + seats, clients))))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(table(first) for first in range(0, clients, seats)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(share: float) -> float:
+        return latencies[min(len(latencies) - 1, int(share * len(latencies)))] if latencies else 0.0
+
+    return {
+        'clients': clients,
+        'prompts': len(latencies),
+        'seconds': elapsed,
+        'p50': percentile(0.50),
+        'p90': percentile(0.90),
+        'p99': percentile(0.99),
+        'max': latencies[-1] if latencies else 0.0,
+    }
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Game of Life table server")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='host tables')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=7777)
+    serve.add_argument('--seats', type=int, default=1, help='players per table')
+    serve.add_argument('--seed', type=int, default=0)
+    serve.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT)
+    load = commands.add_parser('load', help='load test a running server with scripted clients')
+    load.add_argument('--host', default='127.0.0.1')
+    load.add_argument('--port', type=int, default=7777)
+    load.add_argument('--clients', type=int, default=1000)
+    load.add_argument('--concurrency', type=int, default=1000)
+    load.add_argument('--seats', type=int, default=1, help='must match the server')
+    load.add_argument('--target-p99', type=float, help='fail (exit 1) if the p99 prompt latency in ms is above this')
+    args = parser.parse_args(argv)
+
+    if args.command == 'load' and args.concurrency < args.seats:
+        parser.error(f"--concurrency ({args.concurrency}) must be at least --seats ({args.seats})")
+    if args.command == 'serve':
+        asyncio.run(GameServer(args.seats, args.seed, args.idle_timeout).serve(args.host, args.port))
+    else:
+        report = asyncio.run(load_test(args.host, args.port, args.clients, args.concurrency, args.seats))
+        print(
+            f"{report['clients']} clients, {report['prompts']} prompts in {report['seconds']:.2f}s, "
+            f"latency p50 {report['p50'] * 1000:.2f}ms p90 {report['p90'] * 1000:.2f}ms "
+            f"p99 {report['p99'] * 1000:.2f}ms max {report['max'] * 1000:.2f}ms"
+        )
+        if args.target_p99 is not None and report['p99'] * 1000 > args.target_p99:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
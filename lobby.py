@@ -0,0 +1,143 @@
+# Description:  Large lobbies. One game with thousands of players, for leaderboard events: players still playing wait in
+#               a queue that retired players simply aren't put back into, a live count of the players left ends the game,
+#               and every player without a human behind them (bots, and players with a scripted policy) moves in one
+#               batched step per round with the batch engine. Humans take their turns through action_handler as usual.
+#
+#               python lobby.py --bots 100000 --seed 1 --top 10
+#               python lobby.py --bots 5000 --human Ann --human Bob
+
+import argparse
+import collections
+import sys
+import time
+
+import numpy as np
+
+import game_of_life as life
+import batch_engine
+import tournament
+
+# players (or bots) moved together in the batched step, all on the same policy
+class BotGroup:
+    def __init__(self, policy: life.Policy, table: batch_engine.PlayerTable, players: list[life.Player] = None):
+        self.policy = policy
+        self.table = table
+        # the Player objects the rows came from, updated when the game ends (None for bots that only live in the table)
+        self.players = players
+        self.active = int(np.count_nonzero(~table.retired))
+
+class Lobby:
+    def __init__(self, players: list[life.Player] = (), bots: int = 0, bot_policy: life.Policy = None, seed: int = 0,
+                 board: life.CompiledBoard = None, engine: life.Engine = None):
+        self.engine = engine or life.CONSOLE
+        self.board = board if board is not None else self.engine.board
+        self.rng = np.random.default_rng(seed)
+        self.humans = []
+        self.groups = []
+        self.rounds = 0
+
+        # players answered by input() take their turns one by one, everybody else is grouped by policy
+        scripted = {}
+        for player in players:
+            if isinstance(self.engine.policy_for(player), life.InteractivePolicy):
+                self.humans.append(player)
+            else:
+                scripted.setdefault(id(self.engine.policy_for(player)), []).append(player)
+        for group in scripted.values():
+            policy = self.engine.policy_for(group[0])
+            # checked before starting anybody, starting them might take a while
+            batch_engine.require_batched(policy)
+            # the few scripted players who haven't started are started one by one, quietly
+            starter = life.Engine(policy, self.engine.rng, life.silent, self.board)
+            for player in group:
+                if not player.initialized:
+                    life.start_player(player, starter)
+            self.groups.append(BotGroup(policy, batch_engine.PlayerTable.from_players(group), group))
+        if bots:
+            table = batch_engine.PlayerTable(bots)
+            bot_policy = bot_policy if bot_policy is not None else life.Policy()
+            batch_engine.start_batch(table, bot_policy, self.rng)
+            self.groups.append(BotGroup(bot_policy, table))
+
+        # the humans still playing, by their index in self.humans, in turn order
+        self.queue = collections.deque(index for index, player in enumerate(self.humans) if not player.retired)
+        # everybody still playing, humans and bots
+        self.remaining = len(self.queue) + sum(group.active for group in self.groups)
+
+    # one turn for every player still playing: the humans in order, then everybody else in a single batched step
+    def play_round(self) -> None:
+        self.rounds += 1
+        for _ in range(len(self.queue)):
+            index = self.queue.popleft()
+            player = self.humans[index]
+            print(f"{player}'s Turn\n")
+            life.action_handler(self.humans, index)
+            if player.retired:
+                self.remaining -= 1
+            else:
+                self.queue.append(index)
+
+        for group in self.groups:
+            if group.active:
+                batch_engine.step_batch(group.table, group.policy, self.rng, self.board)
+                active = int(np.count_nonzero(~group.table.retired))
+                self.remaining -= group.active - active
+                group.active = active
+
+    # plays rounds until everybody has retired, then copies the grouped players' rows back into their Player objects
+    def play(self) -> None:
+        while self.remaining:
+            self.play_round()
+        for group in self.groups:
+            for row, player in enumerate(group.players or []):
+                played = group.table.player(row, player.name)
+                for field in life.Player.__slots__:
+                    if field not in ('name', 'character', 'policy'):
+                        setattr(player, field, getattr(played, field))
+
+    # the top players by balance as (name, balance), bots are named "bot <row>"
+    def standings(self, top: int = 10) -> list[tuple]:
+        balances = np.concatenate([np.array([player.balance for player in self.humans], dtype=np.int64)] +
+                                  [group.table.balance for group in self.groups])
+        top = min(top, len(balances))
+        if top == 0:
+            return []
+        best = np.argpartition(-balances, top - 1)[:top]
+        return [(self._name(int(index)), int(balances[index])) for index in best[np.argsort(-balances[best], kind='stable')]]
+
+    # the name of a player by their place in standings' balances (humans first, then every group in order)
+    def _name(self, index: int) -> str:
+        if index < len(self.humans):
+            return self.humans[index].name
+        index -= len(self.humans)
+        for group in self.groups:
+            if index < len(group.table):
+                return group.players[index].name if group.players is not None else f"bot {index}"
+            index -= len(group.table)
+
+    def player_count(self) -> int:
+        return len(self.humans) + sum(len(group.table) for group in self.groups)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Play one game with a very large number of players')
+    parser.add_argument('--bots', type=int, default=10000, help='players moved by the batch engine')
+    parser.add_argument('--policy', default='default', choices=list(tournament.STRATEGIES), help='what the bots decide')
+    parser.add_argument('--human', action='append', default=[], help='a player taking their turns at the keyboard (repeatable)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--top', type=int, default=10, help='places shown on the leaderboard')
+    args = parser.parse_args(argv)
+
+    if args.human:
+        life.initialize_board()
+    lobby = Lobby([life.Player(name) for name in args.human], args.bots, tournament.STRATEGIES[args.policy](), args.seed)
+    start = time.perf_counter()
+    lobby.play()
+    elapsed = time.perf_counter() - start
+    print(f"{lobby.player_count():,} players retired after {lobby.rounds} rounds in {elapsed:.2f}s " +
+          f"({lobby.player_count() / elapsed:,.0f} players/s)")
+    for place, (name, balance) in enumerate(lobby.standings(args.top), 1):
+        print(f"    {place:>3}. {name:<20} ${balance:,}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
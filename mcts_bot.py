@@ -0,0 +1,314 @@
+# Description:  Computer players that decide by Monte Carlo tree search. At every decision (starting path, switching
+#               career, paying for college, trying to marry, trying for children) each answer is tried with rollouts of
+#               the rest of the game from the square being resolved, played in batches by the batch engine on a process
+#               pool. The answers share out the rollouts by their upper confidence bounds (UCB) until the wall-clock
+#               budget of the decision runs out or one answer is clearly best, and the answer with the best mean wins.
+#               Rollout results are cached by the state they start from, so a state met again (on a later turn, or by
+#               another bot) starts from everything already learnt about it. The search is one level deep: later
+#               decisions are searched again when they come up.
+#
+#               python -m game_of_life play --bots 2 --budget 0.5
+#               python mcts_bot.py --games 200 --budget 0.05
+
+import argparse
+import bisect
+import math
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import game_of_life as life
+import batch_engine
+
+# the decisions a bot makes, and the event each one belongs to (the starting path is made before the first move)
+START = 'start'
+SWITCH = 'switch'
+EDUCATE = 'educate'
+MARRY = 'marry'
+CHILDREN = 'children'
+DECISION_EVENTS = {
+    SWITCH: life.CAREER_CHANGE,
+    EDUCATE: life.EDUCATION_CHANCE,
+    MARRY: life.RELATIONSHIP,
+    CHILDREN: life.CHILDREN,
+}
+
+# how many standard errors apart the best answer has to be from the others to stop thinking early
+SETTLED_Z = 3.0
+# rollouts of one answer per pool task
+ROLLOUTS_PER_TASK = 1024
+
+####################
+# Rollouts
+####################
+
+# answers the starting path it is told to in the batch engine, everything else as the default policy
+class _StartWith(life.Policy):
+    def __init__(self, career: bool):
+        self.career = career
+
+    def batch_starting_path(self, state, idx):
+        return self.career
+
+# what each pool worker keeps: the board it plays on
+_worker = {}
+
+def _init_worker(board: life.CompiledBoard) -> None:
+    _worker['board'] = board
+
+# plays `count` rollouts of one answer and returns (count, sum, sum of squares) of the money made from the decision
+# on. row is the player as a one row PlayerTable, square the square being resolved, end the square the move being
+# resolved ends on (move_player moves the player there before resolving anything) and event the one being decided
+def rollout(task: tuple) -> tuple:
+    row, square, end, decision, drawn, answer, count, seed = task
+    board = _worker.get('board') or life.standard_board()
+    rng = np.random.default_rng(seed)
+    policy = life.Policy()
+    state = batch_engine.PlayerTable(columns={name: np.repeat(column, count, axis=0) for name, column in row.items()})
+    idx = np.arange(count)
+    start_balance = state.balance.copy()
+
+    if decision == START:
+        batch_engine.start_batch(state, _StartWith(answer == life.CAREER), rng)
+    elif answer and decision == SWITCH:
+        state.career[:] = drawn
+        state.salary[:] = batch_engine.CAREER_SALARY[drawn]
+    elif answer and decision == EDUCATE:
+        state.balance -= batch_engine.EDUCATION_COST[drawn]
+        state.educations[:, drawn] += 1
+        state.total_bonus += batch_engine.EDUCATION_BONUS[drawn]
+    elif answer and decision == MARRY:
+        state.married[:] = rng.integers(0, 2, size=count).astype(bool)
+    elif answer and decision == CHILDREN:
+        state.kids += rng.integers(life.MIN_KIDS, life.MAX_KIDS + 1, size=count, dtype=np.int32)
+
+    # the rest of the move: the events on the square still to come after this one, then the squares passed on the way
+    # to the end of the move (paychecks first on each, as in move_player), then the rest of the game from there
+    if decision != START:
+        events = board.events_at(square)
+        for event in events[events.index(DECISION_EVENTS[decision]) + 1:]:
+            batch_engine.BATCH_HANDLERS[event](state, idx, policy, rng)
+        handlers = batch_engine.board_handlers(board)
+        passed = slice(bisect.bisect_right(board.event_square_list, square), bisect.bisect_right(board.event_square_list, end))
+        for mask in board.event_mask_list[passed]:
+            for bit, handler in handlers:
+                if mask & bit:
+                    handler(state, idx, policy, rng)
+    state.position[:] = end
+    while batch_engine.step_batch(state, policy, rng, board):
+        pass
+    gains = (state.balance - start_balance).astype(np.float64)
+    return count, float(gains.sum()), float((gains * gains).sum())
+
+####################
+# Bot
+####################
+
+# rollout results of one answer from one state: count, sum and sum of squares of the money made
+class Estimate:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    def add(self, count: int, total: float, squares: float) -> None:
+        self.count += count
+        self.total += total
+        self.squares += squares
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    # the standard error of the mean
+    def error(self) -> float:
+        if self.count < 2:
+            return math.inf
+        variance = max(0.0, (self.squares - self.total * self.total / self.count) / (self.count - 1))
+        return math.sqrt(variance / self.count)
+
+class MonteCarloBot(life.Policy):
+    # the search needs a Player to start from, so there are no batch_* answers
+    batched = False
+    # the square being resolved and the board come from the engine asking
+    follows_engine = True
+
+    def __init__(self, budget: float = 0.5, workers: int = None, engine: life.Engine = None, seed: int = None):
+        # seconds of thinking allowed per decision
+        self.budget = budget
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        # the engine the bot is deciding for, move_player keeps the square being resolved on it. Engine.policy_for
+        # sets it before every decision, this is only the one used until then (the console game's by default)
+        self.engine = engine
+        self.seeds = random.Random(seed)
+        # (state, answer): Estimate, kept for the whole session
+        self.cache = {}
+        # the pool and the board its workers play on
+        self.pool = None
+        self.pool_board = None
+        # board: the last square with an education chance on it
+        self.last_education = {}
+        # metrics
+        self.decisions = 0
+        self.rollouts = 0
+        self.thinking = 0.0
+        self.cache_hits = 0
+
+    def rollouts_per_second(self) -> float:
+        return self.rollouts / self.thinking if self.thinking else 0.0
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    # the pool is only started by the first decision, so a bot that never gets to decide costs nothing,
+    # and it's started again for a decision on another board
+    def _submit(self, task: tuple, board: life.CompiledBoard):
+        if self.workers <= 1:
+            _worker['board'] = board
+            return _Done(rollout(task))
+        if self.pool is not None and self.pool_board is not board:
+            self.close()
+        if self.pool is None:
+            self.pool = Pool(self.workers, _init_worker, (board,))
+            self.pool_board = board
+        return self.pool.apply_async(rollout, (task,))
+
+    def _last_education(self, board: life.CompiledBoard) -> int:
+        if board not in self.last_education:
+            self.last_education[board] = max(board.layout().get(life.EDUCATION_CHANCE, [0]))
+        return self.last_education[board]
+
+    # searches the answers of one decision and returns the best one
+    def decide(self, player: life.Player, decision: str, answers: list, drawn: int = 0):
+        start = time.perf_counter()
+        deadline = start + self.budget
+        engine = self.engine or life.CONSOLE
+        board = engine.board
+        square = 0 if decision == START else engine.square
+        end = player.position
+        row = batch_engine.PlayerTable.from_players([player]).columns()
+        # the money made from here on only depends on the board, where the player is and where their move ends, what
+        # is being decided, and the player's career, education bonus and marriage. The balance only matters while an
+        # education chance is still to come (the rollouts pay for college when they can afford it), and no rule looks
+        # at kids or the educations taken
+        balance = player.balance if self._last_education(board) > square else None
+        state = (board, square, end, decision, drawn, int(row['career'][0]), round(player.total_bonus, 9),
+                 player.married, balance)
+        if any((state, answer) in self.cache for answer in answers):
+            self.cache_hits += 1
+        estimates = {answer: self.cache.setdefault((state, answer), Estimate()) for answer in answers}
+
+        in_flight = []
+        while True:
+            settled = self._settled(estimates)
+            out_of_time = time.perf_counter() >= deadline
+            # keep every worker busy while there's time left and the answer isn't clear yet
+            while not settled and not out_of_time and len(in_flight) < max(1, self.workers):
+                answer = self._pick(estimates)
+                task = (row, square, end, decision, drawn, answer, ROLLOUTS_PER_TASK, self.seeds.randrange(1 << 63))
+                in_flight.append((answer, self._submit(task, board)))
+            if not in_flight:
+                break
+            # collect whatever has finished (a task is a few milliseconds, so this waits at most that long)
+            in_flight[0][1].wait(max(0.0, deadline - time.perf_counter()))
+            finished = [each for each in in_flight if each[1].ready()]
+            if not finished and out_of_time:
+                finished = [in_flight[0]]
+            for answer, result in finished:
+                count, total, squares = result.get()
+                estimates[answer].add(count, total, squares)
+                self.rollouts += count
+                in_flight.remove((answer, result))
+
+        self.decisions += 1
+        self.thinking += time.perf_counter() - start
+        return max(answers, key=lambda answer: estimates[answer].mean())
+
+    # the answer to try next: one without rollouts first, then the highest upper confidence bound
+    @staticmethod
+    def _pick(estimates: dict):
+        for answer, estimate in estimates.items():
+            if estimate.count == 0:
+                return answer
+        return max(estimates, key=lambda answer: estimates[answer].mean() + 2 * estimates[answer].error())
+
+    # whether the best answer is ahead of every other by SETTLED_Z standard errors
+    @staticmethod
+    def _settled(estimates: dict) -> bool:
+        if any(estimate.count < 2 for estimate in estimates.values()):
+            return False
+        best = max(estimates.values(), key=Estimate.mean)
+        return all(best.mean() - other.mean() > SETTLED_Z * math.hypot(best.error(), other.error())
+                   for other in estimates.values() if other is not best)
+
+    def starting_path(self, player: life.Player) -> str:
+        return self.decide(player, START, [life.CAREER, life.EDUCATION])
+
+    def switch_career(self, player: life.Player, drawn_career: life.Career) -> bool:
+        return self.decide(player, SWITCH, [True, False], batch_engine.CAREERS.index(drawn_career))
+
+    def pursue_education(self, player: life.Player, drawn_college: life.Education) -> bool:
+        return self.decide(player, EDUCATE, [True, False], batch_engine.EDUCATIONS.index(drawn_college))
+
+    def attempt_marriage(self, player: life.Player) -> bool:
+        return self.decide(player, MARRY, [True, False])
+
+    def attempt_children(self, player: life.Player) -> bool:
+        return self.decide(player, CHILDREN, [True, False])
+
+# a finished result for the serial case, with the parts of AsyncResult decide() uses
+class _Done:
+    def __init__(self, value):
+        self.value = value
+
+    def wait(self, timeout: float = None) -> None:
+        pass
+
+    def ready(self) -> bool:
+        return True
+
+    def get(self):
+        return self.value
+
+# computer players sharing one bot (and so one pool and one cache), ready to sit at the console game's table
+def bot_players(count: int, budget: float = 0.5, workers: int = None) -> list[life.Player]:
+    bot = MonteCarloBot(budget, workers)
+    players = []
+    for number in range(count):
+        player = life.Player(f'Bot {number + 1}')
+        player.policy = bot
+        players.append(player)
+    return players
+
+def format_metrics(bot: MonteCarloBot) -> str:
+    return (f"{bot.decisions:,} decisions, {bot.rollouts:,} rollouts in {bot.thinking:.2f}s " +
+            f"({bot.rollouts_per_second():,.0f} rollouts/s), {bot.cache_hits:,} decisions started from the cache")
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Play headless games with the Monte Carlo tree search bot')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--budget', type=float, default=0.05, help='seconds of thinking per decision')
+    parser.add_argument('--workers', type=int, help='processes running the rollouts (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bot = MonteCarloBot(args.budget, args.workers, seed=args.seed)
+    bot.engine = life.Engine(bot, random.Random(args.seed))
+    balances = []
+    try:
+        for _ in range(args.games):
+            balances += [player.balance for player in life.simulate_game(['bot'], engine=bot.engine)]
+    finally:
+        bot.close()
+    print(f"{args.games:,} games, mean balance {sum(balances) / len(balances):,.0f}")
+    print(format_metrics(bot))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# Description:  Monte Carlo runner. Splits a large number of games into fixed size chunks, plays the chunks on a process pool
+#               with the batch engine and has every worker write its rows straight into one shared memory results array.
+#               Each chunk gets its own random stream spawned from the run's seed, so the results only depend on
+#               (seed, chunk_size) and are identical whatever the number of workers.
+
+import os
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+import game_of_life as life
+import batch_engine
+
+# one row per game
+RESULT_DTYPE = np.dtype([
+    ('balance', np.int64),
+    ('total_bonus', np.float64),
+    ('career', np.int8),
+    ('educations', np.uint8, (len(batch_engine.EDUCATIONS),)),
+    ('married', np.bool_),
+    ('kids', np.int32),
+    ('turns', np.int32),
+])
+
+# games per chunk, also the unit of work handed to a worker
+CHUNK_SIZE = 1 << 16
+
+# the results array living in a shared memory block
+def _shared_results(shm: SharedMemory, n_games: int) -> np.ndarray:
+    return np.ndarray((n_games,), dtype=RESULT_DTYPE, buffer=shm.buf)
+
+# plays one chunk and writes it into rows [first, first + count) of the results
+def _play_chunk(results: np.ndarray, first: int, count: int, seed: np.random.SeedSequence, policy: life.Policy) -> None:
+    rng = np.random.Generator(np.random.PCG64(seed))
+    state = batch_engine.simulate_batch(count, policy, rng, chunk_size=count)
+    rows = results[first:first + count]
+    for name in RESULT_DTYPE.names:
+        rows[name] = getattr(state, name)
+
+# state each pool worker keeps between chunks
+_worker = {}
+
+def _init_worker(shm_name: str, n_games: int, policy: life.Policy) -> None:
+    _worker['shm'] = SharedMemory(name=shm_name)
+    _worker['results'] = _shared_results(_worker['shm'], n_games)
+    _worker['policy'] = policy
+
+def _worker_chunk(task: tuple) -> int:
+    first, count, seed = task
+    _play_chunk(_worker['results'], first, count, seed, _worker['policy'])
+    return count
+
+# the (first row, row count, seed) of every chunk of a run, chunk i always gets the i-th child of the seed
+def chunk_tasks(n_games: int, seed: int = 0, chunk_size: int = CHUNK_SIZE) -> list[tuple]:
+    firsts = range(0, n_games, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(firsts))
+    return [(first, min(chunk_size, n_games - first), child) for first, child in zip(firsts, seeds)]
+
+# plays waves of consecutive chunks of a run, on one pool and one shared memory block kept from wave to wave
+# n_rows is the most rows a wave can have, workers == 1 plays in this process
+class ChunkPlayer:
+    def __init__(self, n_rows: int, policy: life.Policy, workers: int):
+        self.n_rows = n_rows
+        self.policy = policy
+        self.shm = None
+        self.pool = None
+        if workers > 1:
+            self.shm = SharedMemory(create=True, size=max(1, n_rows * RESULT_DTYPE.itemsize))
+            self.pool = Pool(workers, _init_worker, (self.shm.name, n_rows, policy))
+
+    # plays some consecutive chunks and returns their rows
+    def play(self, tasks: list[tuple]) -> np.ndarray:
+        offset = tasks[0][0] if tasks else 0
+        n_rows = sum(count for _, count, _ in tasks)
+        if n_rows > self.n_rows:
+            raise ValueError(f"a wave of {n_rows} rows doesn't fit in {self.n_rows}")
+        tasks = [(first - offset, count, child) for first, count, child in tasks]
+
+        if self.pool is None:
+            results = np.zeros(n_rows, dtype=RESULT_DTYPE)
+            for first, count, child in tasks:
+                _play_chunk(results, first, count, child, self.policy)
+            return results
+        for _ in self.pool.imap_unordered(_worker_chunk, tasks):
+            pass
+        return _shared_results(self.shm, self.n_rows)[:n_rows].copy()
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.shm.close()
+            self.shm.unlink()
+            self.pool = None
+
+    def __enter__(self) -> 'ChunkPlayer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# plays some consecutive chunks of a run and returns their rows
+def play_chunks(tasks: list[tuple], policy: life.Policy, workers: int) -> np.ndarray:
+    workers = min(workers, len(tasks)) if len(tasks) > 1 else 1
+    with ChunkPlayer(sum(count for _, count, _ in tasks), policy, workers) as player:
+        return player.play(tasks)
+
+# plays n_games games and returns one RESULT_DTYPE row per game
+# the policy has to be picklable (defined at module level) when workers > 1
+def run_monte_carlo(n_games: int, policy: life.Policy = None, workers: int = None, seed: int = 0, chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    policy = policy if policy is not None else life.Policy()
+    workers = workers or os.cpu_count() or 1
+    return play_chunks(chunk_tasks(n_games, seed, chunk_size), policy, workers)
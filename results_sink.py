@@ -0,0 +1,160 @@
+# Description:  Streaming, columnar results on disk. A results directory has a small schema.json and one append-only raw
+#               binary file per column. Rows are buffered in fixed size chunks and every full chunk is appended and flushed,
+#               so a job that gets killed keeps everything written so far, and readers memory-map the columns instead of
+#               loading them.
+
+import json
+import os
+
+import numpy as np
+
+import game_of_life as life
+import monte_carlo
+
+# bump when the layout of a results directory changes
+FORMAT_VERSION = 2
+SCHEMA_FILE = 'schema.json'
+
+# the per game outcome columns, the game's run seed and its index within the run
+COLUMNS = [
+    ('balance', np.dtype('<i8'), ()),
+    ('career', np.dtype('<i1'), ()),
+    ('educations', np.dtype('<u1'), monte_carlo.RESULT_DTYPE['educations'].shape),
+    ('kids', np.dtype('<i4'), ()),
+    ('married', np.dtype('?'), ()),
+    ('turns', np.dtype('<i4'), ()),
+    ('seed', np.dtype('<u8'), ()),
+    ('game_id', np.dtype('<u8'), ()),
+]
+
+# rows buffered before they are appended to the column files
+CHUNK_ROWS = 1 << 16
+
+def _column_path(path: str, name: str) -> str:
+    return os.path.join(path, name + '.bin')
+
+# appends rows to a results directory (creating it if needed), use it as a context manager or call close()
+class ResultsWriter:
+    def __init__(self, path: str, chunk_rows: int = CHUNK_ROWS, durable: bool = False):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        # fsync every chunk as well as flushing it, slower but it survives the machine going down
+        self.durable = durable
+        os.makedirs(path, exist_ok=True)
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            with open(schema_path) as schema:
+                version = json.load(schema)['version']
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path} has results format version {version}, expected {FORMAT_VERSION}")
+        else:
+            with open(schema_path, 'w') as schema:
+                json.dump({
+                    'version': FORMAT_VERSION,
+                    'columns': [[name, dtype.str, list(shape)] for name, dtype, shape in COLUMNS],
+                }, schema, indent=1)
+        self.buffer = {name: np.zeros((chunk_rows,) + shape, dtype) for name, dtype, shape in COLUMNS}
+        self.buffered = 0
+        # rows already on disk, a column cut short by a killed writer is trimmed back so all columns line up again
+        row_bytes = {name: self.buffer[name][:1].nbytes for name in self.buffer}
+        self.files = {name: open(_column_path(path, name), 'ab') for name, _, _ in COLUMNS}
+        self.rows = min(os.path.getsize(_column_path(path, name)) // row_bytes[name] for name in self.files)
+        for name, column in self.files.items():
+            column.truncate(self.rows * row_bytes[name])
+
+    # adds rows, columns is anything with the column names as keys/fields (a dict of arrays,
+    # a monte_carlo results array); seed and game_id may be arrays or single values
+    def write(self, columns, seed=0, game_id=None) -> None:
+        count = len(columns['balance'])
+        if game_id is None:
+            game_id = np.arange(self.rows + self.buffered, self.rows + self.buffered + count)
+        extra = {'seed': seed, 'game_id': game_id}
+        done = 0
+        while done < count:
+            take = min(count - done, self.chunk_rows - self.buffered)
+            for name, _, _ in COLUMNS:
+                source = extra[name] if name in extra else columns[name]
+                if np.ndim(source) == 0:
+                    self.buffer[name][self.buffered:self.buffered + take] = source
+                else:
+                    self.buffer[name][self.buffered:self.buffered + take] = source[done:done + take]
+            self.buffered += take
+            done += take
+            if self.buffered == self.chunk_rows:
+                self.flush()
+
+    # appends whatever is buffered to the column files
+    def flush(self) -> None:
+        if self.buffered:
+            for name, column in self.files.items():
+                column.write(self.buffer[name][:self.buffered].tobytes())
+            for column in self.files.values():
+                column.flush()
+                if self.durable:
+                    os.fsync(column.fileno())
+            self.rows += self.buffered
+            self.buffered = 0
+
+    def close(self) -> None:
+        self.flush()
+        for column in self.files.values():
+            column.close()
+
+    def __enter__(self) -> 'ResultsWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# memory-maps a results directory as {column name: read only array}, nothing is loaded until it's read
+# only complete rows are mapped, so a directory whose writer was killed mid chunk is still readable
+def open_results(path: str) -> dict:
+    with open(os.path.join(path, SCHEMA_FILE)) as schema:
+        schema = json.load(schema)
+    if schema['version'] != FORMAT_VERSION:
+        raise ValueError(f"{path} has results format version {schema['version']}, expected {FORMAT_VERSION}")
+    columns = [(name, np.dtype(dtype), tuple(shape)) for name, dtype, shape in schema['columns']]
+    row_bytes = {name: dtype.itemsize * int(np.prod(shape)) for name, dtype, shape in columns}
+    rows = min(os.path.getsize(_column_path(path, name)) // row_bytes[name] for name, _, _ in columns)
+    if rows == 0:
+        return {name: np.zeros((0,) + shape, dtype) for name, dtype, shape in columns}
+    return {
+        name: np.memmap(_column_path(path, name), dtype=dtype, mode='r', shape=(rows,) + shape)
+        for name, dtype, shape in columns
+    }
+
+# the run write_monte_carlo is filling a directory with
+RUN_FILE = 'run.json'
+
+# plays n_games like monte_carlo.run_monte_carlo, but streams them into a results directory a wave of chunks
+# at a time instead of keeping them all in memory (the rows are the same as run_monte_carlo's for the same arguments)
+# a directory that already holds part of the same run (same seed, chunk size and policy) is carried on from its
+# last complete chunk, so a killed run can be started again, and anything else in it is refused
+# returns the number of rows in the directory
+def write_monte_carlo(path: str, n_games: int, policy: life.Policy = None, workers: int = None, seed: int = 0,
+                      chunk_size: int = monte_carlo.CHUNK_SIZE) -> int:
+    policy = policy if policy is not None else life.Policy()
+    workers = workers or os.cpu_count() or 1
+    run = {'seed': seed, 'chunk_size': chunk_size, 'policy': type(policy).__name__}
+    run_path = os.path.join(path, RUN_FILE)
+    with ResultsWriter(path, chunk_rows=chunk_size) as writer:
+        if os.path.exists(run_path):
+            with open(run_path) as existing:
+                existing = json.load(existing)
+            if existing != run:
+                raise ValueError(f"{path} holds the results of another run ({existing})")
+        elif writer.rows:
+            raise ValueError(f"{path} already holds {writer.rows:,} rows that aren't from write_monte_carlo")
+        else:
+            with open(run_path, 'w') as out:
+                json.dump(run, out)
+        # rows are written a chunk at a time, so only a run with fewer games can leave a chunk part written
+        if writer.rows < n_games and writer.rows % chunk_size:
+            raise ValueError(f"{path} ends part way through a chunk ({writer.rows:,} rows), it can't be carried on")
+
+        tasks = [task for task in monte_carlo.chunk_tasks(n_games, seed, chunk_size) if task[0] >= writer.rows]
+        with monte_carlo.ChunkPlayer(min(workers, len(tasks)) * chunk_size, policy, min(workers, len(tasks))) as player:
+            for wave in range(0, len(tasks), workers):
+                rows = player.play(tasks[wave:wave + workers])
+                writer.write(rows, seed, tasks[wave][0] + np.arange(len(rows)))
+    return writer.rows
@@ -0,0 +1,377 @@
+# Description:  Streaming summary statistics in fixed memory. Games are played in chunks with the batch engine, every
+#               chunk is folded into an aggregate and thrown away: moments of the final balance and kids (Welford, merged
+#               as in Chan et al.), fixed-bin histograms, a relative-error quantile sketch of the balance (log-spaced
+#               buckets as in DDSketch) and categorical counts of careers, educations and marriage. Every part merges with
+#               the same part of another aggregate, so workers aggregate their own chunks and only the aggregates are
+#               merged. Memory stays the same whatever the number of games, and aggregates saved as JSON by separate runs
+#               can be merged later.
+#
+#               python streaming_stats.py --games 100000000 --workers 8 --out run1.json
+#               python streaming_stats.py --merge run1.json run2.json
+
+import argparse
+import collections
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import game_of_life as life
+import batch_engine
+import monte_carlo
+import tournament
+
+# count, mean, sum of squared differences from the mean (m2), min and max of a stream of numbers
+class Moments:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # adds an array of values at once, as the merge of the array's own moments
+    def add(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            part = Moments()
+            part.count = len(values)
+            part.mean = float(values.mean())
+            part.m2 = float(((values - part.mean) ** 2).sum())
+            part.min = float(values.min())
+            part.max = float(values.max())
+            self.merge(part)
+
+    def merge(self, other: 'Moments') -> None:
+        count = self.count + other.count
+        if other.count:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.count = count
+
+    def deviation(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Moments':
+        moments = cls()
+        moments.count, moments.mean, moments.m2, moments.min, moments.max = (
+            data['count'], data['mean'], data['m2'], data['min'], data['max'])
+        return moments
+
+# counts of values in fixed width bins from low to high, plus one count below low and one at or above high
+class Histogram:
+    def __init__(self, low: float, high: float, width: float):
+        self.low = low
+        self.high = high
+        self.width = width
+        self.bins = math.ceil((high - low) / width)
+        self.counts = np.zeros(self.bins + 2, dtype=np.int64)
+
+    def add(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        index = np.floor((values - self.low) / self.width).astype(np.int64) + 1
+        index = np.where(values >= self.high, self.bins + 1, np.clip(index, 0, self.bins + 1))
+        self.counts += np.bincount(index, minlength=self.bins + 2)
+
+    def merge(self, other: 'Histogram') -> None:
+        if (other.low, other.high, other.width) != (self.low, self.high, self.width):
+            raise ValueError('histograms with different bins can not be merged')
+        self.counts += other.counts
+
+    # (bin start, bin end, count) with neighbouring bins added together so there are at most `rows` of them,
+    # the under and overflow counts are left out
+    def rows(self, rows: int = 20) -> list[tuple]:
+        used = np.flatnonzero(self.counts[1:-1])
+        if len(used) == 0:
+            return []
+        first, last = int(used[0]), int(used[-1]) + 1
+        step = max(1, math.ceil((last - first) / rows))
+        return [(self.low + start * self.width, self.low + min(start + step, last) * self.width,
+                 int(self.counts[1 + start:1 + min(start + step, last)].sum())) for start in range(first, last, step)]
+
+    def to_dict(self) -> dict:
+        return {'low': self.low, 'high': self.high, 'width': self.width, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Histogram':
+        histogram = cls(data['low'], data['high'], data['width'])
+        histogram.counts[:] = data['counts']
+        return histogram
+
+# quantiles to within a relative error: values go into buckets whose bounds grow by gamma = (1 + a) / (1 - a), so
+# any value in a bucket is within a (the relative accuracy) of the bucket's middle. Negative values have buckets of
+# their own. When there are more than max_buckets the lowest ones are folded together, which only costs accuracy at
+# the bottom end. Quantiles are kept within the smallest and largest value seen, which a bucket's middle can be outside of
+class QuantileSketch:
+    MAX_BUCKETS = 2048
+
+    def __init__(self, relative_accuracy: float = 0.005, max_buckets: int = MAX_BUCKETS):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        # bucket key: count, the key of value v is ceil(log(|v|) / log(gamma))
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        self.count += len(values)
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+        self.zeros += int(np.count_nonzero(values == 0))
+        for store, magnitudes in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64), return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                store[key] = store.get(key, 0) + count
+            self._collapse(store)
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('sketches with different accuracies can not be merged')
+        for store, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                store[key] = store.get(key, 0) + count
+            self._collapse(store)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _collapse(self, store: dict) -> None:
+        if len(store) > self.max_buckets:
+            keys = sorted(store)
+            folded = keys[:len(keys) - self.max_buckets + 1]
+            store[folded[-1]] = sum(store.pop(key) for key in folded[:-1]) + store[folded[-1]]
+
+    # the middle of a bucket
+    def _value(self, key: int) -> float:
+        gamma = math.exp(self.log_gamma)
+        return 2 * gamma ** key / (gamma + 1)
+
+    # the value at quantile q (0 to 1), nan while the sketch is empty
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return math.nan
+        return min(max(self._bucket_value(q), self.min), self.max)
+
+    def _bucket_value(self, q: float) -> float:
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def to_dict(self) -> dict:
+        return {'relative_accuracy': self.relative_accuracy, 'max_buckets': self.max_buckets, 'zeros': self.zeros,
+                'count': self.count, 'min': self.min, 'max': self.max, 'positive': list(self.positive.items()), 'negative': list(self.negative.items())}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'], data['max_buckets'])
+        sketch.positive = {key: count for key, count in data['positive']}
+        sketch.negative = {key: count for key, count in data['negative']}
+        sketch.zeros, sketch.count = data['zeros'], data['count']
+        # aggregates saved before the sketch kept its range aren't clamped
+        sketch.min, sketch.max = data.get('min', -math.inf), data.get('max', math.inf)
+        return sketch
+
+# how many times each of a fixed list of labels was seen, values are given as codes into the labels
+class Counts:
+    def __init__(self, labels: list[str]):
+        self.labels = list(labels)
+        self.counts = np.zeros(len(self.labels), dtype=np.int64)
+
+    def add(self, codes, weights=None) -> None:
+        self.counts += np.bincount(np.asarray(codes, dtype=np.int64), weights, minlength=len(self.labels)).astype(np.int64)
+
+    def merge(self, other: 'Counts') -> None:
+        if other.labels != self.labels:
+            raise ValueError('counts of different labels can not be merged')
+        self.counts += other.counts
+
+    def to_dict(self) -> dict:
+        return {'labels': self.labels, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Counts':
+        counts = cls(data['labels'])
+        counts.counts[:] = data['counts']
+        return counts
+
+# the mix of educations a player ended with, as a label per combination (bit i set when EDUCATIONS[i] was taken)
+def _education_mixes() -> list[str]:
+    names = [education.name for education in batch_engine.EDUCATIONS]
+    return ['GED only' if mask == 0 else ' + '.join(name for bit, name in enumerate(names) if mask >> bit & 1)
+            for mask in range(1 << len(names))]
+
+# everything kept about the games seen so far
+class GameStats:
+    # the bins of the histograms, values outside of them are still counted (as under/overflow) and in the moments
+    BALANCE_BINS = (0, 2000000, 10000)
+    KIDS_BINS = (0, 64, 1)
+
+    def __init__(self):
+        self.balance = Moments()
+        self.balance_histogram = Histogram(*self.BALANCE_BINS)
+        self.balance_sketch = QuantileSketch()
+        self.kids = Moments()
+        self.kids_histogram = Histogram(*self.KIDS_BINS)
+        self.careers = Counts([career.name for career in batch_engine.CAREERS])
+        self.educations = Counts([education.name for education in batch_engine.EDUCATIONS])
+        self.education_mix = Counts(_education_mixes())
+        self.married = Counts(['unmarried', 'married'])
+
+    # folds in the final state of some games from the batch engine
+    def add_table(self, table: batch_engine.PlayerTable) -> None:
+        self.balance.add(table.balance)
+        self.balance_histogram.add(table.balance)
+        self.balance_sketch.add(table.balance)
+        self.kids.add(table.kids)
+        self.kids_histogram.add(table.kids)
+        self.careers.add(table.career)
+        for code in range(len(batch_engine.EDUCATIONS)):
+            self.educations.counts[code] += int(table.educations[:, code].sum())
+        taken = table.educations > 0
+        self.education_mix.add((taken * (1 << np.arange(taken.shape[1]))).sum(axis=1))
+        self.married.add(table.married)
+
+    # folds in finished Player objects (from simulate_game or a lobby)
+    def add_players(self, players: list[life.Player]) -> None:
+        self.add_table(batch_engine.PlayerTable.from_players(players))
+
+    # the parts, by name, in the order they're saved and merged
+    def parts(self) -> dict:
+        return {name: part for name, part in vars(self).items()}
+
+    def merge(self, other: 'GameStats') -> None:
+        for name, part in self.parts().items():
+            part.merge(getattr(other, name))
+
+    def to_dict(self) -> dict:
+        return {name: part.to_dict() for name, part in self.parts().items()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'GameStats':
+        stats = cls()
+        for name, part in stats.parts().items():
+            setattr(stats, name, type(part).from_dict(data[name]))
+        return stats
+
+    # the number of bytes the aggregate takes up, which doesn't depend on how many games went in
+    def nbytes(self) -> int:
+        return len(json.dumps(self.to_dict()))
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+def format_report(stats: GameStats) -> str:
+    games = stats.balance.count
+    lines = [f"{games:,} games"]
+    if not games:
+        return lines[0]
+    lines.append(f"Balance: mean {stats.balance.mean:,.0f}, sd {stats.balance.deviation():,.0f}, " +
+                 f"min {stats.balance.min:,.0f}, max {stats.balance.max:,.0f}")
+    lines.append("    " + ', '.join(f"p{q * 100:g} {stats.balance_sketch.quantile(q):,.0f}" for q in QUANTILES) +
+                 f" (within {stats.balance_sketch.relative_accuracy:.1%})")
+    histogram = stats.balance_histogram
+    peak = max((count for _, _, count in histogram.rows()), default=0) or 1
+    for start, end, count in histogram.rows():
+        lines.append(f"    {start:>10,.0f} - {end:<10,.0f} {count / games:7.2%} {'#' * round(40 * count / peak)}")
+    if histogram.counts[0] or histogram.counts[-1]:
+        lines.append(f"    {int(histogram.counts[0]):,} below {histogram.low:,.0f}, " +
+                     f"{int(histogram.counts[-1]):,} at or above {histogram.high:,.0f}")
+    lines.append(f"Kids: mean {stats.kids.mean:.2f}, sd {stats.kids.deviation():.2f}, max {stats.kids.max:.0f}")
+    for name, counts in [('Careers', stats.careers), ('Education mix', stats.education_mix),
+                         ('Educations taken per game', stats.educations), ('Marriage', stats.married)]:
+        lines.append(f"{name}: " + ', '.join(f"{label} {count / games:.1%}" if name != 'Educations taken per game'
+                                             else f"{label} {count / games:.3f}"
+                                             for label, count in zip(counts.labels, counts.counts) if count))
+    return '\n'.join(lines)
+
+# plays the chunks of a run in one worker and returns their aggregate
+def _play_chunks(task: tuple) -> GameStats:
+    chunks, policy = task
+    stats = GameStats()
+    for _, count, seed in chunks:
+        stats.add_table(batch_engine.simulate_batch(count, tournament.STRATEGIES[policy](),
+                                                    np.random.Generator(np.random.PCG64(seed)), chunk_size=count))
+    return stats
+
+# plays n_games in chunks of chunk_size games and returns the merged aggregate, each worker task covers
+# `chunks_per_task` chunks so only one aggregate per task crosses between processes
+def run_stats(n_games: int, policy: str = 'default', workers: int = None, seed: int = 0,
+              chunk_size: int = monte_carlo.CHUNK_SIZE, chunks_per_task: int = 16) -> GameStats:
+    workers = workers or os.cpu_count() or 1
+    stats = GameStats()
+    # the tasks are made as they're handed out, so the seeds of a billion games are never all in memory at once.
+    # chunk i gets SeedSequence(seed, spawn_key=(i,)), the same child monte_carlo.chunk_tasks gives it
+    tasks = (([(first, min(chunk_size, n_games - first), np.random.SeedSequence(seed, spawn_key=(first // chunk_size,)))
+               for first in range(task_first, min(task_first + chunk_size * chunks_per_task, n_games), chunk_size)], policy)
+             for task_first in range(0, n_games, chunk_size * chunks_per_task))
+    if workers == 1:
+        for task in tasks:
+            stats.merge(_play_chunks(task))
+    else:
+        # at most two tasks per worker are handed to the pool at a time (imap would read every task up front),
+        # and the parts are merged in task order
+        with Pool(workers) as pool:
+            in_flight = collections.deque()
+            for task in tasks:
+                in_flight.append(pool.apply_async(_play_chunks, (task,)))
+                if len(in_flight) >= 2 * workers:
+                    stats.merge(in_flight.popleft().get())
+            while in_flight:
+                stats.merge(in_flight.popleft().get())
+    return stats
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Summary statistics of any number of games in fixed memory')
+    parser.add_argument('--games', type=int, default=1 << 22)
+    parser.add_argument('--policy', default='default', choices=list(tournament.STRATEGIES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help='processes to run on (default: all cores)')
+    parser.add_argument('--out', help='save the aggregate as JSON, to be merged with others later')
+    parser.add_argument('--merge', nargs='+', metavar='FILE', help='report on saved aggregates merged, instead of playing')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.merge:
+        stats = GameStats()
+        for path in args.merge:
+            with open(path) as saved:
+                stats.merge(GameStats.from_dict(json.load(saved)))
+    else:
+        stats = run_stats(args.games, args.policy, args.workers, args.seed)
+    print(format_report(stats))
+    print(f"{time.perf_counter() - start:.1f}s, aggregate of {stats.nbytes():,} bytes")
+    if args.out:
+        with open(args.out, 'w') as out:
+            json.dump(stats.to_dict(), out)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,355 @@
+# Description:  Parameter sweeps. Expands a grid of rule changes (career salaries, education bonus and cost, the starting
+#               balance, event positions, board length) into configurations, splits every configuration's games into
+#               shards and plays the shards on a process pool with the batch engine. Every finished shard is saved on
+#               its own, so a sweep that gets killed picks up where it was, and every finished configuration is kept in a
+#               content-addressed cache under a hash of (rules, policy, seed, games): a sweep overlapping an earlier one
+#               only plays the configurations that haven't been seen.
+#
+#               python sweep.py --param salary.Artist=[20000,30000,40000] --param starting_balance=[50000,100000]
+#               python sweep.py --param length=[36,72,144] --param "education.Graduate School.cost=[60000,90000]" --games 1000000
+#               python sweep.py --param "positions.Love Interest=[[4],[4,16],[4,16,28]]" --policy no_children --out sweep.csv
+
+import argparse
+import contextlib
+import copy
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import game_of_life as life
+import batch_engine
+import monte_carlo
+import tournament
+
+# bump when a change to the engine makes cached results stale
+RULES_VERSION = 1
+# games per shard, the unit of work handed to a worker and saved on its own
+SHARD_GAMES = 1 << 18
+CACHE_DIR = 'sweep_cache'
+
+####################
+# Rules
+####################
+
+# every rule a sweep can change, as they are right now. positions only holds the events moved off their standard
+# squares, and a board longer than the standard one repeats the standard layout (see tiled_board)
+def current_rules() -> dict:
+    return {
+        'salary': {career.name: career.salary for career in life.career_list},
+        'education': {education.name: {'bonus': education.bonus, 'cost': education.cost} for education in life.education_list},
+        'starting_balance': life.STARTING_BALANCE,
+        'length': life.END_OF_GAME,
+        'positions': {},
+    }
+
+# the rules the game ships with
+DEFAULT_RULES = current_rules()
+
+# rules with one value changed, key is a dotted path into the rules:
+# salary.<career>, education.<education>.bonus, education.<education>.cost, starting_balance, length, positions.<event>
+def with_value(rules: dict, key: str, value) -> dict:
+    rules = copy.deepcopy(rules)
+    section, _, rest = key.partition('.')
+    name, _, field = rest.rpartition('.')
+    if section in ('starting_balance', 'length') and not rest:
+        rules[section] = value
+    elif section == 'salary' and rest in rules['salary']:
+        rules['salary'][rest] = value
+    elif section == 'education' and name in rules['education'] and field in ('bonus', 'cost'):
+        rules['education'][name][field] = value
+    elif section == 'positions' and rest in life.EVENTS_BY_NAME:
+        rules['positions'][rest] = sorted(value)
+    else:
+        raise KeyError(f"unknown rule {key}")
+    return rules
+
+# the board the rules are played on
+def rules_board(rules: dict) -> life.CompiledBoard:
+    standard = life.standard_board()
+    base = standard if rules['length'] == standard.length else life.tiled_board(rules['length'])
+    if not rules['positions']:
+        return base
+    positions = base.layout()
+    for name, squares in rules['positions'].items():
+        positions[life.EVENTS_BY_NAME[name]] = squares
+    return life.CompiledBoard(life.LIST_OF_EVENTS, rules['length'], positions=positions)
+
+def _set_rules(rules: dict) -> None:
+    for career in life.career_list:
+        career.salary = rules['salary'][career.name]
+    for education in life.education_list:
+        education.bonus = rules['education'][education.name]['bonus']
+        education.cost = rules['education'][education.name]['cost']
+    life.STARTING_BALANCE = rules['starting_balance']
+    batch_engine.CAREER_SALARY[:] = [career.salary for career in batch_engine.CAREERS]
+    batch_engine.EDUCATION_BONUS[:] = [education.bonus for education in batch_engine.EDUCATIONS]
+    batch_engine.EDUCATION_COST[:] = [education.cost for education in batch_engine.EDUCATIONS]
+
+# plays by the given rules inside the block: the career and education cards, the starting balance and the batch
+# engine's tables of them are changed in place (for this process only) and put back afterwards
+@contextlib.contextmanager
+def rules_applied(rules: dict):
+    saved = current_rules()
+    _set_rules(rules)
+    try:
+        yield
+    finally:
+        _set_rules(saved)
+
+# every combination of the values in grid ({rule key: list of values}), as (the values picked, the rules)
+def expand_grid(grid: dict, base: dict = None) -> list[tuple]:
+    base = base if base is not None else DEFAULT_RULES
+    configurations = []
+    for values in itertools.product(*grid.values()):
+        rules = base
+        for key, value in zip(grid, values):
+            rules = with_value(rules, key, value)
+        configurations.append((dict(zip(grid, values)), rules))
+    return configurations
+
+####################
+# Cache
+####################
+
+# the address of a configuration's results, the shard size is part of it since the games played depend on it
+def config_key(rules: dict, policy: str, seed: int, games: int, shard_games: int = SHARD_GAMES) -> str:
+    content = json.dumps({
+        'version': RULES_VERSION, 'rules': rules, 'policy': policy, 'seed': seed, 'games': games, 'shard_games': shard_games,
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def _result_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, 'results', key[:2], key + '.json')
+
+def _shard_path(cache_dir: str, key: str, shard: int) -> str:
+    return os.path.join(cache_dir, 'shards', key, f'{shard}.json')
+
+# writes to a temporary file first so a file is either complete or not there at all
+def _write_json(path: str, value) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as out:
+        json.dump(value, out)
+    os.replace(path + '.tmp', path)
+
+def _read_json(path: str):
+    with open(path) as source:
+        return json.load(source)
+
+# the cached results of a configuration, None if it hasn't been played
+def cached_result(cache_dir: str, key: str) -> dict:
+    path = _result_path(cache_dir, key)
+    return _read_json(path) if os.path.exists(path) else None
+
+####################
+# Shards
+####################
+
+# the summary of some games that can be merged with the summary of others: counts, and the mean and sum of squared
+# differences (m2) of each number, merged as in Chan et al.'s parallel variance
+def summarize(state: batch_engine.PlayerTable) -> dict:
+    summary = {'games': len(state)}
+    for name in ('balance', 'kids', 'turns'):
+        column = getattr(state, name).astype(np.float64)
+        mean = float(column.mean()) if len(column) else 0.0
+        summary[name] = {'mean': mean, 'm2': float(((column - mean) ** 2).sum()),
+                         'min': int(column.min()) if len(column) else 0, 'max': int(column.max()) if len(column) else 0}
+    summary['married'] = int(state.married.sum())
+    summary['careers'] = {career.name: int(count) for career, count in
+                          zip(batch_engine.CAREERS, np.bincount(state.career, minlength=len(batch_engine.CAREERS)))}
+    summary['educations'] = {education.name: int(count) for education, count in
+                             zip(batch_engine.EDUCATIONS, state.educations.sum(axis=0))}
+    return summary
+
+def merge_summaries(first: dict, second: dict) -> dict:
+    games = first['games'] + second['games']
+    merged = {'games': games}
+    for name in ('balance', 'kids', 'turns'):
+        a, b = first[name], second[name]
+        delta = b['mean'] - a['mean']
+        merged[name] = {
+            'mean': a['mean'] + delta * second['games'] / games if games else 0.0,
+            'm2': a['m2'] + b['m2'] + delta * delta * first['games'] * second['games'] / games if games else 0.0,
+            'min': min(a['min'], b['min']),
+            'max': max(a['max'], b['max']),
+        }
+    merged['married'] = first['married'] + second['married']
+    for name in ('careers', 'educations'):
+        merged[name] = {key: first[name][key] + second[name][key] for key in first[name]}
+    return merged
+
+# what each pool worker keeps between shards: the boards of the rules it has played, by their board rules
+_boards = {}
+
+def _board_for(rules: dict) -> life.CompiledBoard:
+    key = json.dumps([rules['length'], rules['positions']], sort_keys=True)
+    if key not in _boards:
+        _boards[key] = rules_board(rules)
+    return _boards[key]
+
+# plays one shard of a configuration and saves its summary, returns (key, shard)
+def play_shard(task: tuple) -> tuple:
+    cache_dir, key, rules, policy, shard, count, seed = task
+    with rules_applied(rules):
+        rng = np.random.Generator(np.random.PCG64(seed))
+        state = batch_engine.simulate_batch(count, tournament.STRATEGIES[policy](), rng, chunk_size=count,
+                                            board=_board_for(rules))
+        _write_json(_shard_path(cache_dir, key, shard), summarize(state))
+    return key, shard
+
+# merges the saved shards of a configuration into its cached result, and drops the shards
+def finish_config(cache_dir: str, key: str, shards: int, values: dict, rules: dict, policy: str, seed: int, games: int) -> dict:
+    summary = None
+    for shard in range(shards):
+        part = _read_json(_shard_path(cache_dir, key, shard))
+        summary = part if summary is None else merge_summaries(summary, part)
+    if summary is None:
+        raise ValueError(f"configuration {key} has no shards to finish")
+    result = {'values': values, 'rules': rules, 'policy': policy, 'seed': seed, 'summary': summary}
+    _write_json(_result_path(cache_dir, key), result)
+    shutil.rmtree(os.path.join(cache_dir, 'shards', key), ignore_errors=True)
+    return result
+
+####################
+# Sweeps
+####################
+
+# runs every configuration of the grid that isn't cached yet, returns (the result of every configuration in grid
+# order, configurations that were cached, shards played)
+def run_sweep(grid: dict, games: int, policy: str = 'default', seed: int = 0, workers: int = None,
+              cache_dir: str = CACHE_DIR, shard_games: int = SHARD_GAMES) -> tuple:
+    if games < 1 or shard_games < 1:
+        raise ValueError(f"a sweep needs at least one game per configuration and per shard, not {games} and {shard_games}")
+    workers = workers or os.cpu_count() or 1
+    configurations = expand_grid(grid)
+    keys = [config_key(rules, policy, seed, games, shard_games) for _, rules in configurations]
+    results = {key: cached_result(cache_dir, key) for key in keys}
+    cached = sum(result is not None for result in results.values())
+
+    # the shards still to play, a configuration's shards are queued together so it finishes as early as it can
+    # (shards already saved by an earlier, interrupted run are skipped)
+    shards = monte_carlo.chunk_tasks(games, seed, shard_games)
+    tasks = []
+    # key: [shards left, the values picked, the rules]
+    pending = {}
+    for (values, rules), key in zip(configurations, keys):
+        if results[key] is not None or key in pending:
+            continue
+        pending[key] = [0, values, rules]
+        for shard, (_, count, child) in enumerate(shards):
+            if not os.path.exists(_shard_path(cache_dir, key, shard)):
+                tasks.append((cache_dir, key, rules, policy, shard, count, child))
+                pending[key][0] += 1
+
+    def finish(key: str) -> None:
+        _, values, rules = pending.pop(key)
+        results[key] = finish_config(cache_dir, key, len(shards), values, rules, policy, seed, games)
+
+    def done(key: str) -> None:
+        pending[key][0] -= 1
+        if pending[key][0] == 0:
+            finish(key)
+
+    for key in [key for key, (left, _, _) in pending.items() if left == 0]:
+        finish(key)
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            done(play_shard(task)[0])
+    else:
+        with Pool(min(workers, len(tasks))) as pool:
+            for key, _ in pool.imap_unordered(play_shard, tasks):
+                done(key)
+    return [results[key] for key in keys], cached, len(tasks)
+
+# the standard deviation of a merged number
+def _deviation(number: dict, games: int) -> float:
+    return (number['m2'] / (games - 1)) ** 0.5 if games > 1 else 0.0
+
+# one row per configuration: the values swept and the headline numbers
+def result_rows(results: list[dict]) -> list[dict]:
+    rows = []
+    for result in results:
+        summary = result['summary']
+        games = summary['games']
+        row = dict(result['values'])
+        row.update({
+            'games': games,
+            'mean_balance': summary['balance']['mean'],
+            'sd_balance': _deviation(summary['balance'], games),
+            'min_balance': summary['balance']['min'],
+            'max_balance': summary['balance']['max'],
+            'mean_kids': summary['kids']['mean'],
+            'married': summary['married'] / games,
+            'mean_turns': summary['turns']['mean'],
+        })
+        for name, count in summary['careers'].items():
+            row[name.lower()] = count / games
+        rows.append(row)
+    return rows
+
+def format_report(rows: list[dict], grid: dict) -> str:
+    lines = []
+    for row in rows:
+        values = ', '.join(f"{key}={json.dumps(row[key])}" for key in grid) or 'standard rules'
+        lines.append(f"{values}: mean balance {row['mean_balance']:,.0f} ± {row['sd_balance']:,.0f} sd, " +
+                     f"{row['mean_kids']:.2f} kids, {row['married']:.1%} married, {row['mean_turns']:.1f} turns")
+    return '\n'.join(lines)
+
+def write_csv(path: str, rows: list[dict]) -> None:
+    import csv
+    with open(path, 'w', newline='') as out:
+        writer = csv.DictWriter(out, fieldnames=list(rows[0]))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: json.dumps(value) if isinstance(value, list) else value for key, value in row.items()})
+
+# a --param argument, key=json list of values (a single value is a list of one)
+def parse_param(text: str) -> tuple:
+    key, _, values = text.partition('=')
+    values = json.loads(values)
+    return key.strip(), values if isinstance(values, list) else [values]
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Play every combination of some rule changes and compare the outcomes')
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUES',
+                        help='a rule and a json list of values for it, e.g. salary.Artist=[20000,30000] (repeatable)')
+    parser.add_argument('--grid', help='a json file of {rule key: [values]}, added to any --param')
+    parser.add_argument('--games', type=int, default=1 << 20, help='games per configuration')
+    parser.add_argument('--policy', default='default', choices=list(tournament.STRATEGIES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help='processes to run on (default: all cores)')
+    parser.add_argument('--cache', default=CACHE_DIR, help=f'results cache directory (default: {CACHE_DIR})')
+    parser.add_argument('--shard-games', type=int, default=SHARD_GAMES, help='games per saved shard')
+    parser.add_argument('--out', help='write one csv row per configuration to this file')
+    args = parser.parse_args(argv)
+
+    if args.games < 1 or args.shard_games < 1:
+        parser.error("--games and --shard-games must be at least 1")
+    grid = {}
+    if args.grid:
+        grid.update(_read_json(args.grid))
+    try:
+        grid.update(parse_param(text) for text in args.param)
+        # the boards are built here too, so squares off the board are reported now rather than by a worker
+        for _, rules in expand_grid(grid):
+            rules_board(rules)
+    except (KeyError, ValueError, TypeError) as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    results, cached, played = run_sweep(grid, args.games, args.policy, args.seed, args.workers, args.cache, args.shard_games)
+    rows = result_rows(results)
+    print(format_report(rows, grid))
+    print(f"{len(results)} configurations, {cached} from the cache, {played} shards played in {time.perf_counter() - start:.1f}s")
+    if args.out and rows:
+        write_csv(args.out, rows)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+# game logs: a recorded game replays to the same log, and an archive cut short by a crash is recovered on reopening
+
+import os
+
+import game_log
+
+def _record(game_id: int) -> game_log.LoggedGame:
+    return game_log.record_game(['Ann', 'Bob'], game_id, seed=9)
+
+def _write(path: str, game_ids) -> None:
+    with game_log.LogWriter(path) as writer:
+        for game_id in game_ids:
+            writer.write(_record(game_id))
+
+def _assert_archive(path: str, game_ids: list[int]) -> None:
+    archive = game_log.LogArchive(path)
+    assert [game.game_id for game in archive] == game_ids
+    assert all(game_log.verify(game) for game in archive)
+    for game_id in game_ids:
+        assert archive.game(game_id).records.tobytes() == _record(game_id).records.tobytes()
+
+def test_recovers_from_a_partly_written_index_entry(tmp_path):
+    path = str(tmp_path / 'games.log')
+    _write(path, range(5))
+    # a writer killed part way through a game: some of its data and part of its index entry made it to disk
+    with open(path, 'ab') as data:
+        data.write(b'\x01' * 100)
+    with open(path + '.idx', 'ab') as index:
+        index.write(b'\x02' * 10)
+
+    _write(path, [5])
+    _assert_archive(path, list(range(6)))
+
+def test_recovers_from_data_cut_mid_game(tmp_path):
+    path = str(tmp_path / 'games.log')
+    _write(path, range(4))
+    # the index made it to disk but the end of the data didn't: the last game, and part of the one before it
+    last = game_log.LogArchive(path).index[-1]
+    with open(path, 'r+b') as data:
+        data.truncate(int(last['offset']) - 200)
+
+    _write(path, [4])
+    _assert_archive(path, [0, 1, 4])
+    assert os.path.getsize(path + '.idx') == 3 * game_log.INDEX.itemsize
@@ -0,0 +1,217 @@
+# the engine's optional layers: generated boards, instrumentation, the per game rng, the board renderer and the
+# simulate command
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import game_of_life as life
+
+# every draw at the low end of its range (the die always rolls 1, so a game walks every square of the board)
+class LowRng:
+    def roll(self, low: int, high: int) -> int:
+        return low
+
+    def career_card(self, cards: list):
+        return cards[0]
+
+    def college_card(self, cards: list):
+        return cards[0]
+
+    def coin(self) -> bool:
+        return True
+
+    def kids(self, low: int, high: int) -> int:
+        return high
+
+####################
+# Boards
+####################
+
+def test_tiled_board_repeats_the_standard_layout():
+    standard = life.standard_board()
+    tiled = life.tiled_board(100)
+    for square in range(1, 101):
+        assert tiled.mask_at(square) == standard.mask_at((square - 1) % standard.length + 1), square
+    assert life.tiled_board(standard.length).layout() == standard.layout()
+    # two whole copies, then squares 73 to 100 have the pay squares at 6 to 26 of the third
+    assert tiled.paychecks_through(100) == 2 * len(life.PAY_SQUARE.positions) + 6
+
+def test_random_board_depends_only_on_its_seed():
+    board = life.random_board(100000, seed=4)
+    assert board.layout() == life.random_board(100000, seed=4).layout()
+    assert board.layout() != life.random_board(100000, seed=5).layout()
+    for event, squares in board.layout().items():
+        assert 1 <= min(squares) and max(squares) <= 100000
+        share = len(event.positions) / life.END_OF_GAME
+        assert abs(len(squares) / 100000 - share) < 0.01, event.name
+
+def test_sparse_masks_match_the_event_index():
+    board = life.random_board(life.CompiledBoard.DENSE_LENGTH * 2, seed=1)
+    squares = np.arange(1, board.length + 1)
+    masks = board.masks_at(squares)
+    assert masks[board.event_squares - 1].tolist() == board.event_mask_list
+    assert np.count_nonzero(masks) == len(board.event_square_list)
+
+def test_board_files(tmp_path):
+    board = life.random_board(500, seed=2)
+    life.save_board(board, str(tmp_path / 'board.json'))
+    assert life.load_board(str(tmp_path / 'board.json')).layout() == board.layout()
+
+    layout = {'length': 1000, 'repeat': life.END_OF_GAME,
+              'events': {event.name: event.positions for event in life.LIST_OF_EVENTS}}
+    (tmp_path / 'tiled.json').write_text(json.dumps(layout))
+    assert life.load_board(str(tmp_path / 'tiled.json')).layout() == life.tiled_board(1000).layout()
+
+    (tmp_path / 'unknown.json').write_text(json.dumps({'length': 10, 'events': {'Lottery': [3]}}))
+    with pytest.raises(ValueError):
+        life.load_board(str(tmp_path / 'unknown.json'))
+    (tmp_path / 'outside.json').write_text(json.dumps({'length': 10, 'events': {'Paycheck': [11]}}))
+    with pytest.raises(ValueError):
+        life.load_board(str(tmp_path / 'outside.json'))
+
+####################
+# Instrumentation
+####################
+
+def test_instrumentation_counts_every_square_walked():
+    metrics = life.enable_instrumentation()
+    try:
+        life.simulate_game(['player'], rng=LowRng())
+    finally:
+        life.disable_instrumentation()
+    snapshot = metrics.snapshot()
+    assert snapshot['events'] == {event.name: len(event.positions) for event in life.LIST_OF_EVENTS}
+    assert snapshot['turns_per_game'] == {life.END_OF_GAME: 1}
+    calls = {name: handler['calls'] for name, handler in snapshot['handlers'].items()}
+    # the starting career card, then one per square (every paycheck is on a square of its own)
+    assert calls == {'handle_relationship': 4, 'handle_children': 3, 'draw_career_card': 3, 'draw_college_card': 1,
+                     'Player.pay': 7}
+
+def test_instrumentation_off_restores_the_plain_engine():
+    handlers = dict(life.EVENT_HANDLERS)
+    plain = (life.handle_relationship, life.handle_paychecks, life.Player.pay, life._record_game)
+    metrics = life.enable_instrumentation()
+    instrumented = [player.balance for player in life.simulate_game(['a', 'b'], rng=life.GameRng(4, 2))]
+    assert life.disable_instrumentation() is metrics
+    assert life.METRICS is None
+    assert life.EVENT_HANDLERS == handlers
+    assert (life.handle_relationship, life.handle_paychecks, life.Player.pay, life._record_game) == plain
+    assert metrics.snapshot()['games'] == 1
+    assert [player.balance for player in life.simulate_game(['a', 'b'], rng=life.GameRng(4, 2))] == instrumented
+
+####################
+# GameRng
+####################
+
+def test_game_rng_streams_are_independent():
+    # one stream read far past the others (several blocks on) doesn't move what any other stream draws
+    plain = life.GameRng(9, 3)
+    dice = [plain.roll(1, 6) for _ in range(200)]
+    cards = [plain.career_card(life.career_list) for _ in range(10)]
+
+    busy = life.GameRng(9, 3)
+    busy_cards = [busy.career_card(life.career_list) for _ in range(10)]
+    busy_kids = [busy.kids(0, 3) for _ in range(500)]
+    assert [busy.roll(1, 6) for _ in range(200)] == dice
+    assert busy_cards == cards
+    fresh = life.GameRng(9, 3)
+    assert busy_kids == [fresh.kids(0, 3) for _ in range(500)]
+
+def test_game_rng_skip_to_matches_drawing():
+    drawn = life.GameRng(9, 3)
+    for stream, count in enumerate((70, 3, 0, 130, 1)):
+        for _ in range(count):
+            drawn.draw(stream)
+    skipped = life.GameRng(9, 3)
+    skipped.skip_to(drawn.used)
+    assert [[skipped.draw(stream) for _ in range(80)] for stream in range(5)] == \
+           [[drawn.draw(stream) for _ in range(80)] for stream in range(5)]
+
+def test_antithetic_game_rng_mirrors_every_draw():
+    plain, mirror = life.GameRng(9, 3), life.GameRng(9, 3, antithetic=True)
+    for _ in range(100):
+        assert plain.roll(1, 6) + mirror.roll(1, 6) == 7
+        assert plain.coin() != mirror.coin()
+        assert life.career_list.index(plain.career_card(life.career_list)) + \
+               life.career_list.index(mirror.career_card(life.career_list)) == len(life.career_list) - 1
+
+####################
+# Rendering
+####################
+
+def _players(*positions: int) -> list:
+    players = []
+    for character, position in zip('ABCD', positions):
+        player = life.Player(character)
+        player.character = character
+        player.position = position
+        players.append(player)
+    return players
+
+# the screen (one string per terminal line from the start line on) after the escapes a redraw sent
+def _apply(screen: list, top: int, escapes: str) -> list:
+    screen = list(screen)
+    for line, text in re.findall(r'\x1b\[(\d+);1H(.*?)\x1b\[K', escapes):
+        screen[int(line) - top] = text
+    return screen
+
+def test_renderer_marks_players_and_shared_squares():
+    renderer = life.BoardRenderer(life.standard_board())
+    lines = renderer.lines(_players(0, 3, 3, 20))
+    assert lines[0] == 'Start: A'
+    # square 3 is the third cell of the first row, square 20 the second from the right of the second row
+    assert lines[1][renderer.cell(3)[1]] == life.SHARED_SQUARE
+    assert lines[2][renderer.cell(20)[1]] == 'D'
+    assert renderer.cell(20) == (1, renderer.INDENT + 2 * (life.COLUMNS - 2))
+    assert [line.replace('*', '_').replace('D', '_') for line in lines[1:]] == [renderer.row_line(row) for row in range(2)]
+
+def test_view_sends_only_the_lines_that_changed():
+    view = life.BoardView(life.tiled_board(360))
+    players = _players(0, 5)
+    assert view.redraw(players, 'turn 1').startswith(life.ANSI_HOME + life.ANSI_CLEAR_SCREEN)
+    screen = view.shown
+    assert view.redraw(players, 'turn 1') == ''
+
+    for turn, (a, b) in enumerate([(2, 5), (2, 24), (40, 24), (300, 24)], 2):
+        players = _players(a, b)
+        escapes = view.redraw(players, f'turn {turn}', focus=a)
+        screen = _apply(screen, view.top, escapes)
+        assert screen == view.renderer.lines(players, view.renderer.window(a)) + [f'turn {turn}']
+        if turn == 2:
+            # A left the start line for the first row, which B is on too, nothing else moved
+            assert len(re.findall(r'\x1b\[\d+;1H', escapes)) == 3
+
+def test_long_board_is_drawn_as_a_window():
+    renderer = life.BoardRenderer(life.tiled_board(3600))
+    lines = renderer.lines(_players(3000), renderer.window(3000))
+    assert lines[1] == 'Squares 2917 to 3078 of 3600'
+    assert len(lines) == 2 + 2 * life.WINDOW_ROWS + 1
+    assert any('A' in line for line in lines[2:])
+
+####################
+# Simulate command
+####################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _simulate(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, '-X', 'importtime', '-m', 'game_of_life', 'simulate', '--games', '20', '--seed', '1', *args],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+
+def _imported(result: subprocess.CompletedProcess) -> set:
+    return {line.rsplit('|', 1)[1].strip() for line in result.stderr.splitlines() if line.startswith('import time:') and '|' in line}
+
+def test_module_body_runs_once():
+    result = _simulate('--policy', 'no_college')
+    assert result.stdout.startswith('20 games, 20 players')
+    assert 'tournament' in _imported(result)
+    assert 'game_of_life' not in _imported(result)
+
+def test_default_policy_skips_numpy():
+    assert 'numpy' not in _imported(_simulate())
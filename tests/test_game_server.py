@@ -0,0 +1,91 @@
+# the game server: a table replays answered decisions without drawing twice, and silent or stalled clients are dropped
+
+import asyncio
+
+import game_of_life as life
+import game_server
+
+# the decisions the scripted client makes, it answers '1' (career path, yes) to everything
+class YesPolicy(life.Policy):
+    def switch_career(self, player: life.Player, drawn_career: life.Career) -> bool:
+        return True
+
+    def pursue_education(self, player: life.Player, drawn_college: life.Education) -> bool:
+        return True
+
+async def _serve(server: game_server.GameServer, client) -> list:
+    listening = await asyncio.start_server(server.handle, '127.0.0.1', 0, limit=game_server.MAX_LINE)
+    port = listening.sockets[0].getsockname()[1]
+    async with listening:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=game_server.MAX_LINE)
+        try:
+            return await asyncio.wait_for(client(reader, writer), 10)
+        finally:
+            writer.close()
+
+# plays like scripted_client and returns every line the server sent
+async def _play(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> list:
+    writer.write(b"JOIN t1 Ann\n")
+    lines = []
+    moved = False
+    while True:
+        line = await reader.readline()
+        if not line:
+            return lines
+        line = line.decode().rstrip('\n')
+        lines.append(line)
+        if line.endswith("'s Turn"):
+            moved = False
+        if not line.startswith('? '):
+            continue
+        if line.startswith('? Choose a letter'):
+            answer = 'A'
+        elif line.startswith(f'? {life.DISP_INFO}:info'):
+            answer = life.PASS if moved else life.MOVE
+            moved = True
+        else:
+            answer = '1'
+        writer.write((answer + '\n').encode())
+
+def test_table_plays_the_same_game_as_the_engine():
+    lines = asyncio.run(_serve(game_server.GameServer(seats=1, seed=5), _play))
+    player, = life.simulate_game(['Ann'], YesPolicy(), rng=life.GameRng(5, 0))
+    assert f"You've reached the end of the game as a {player.career.name} and retired with a balance of ${player.balance}!" in lines
+    assert lines[-1] == "All players are retired! Thank you for playing!"
+
+def test_silent_player_times_out():
+    async def join_and_wait(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> list:
+        writer.write(b"JOIN t1 Ann\n")
+        return (await reader.read()).decode().splitlines()
+
+    lines = asyncio.run(_serve(game_server.GameServer(seats=1, idle_timeout=0.2), join_and_wait))
+    # dropped at the first prompt it didn't answer, and disconnected
+    assert lines[-2:] == ["? Choose a letter to represent your character", "Timed out, leaving the table"]
+
+# a socket whose client never reads, so the buffer never drains
+class StalledWriter:
+    def __init__(self):
+        self.closed = False
+
+    def is_closing(self) -> bool:
+        return self.closed
+
+    def write(self, data: bytes) -> None:
+        pass
+
+    async def drain(self) -> None:
+        await asyncio.sleep(60)
+
+    def close(self) -> None:
+        self.closed = True
+
+def test_stalled_reader_is_dropped():
+    async def send() -> bool:
+        connection = game_server.Connection(None, StalledWriter(), 0.1)
+        try:
+            await connection.send("hello")
+        except game_server.PlayerGone:
+            return connection.writer.closed
+        return False
+
+    assert asyncio.run(asyncio.wait_for(send(), 5))
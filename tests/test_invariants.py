@@ -0,0 +1,90 @@
+# Description:  The invariants the rest of the repo leans on, with fixed seeds and small game counts: the engines agree,
+#               results don't depend on the number of workers, snapshots play back exactly, and the interactive game's
+#               output still matches the transcript corpus. Each module's own behaviour is tested in tests/test_<module>.py
+#
+#               python -m pytest -q
+
+import os
+
+import numpy as np
+
+import game_of_life as life
+import batch_engine
+import exact_solver
+import monte_carlo
+import results_sink
+import transcripts
+
+# the default policy's expected final balance on the standard board
+EXPECTED_MEAN = 537166.67
+
+# how many standard errors a sampled mean may be off by
+TOLERANCE_Z = 4
+
+def _assert_close(balances, expected: float) -> None:
+    balances = np.asarray(balances, dtype=np.float64)
+    error = balances.std() / np.sqrt(len(balances))
+    assert abs(balances.mean() - expected) < TOLERANCE_Z * error, (balances.mean(), expected, error)
+
+####################
+# Engines
+####################
+
+def test_exact_mean():
+    assert round(float(exact_solver.exact_distribution().mean_balance()), 2) == EXPECTED_MEAN
+
+def test_batch_engine_mean():
+    _assert_close(batch_engine.simulate_batch(200000, rng=1).balance, EXPECTED_MEAN)
+
+def test_scalar_engine_mean():
+    _assert_close([life.simulate_game(['player'], rng=life.GameRng(2, game_id))[0].balance for game_id in range(10000)],
+                  EXPECTED_MEAN)
+
+####################
+# Workers
+####################
+
+def test_monte_carlo_same_for_any_worker_count():
+    one = monte_carlo.run_monte_carlo(20000, workers=1, seed=3, chunk_size=4096)
+    three = monte_carlo.run_monte_carlo(20000, workers=3, seed=3, chunk_size=4096)
+    assert one.tobytes() == three.tobytes()
+
+def test_results_directory_same_for_any_worker_count(tmp_path):
+    for workers in (1, 3):
+        results_sink.write_monte_carlo(str(tmp_path / str(workers)), 20000, workers=workers, seed=3, chunk_size=4096)
+    for name in sorted(os.listdir(tmp_path / '1')):
+        assert (tmp_path / '1' / name).read_bytes() == (tmp_path / '3' / name).read_bytes(), name
+
+def test_results_directory_carried_on(tmp_path):
+    results_sink.write_monte_carlo(str(tmp_path / 'whole'), 20000, workers=1, seed=3, chunk_size=4096)
+    results_sink.write_monte_carlo(str(tmp_path / 'parts'), 8192, workers=1, seed=3, chunk_size=4096)
+    assert results_sink.write_monte_carlo(str(tmp_path / 'parts'), 20000, workers=1, seed=3, chunk_size=4096) == 20000
+    assert results_sink.write_monte_carlo(str(tmp_path / 'parts'), 20000, workers=1, seed=3, chunk_size=4096) == 20000
+    for name in sorted(os.listdir(tmp_path / 'whole')):
+        assert (tmp_path / 'whole' / name).read_bytes() == (tmp_path / 'parts' / name).read_bytes(), name
+
+####################
+# Snapshots
+####################
+
+def test_snapshot_resumes_identically():
+    engine = life.Engine(life.Policy(), life.GameRng(5, 7))
+    players = [life.Player(name) for name in ('Ann', 'Bob', 'Cy')]
+    for player in players:
+        life.start_player(player, engine)
+    for _ in range(4):
+        for player in players:
+            life.move_player(player, engine)
+    snapshot = life.snapshot_game(players, 0, engine.rng)
+
+    life.simulate_game(players, engine=engine)
+    restored, _, rng = life.restore_game(snapshot)
+    life.simulate_game(restored, rng=rng)
+    assert life.snapshot_game(restored, 0, rng) == life.snapshot_game(players, 0, engine.rng)
+
+####################
+# Transcripts
+####################
+
+def test_transcript_corpus():
+    assert transcripts.check_corpus(workers=1) == []
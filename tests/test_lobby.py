@@ -0,0 +1,64 @@
+# large lobbies: bots move in one batched step per round, scripted players are grouped by policy and humans queue
+
+import builtins
+
+import numpy as np
+import pytest
+
+import game_of_life as life
+import batch_engine
+import lobby
+import mcts_bot
+import tournament
+
+def _player(name: str, policy: life.Policy = None) -> life.Player:
+    player = life.Player(name)
+    player.policy = policy
+    return player
+
+def test_bots_play_the_batch_engines_game():
+    room = lobby.Lobby(bots=5000, seed=3)
+    room.play()
+    played = batch_engine.simulate_batch(5000, rng=3)
+    assert room.remaining == 0
+    assert room.rounds == played.turns.max()
+    assert np.array_equal(room.groups[0].table.balance, played.balance)
+    standings = room.standings(5)
+    assert [balance for _, balance in standings] == sorted(played.balance.tolist(), reverse=True)[:5]
+
+def test_scripted_players_are_grouped_by_policy():
+    no_college = tournament.NoCollege()
+    players = [_player('Ann', no_college), _player('Bob', tournament.AlwaysSwitch()), _player('Cy', no_college)]
+    room = lobby.Lobby(players, bots=100, seed=1, engine=life.Engine(rng=life.GameRng(1, 0)))
+    assert [group.players for group in room.groups] == [[players[0], players[2]], [players[1]], None]
+    assert room.remaining == room.player_count() == 103
+    room.play()
+    for player in players:
+        assert player.retired and player.position == life.END_OF_GAME
+    # the rows were played on their own group's policy
+    assert players[0].education == players[2].education == [life.GED]
+    assert {name for name, _ in room.standings(103)} >= {'Ann', 'Bob', 'Cy'}
+
+def test_policy_that_cannot_batch_is_refused():
+    with pytest.raises(ValueError):
+        lobby.Lobby([_player('Ann', mcts_bot.MonteCarloBot())], engine=life.Engine(rng=life.GameRng(1, 0)))
+
+def test_humans_take_turns_until_they_retire(monkeypatch):
+    # a human who has already set up, moves on every turn and answers yes to everything
+    human = life.Player('Ann')
+    human.initialized = True
+    human.career = life.PLUMBER
+    moves = []
+
+    def answer(prompt: str = '') -> str:
+        if prompt.startswith("Input action"):
+            moves.append(len(moves) % 2 == 0)
+            return life.MOVE if moves[-1] else life.PASS
+        return '1'
+
+    monkeypatch.setattr(builtins, 'input', answer)
+    room = lobby.Lobby([human], bots=50, seed=1, engine=life.Engine(life.InteractivePolicy(), life.GameRng(1, 0)))
+    assert room.humans == [human] and list(room.queue) == [0]
+    room.play()
+    assert human.retired and not room.queue and room.remaining == 0
+    assert room.rounds >= moves.count(True)
@@ -0,0 +1,56 @@
+# the Monte Carlo tree search bot: what it decides, where its rollouts start, and that nothing batched plays it
+
+import numpy as np
+import pytest
+
+import game_of_life as life
+import batch_engine
+import lobby
+import mcts_bot
+import monte_carlo
+
+def test_batch_engine_refuses_the_bot():
+    bot = mcts_bot.MonteCarloBot(workers=1)
+    with pytest.raises(ValueError):
+        batch_engine.simulate_batch(100, bot, np.random.default_rng(0))
+    with pytest.raises(ValueError):
+        monte_carlo.run_monte_carlo(100, bot, workers=1)
+    with pytest.raises(ValueError):
+        lobby.Lobby(bots=10, bot_policy=bot)
+    with pytest.raises(ValueError):
+        lobby.Lobby(mcts_bot.bot_players(2, workers=1))
+
+# from a decision part way through a move, the rest of the move is resolved before the rest of the game, so the money
+# made is the same whether the move ends on the decision square or further on
+def test_rollout_resolves_the_rest_of_the_move():
+    player = life.Player('Ann')
+    player.career = life.career_list[0]
+    player.initialized = True
+    row = batch_engine.PlayerTable.from_players([player]).columns()
+    gains = []
+    for end in (17, 20):
+        count, total, _ = mcts_bot.rollout((row, 17, end, mcts_bot.EDUCATE, 0, False, 20000, 1))
+        gains.append(total / count)
+    assert abs(gains[0] - gains[1]) < 2000
+
+def test_bot_decides_for_the_engine_asking():
+    bot = mcts_bot.MonteCarloBot(budget=0.001, workers=1, seed=0)
+    boards = [life.standard_board(), life.tiled_board(90)]
+    for number, board in enumerate(boards):
+        engine = life.Engine(bot, life.GameRng(0, number), board=board)
+        life.simulate_game(['Ann'], engine=engine)
+        assert bot.engine is engine
+    assert {state[0] for state, _ in bot.cache} == set(boards)
+    assert mcts_bot._worker['board'] is boards[-1]
+
+# the rollouts pay for college when they can afford it, so the balance is part of the state until the last education
+# chance has gone by
+def test_cache_key_has_the_balance_while_college_is_ahead():
+    bot = mcts_bot.MonteCarloBot(budget=0.001, workers=1, seed=0)
+    engine = life.Engine(bot, life.GameRng(0, 0))
+    last = max(engine.board.layout()[life.EDUCATION_CHANCE])
+    for _ in range(20):
+        life.simulate_game(['Ann'], engine=engine)
+    balances = {state[1]: state[-1] for state, _ in bot.cache}
+    assert all(balance is not None for square, balance in balances.items() if square < last)
+    assert all(balance is None for square, balance in balances.items() if square >= last)
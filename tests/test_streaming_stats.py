@@ -0,0 +1,53 @@
+# streaming statistics: an aggregate merged from parts is the aggregate of the whole, whatever the workers
+
+import json
+
+import numpy as np
+import pytest
+
+import batch_engine
+import streaming_stats
+
+def _table(n_games: int = 20000) -> batch_engine.PlayerTable:
+    return batch_engine.simulate_batch(n_games, rng=np.random.default_rng(4))
+
+def _assert_same(merged: streaming_stats.GameStats, whole: streaming_stats.GameStats) -> None:
+    merged, whole = merged.to_dict(), whole.to_dict()
+    for name in whole:
+        for field, value in whole[name].items():
+            if name in ('balance', 'kids') and field in ('mean', 'm2'):
+                assert merged[name][field] == pytest.approx(value, rel=1e-9), (name, field)
+            else:
+                assert merged[name][field] == value, (name, field)
+
+def test_merge_of_parts_equals_the_whole():
+    table = _table()
+    whole = streaming_stats.GameStats()
+    whole.add_table(table)
+    merged = streaming_stats.GameStats()
+    for first in range(0, len(table), 3000):
+        part = streaming_stats.GameStats()
+        part.add_table(table[first:first + 3000])
+        # parts saved by separate runs are merged from their JSON
+        merged.merge(streaming_stats.GameStats.from_dict(json.loads(json.dumps(part.to_dict()))))
+    _assert_same(merged, whole)
+
+def test_run_stats_same_for_any_worker_count():
+    one = streaming_stats.run_stats(50000, workers=1, seed=2, chunk_size=4096, chunks_per_task=2)
+    two = streaming_stats.run_stats(50000, workers=2, seed=2, chunk_size=4096, chunks_per_task=2)
+    assert one.to_dict() == two.to_dict()
+    assert one.balance.count == 50000
+
+def test_quantiles_stay_within_the_values_seen():
+    stats = streaming_stats.GameStats()
+    stats.add_table(_table())
+    for q in streaming_stats.QUANTILES:
+        assert stats.balance.min <= stats.balance_sketch.quantile(q) <= stats.balance.max
+
+def test_report_with_every_balance_out_of_the_histogram():
+    table = batch_engine.PlayerTable(2)
+    table.balance[:] = [3000000, 4000000]
+    stats = streaming_stats.GameStats()
+    stats.add_table(table)
+    report = streaming_stats.format_report(stats)
+    assert '2 at or above 2,000,000' in report
@@ -0,0 +1,45 @@
+# parameter sweeps: results are cached by configuration, an interrupted sweep picks up from its saved shards, and
+# a grid is checked before anything is played
+
+import os
+
+import pytest
+
+import sweep
+
+GRID = {'salary.Artist': [20000, 60000], 'starting_balance': [100000]}
+
+def _run(cache_dir: str, workers: int = 1) -> tuple:
+    return sweep.run_sweep(GRID, 5000, seed=1, workers=workers, cache_dir=cache_dir, shard_games=2000)
+
+def test_rerun_plays_nothing(tmp_path):
+    results, cached, played = _run(str(tmp_path))
+    assert (cached, played) == (0, 6)
+    again, cached, played = _run(str(tmp_path))
+    assert (cached, played) == (2, 0)
+    assert again == results
+    assert results[0]['summary']['games'] == 5000
+    # the rules are back as they were after the sweep
+    assert sweep.current_rules() == sweep.DEFAULT_RULES
+
+def test_interrupted_sweep_resumes_from_its_shards(tmp_path):
+    whole, _, _ = _run(str(tmp_path / 'whole'), workers=2)
+    # a run that got as far as one shard of the first configuration and then died
+    resumed_dir = str(tmp_path / 'resumed')
+    rules = sweep.expand_grid(GRID)[0][1]
+    key = sweep.config_key(rules, 'default', 1, 5000, 2000)
+    _, count, seed = sweep.monte_carlo.chunk_tasks(5000, 1, 2000)[0]
+    sweep.play_shard((resumed_dir, key, rules, 'default', 0, count, seed))
+
+    resumed, cached, played = _run(resumed_dir)
+    assert (cached, played) == (0, 5)
+    assert resumed == whole
+    assert not os.path.exists(os.path.join(resumed_dir, 'shards', key))
+
+def test_grid_is_checked_before_playing(tmp_path):
+    with pytest.raises(ValueError):
+        sweep.run_sweep(GRID, 0, cache_dir=str(tmp_path))
+    for argv in (['--games', '0'], ['--param', 'positions.Paycheck=[[5,99]]'], ['--param', 'salary.Nobody=[1]']):
+        with pytest.raises(SystemExit):
+            sweep.main(argv + ['--cache', str(tmp_path)])
+    assert not os.path.exists(tmp_path / 'results')
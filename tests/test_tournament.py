@@ -0,0 +1,52 @@
+# the tournament: pairings stop once their interval settles, without calling a winner between equal strategies,
+# and common or antithetic sampling narrows the interval for the same number of games
+
+import game_of_life as life
+import tournament
+
+def test_clear_winner_stops_early():
+    pairing = tournament.run_pairing(tournament.Pairing('default', 'no_college'), seed=1, batch=200, max_games=4000)
+    assert pairing.verdict == 'default'
+    assert pairing.stopped_early
+    # the interval is only looked at every batch games
+    assert pairing.games % 200 == 0 and pairing.games < 4000
+
+def test_equal_strategies_are_never_separated():
+    # every look is at alpha / looks, so ten looks per pairing over ten seeds still call no winner
+    for seed in range(10):
+        pairing = tournament.run_pairing(tournament.Pairing('default', 'default'), seed=seed, batch=100, max_games=1000)
+        assert (pairing.verdict, pairing.games, pairing.stopped_early) == ('unsettled', 1000, False), seed
+
+def test_tolerance_settles_a_tie():
+    pairing = tournament.run_pairing(tournament.Pairing('default', 'default'), seed=0, batch=100, max_games=4000,
+                                     tolerance=20000)
+    assert pairing.verdict == 'tie' and pairing.stopped_early
+
+def test_tournament_ranks_by_pairings_won():
+    pairings, ranking, points = tournament.run_tournament(['no_college', 'default', 'college_first'], seed=1,
+                                                          batch=200, max_games=4000)
+    assert [pairing.verdict for pairing in pairings] == ['default', 'college_first', 'college_first']
+    assert ranking == ['college_first', 'default', 'no_college']
+    assert points == {'college_first': 2.0, 'default': 1.0, 'no_college': 0.0}
+
+def test_common_sampling_replays_the_same_game():
+    mine, theirs, games = tournament.play_sample(life.Policy(), life.Policy(), tournament.COMMON, 2, 3, 7, 0)
+    assert games == 2 and mine == theirs
+    assert mine == tournament.play_game([life.Policy(), life.Policy()], 3, 7)
+
+def test_antithetic_sampling_adds_the_mirrored_game():
+    first, second = tournament.NoCollege(), life.Policy()
+    common = tournament.play_sample(first, second, tournament.COMMON, 2, 3, 7, 0)
+    mine, theirs, games = tournament.play_sample(first, second, tournament.ANTITHETIC, 2, 3, 7, 0)
+    assert games == 4
+    assert (mine[:2], theirs[:2]) == common[:2]
+    assert mine[2:] == tournament.play_game([first, first], 3, 7, antithetic=True)
+
+def test_common_and_antithetic_sampling_reduce_variance():
+    reductions = {}
+    for sampling in (tournament.COMMON, tournament.ANTITHETIC):
+        pairing = tournament.run_pairing(tournament.Pairing('default', 'no_college', sampling), seed=1, batch=200,
+                                         max_games=4000)
+        assert pairing.verdict == 'default'
+        reductions[sampling] = pairing.variance_reduction()
+    assert 2 < reductions[tournament.COMMON] < reductions[tournament.ANTITHETIC]
@@ -0,0 +1,289 @@
+# Description:  Policy tournament. Plays decision strategies against each other in multiplayer games (every pair of
+#               strategies, seats alternating between the two) and keeps running confidence intervals on the win rate
+#               and the balance difference of each pairing. A pairing stops as soon as its interval settles which
+#               strategy is ahead, instead of after a fixed number of games. With --sampling common (or antithetic)
+#               both strategies play the same dice and cards, and the report gives the variance reduction achieved.
+#
+#               python tournament.py default always_switch no_college --alpha 0.05 --max-games 200000
+#               python tournament.py default always_switch --sampling antithetic --seats 1
+
+import argparse
+import itertools
+import math
+import sys
+from statistics import NormalDist
+
+import game_of_life as life
+
+####################
+# Strategies
+####################
+
+# takes every career drawn
+class AlwaysSwitch(life.Policy):
+    def switch_career(self, player: life.Player, drawn_career: life.Career) -> bool:
+        return True
+
+    def batch_switch_career(self, state, idx, drawn_salary):
+        return True
+
+# keeps the first career it gets
+class NeverSwitch(life.Policy):
+    def switch_career(self, player: life.Player, drawn_career: life.Career) -> bool:
+        return False
+
+    def batch_switch_career(self, state, idx, drawn_salary):
+        return False
+
+# never pays for an education
+class NoCollege(life.Policy):
+    def pursue_education(self, player: life.Player, drawn_college: life.Education) -> bool:
+        return False
+
+    def batch_pursue_education(self, state, idx, cost):
+        return False
+
+# starts on the education path
+class CollegeFirst(life.Policy):
+    def starting_path(self, player: life.Player) -> str:
+        return life.EDUCATION
+
+    def batch_starting_path(self, state, idx):
+        return False
+
+# never tries to get married
+class NoMarriage(life.Policy):
+    def attempt_marriage(self, player: life.Player) -> bool:
+        return False
+
+    def batch_attempt_marriage(self, state, idx):
+        return False
+
+# never tries for children
+class NoChildren(life.Policy):
+    def attempt_children(self, player: life.Player) -> bool:
+        return False
+
+    def batch_attempt_children(self, state, idx):
+        return False
+
+# the strategies by the name used on the command line
+STRATEGIES = {
+    'default': life.Policy,
+    'always_switch': AlwaysSwitch,
+    'never_switch': NeverSwitch,
+    'no_college': NoCollege,
+    'college_first': CollegeFirst,
+    'no_marriage': NoMarriage,
+    'no_children': NoChildren,
+}
+
+####################
+# Statistics
+####################
+
+# running mean and variance of a stream of numbers (Welford's method)
+class Running:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else float('inf')
+
+    # half the width of the confidence interval on the mean for a normal quantile z
+    def half_width(self, z: float) -> float:
+        return z * math.sqrt(self.variance() / self.count) if self.count > 1 else float('inf')
+
+# what a pairing measures to decide who is ahead
+BALANCE = 'balance'
+WINS = 'wins'
+
+# how the games of a pairing are drawn:
+#   independent  one game with the seats split between the strategies
+#   common       common random numbers, the same game (same dice and cards) once with every seat on each strategy
+#   antithetic   common, and again with every die roll r turned into 7 - r
+INDEPENDENT = 'independent'
+COMMON = 'common'
+ANTITHETIC = 'antithetic'
+# games played for one sample of the difference
+GAMES_PER_SAMPLE = {INDEPENDENT: 1, COMMON: 2, ANTITHETIC: 4}
+
+# the state of one pairing, first against second
+class Pairing:
+    def __init__(self, first: str, second: str, sampling: str = INDEPENDENT):
+        self.first = first
+        self.second = second
+        self.sampling = sampling
+        # one value per sample: 1 when first has the top balance, 0 when second has it, 0.5 on a tie
+        self.wins = Running()
+        # one value per sample: mean balance of first's seats minus mean balance of second's seats
+        self.difference = Running()
+        # the final balance of every single player on each strategy
+        self.first_balance = Running()
+        self.second_balance = Running()
+        self.games = 0
+        self.seats_played = 0
+        # the name of the strategy ahead, 'tie' when both are within the tolerance, 'unsettled' if max_games ran out
+        self.verdict = None
+        self.stopped_early = False
+
+    # how many times fewer player games the sampling needs than independent sampling for the same interval width:
+    # independent sampling with c player games split evenly has variance 2 * (var first + var second) / c
+    def variance_reduction(self) -> float:
+        if self.difference.count < 2 or self.difference.variance() == 0:
+            return float('nan')
+        independent = 2 * (self.first_balance.variance() + self.second_balance.variance())
+        return independent / (self.difference.variance() * self.seats_played / self.difference.count)
+
+    # the confidence interval of the measured quantity, centred on 0 (0.5 win rate is shifted down)
+    def interval(self, measure: str, z: float) -> tuple:
+        running = self.difference if measure == BALANCE else self.wins
+        centre = running.mean - (0.5 if measure == WINS else 0.0)
+        width = running.half_width(z)
+        return (centre - width, centre + width)
+
+    # settles the verdict if the interval allows it, tolerance is the difference treated as no difference
+    def settle(self, measure: str, z: float, tolerance: float) -> bool:
+        low, high = self.interval(measure, z)
+        if low > 0:
+            self.verdict = self.first
+        elif high < 0:
+            self.verdict = self.second
+        elif tolerance and -tolerance < low and high < tolerance:
+            self.verdict = 'tie'
+        return self.verdict is not None
+
+####################
+# Games
+####################
+
+# plays one game with the given policy in each seat and returns the final balances in seat order
+def play_game(policies: list[life.Policy], seed: int, game_id: int, board: life.CompiledBoard = None,
+              antithetic: bool = False) -> list[int]:
+    players = []
+    for seat, policy in enumerate(policies):
+        player = life.Player(f'seat {seat + 1}')
+        player.policy = policy
+        players.append(player)
+    life.simulate_game(players, rng=life.GameRng(seed, game_id, antithetic), board=board)
+    return [player.balance for player in players]
+
+# one sample of a pairing, returns (balances of first's players, balances of second's players, games played)
+def play_sample(first: life.Policy, second: life.Policy, sampling: str, seats: int, seed: int, game_id: int,
+                sample: int, board: life.CompiledBoard = None) -> tuple:
+    if sampling == INDEPENDENT:
+        # seats alternate between the strategies, and which one sits first alternates every sample
+        first_seats = [(seat + sample) % 2 == 0 for seat in range(seats)]
+        policies = [first if is_first else second for is_first in first_seats]
+        balances = play_game(policies, seed, game_id, board)
+        mine = [balance for balance, is_first in zip(balances, first_seats) if is_first]
+        theirs = [balance for balance, is_first in zip(balances, first_seats) if not is_first]
+        return mine, theirs, 1
+
+    mine, theirs = [], []
+    for antithetic in ([False, True] if sampling == ANTITHETIC else [False]):
+        mine += play_game([first] * seats, seed, game_id, board, antithetic)
+        theirs += play_game([second] * seats, seed, game_id, board, antithetic)
+    return mine, theirs, GAMES_PER_SAMPLE[sampling]
+
+# plays games between two strategies until the pairing is settled or max_games have been played.
+# the interval is checked every `batch` games, and every check uses alpha / (number of checks possible)
+# so that looking early doesn't raise the chance of a wrong verdict above alpha
+def run_pairing(pairing: Pairing, seed: int = 0, pairing_id: int = 0, seats: int = 2, alpha: float = 0.05,
+                batch: int = 200, max_games: int = 100000, measure: str = BALANCE, tolerance: float = 0.0,
+                board: life.CompiledBoard = None) -> Pairing:
+    first, second = STRATEGIES[pairing.first](), STRATEGIES[pairing.second]()
+    per_sample = GAMES_PER_SAMPLE[pairing.sampling]
+    looks = math.ceil(max_games / batch)
+    z = NormalDist().inv_cdf(1 - alpha / (2 * looks))
+    while pairing.games + per_sample <= max_games:
+        checked_at = pairing.games
+        while pairing.games - checked_at < batch and pairing.games + per_sample <= max_games:
+            sample = pairing.difference.count
+            mine, theirs, games = play_sample(first, second, pairing.sampling, seats, seed, (pairing_id << 32) + sample,
+                                              sample, board)
+            pairing.games += games
+            pairing.seats_played += len(mine) + len(theirs)
+            pairing.difference.add(sum(mine) / len(mine) - sum(theirs) / len(theirs))
+            pairing.wins.add(1.0 if max(mine) > max(theirs) else 0.0 if max(mine) < max(theirs) else 0.5)
+            for balance in mine:
+                pairing.first_balance.add(balance)
+            for balance in theirs:
+                pairing.second_balance.add(balance)
+        if pairing.settle(measure, z, tolerance):
+            pairing.stopped_early = pairing.games + per_sample <= max_games
+            return pairing
+    pairing.verdict = 'unsettled'
+    return pairing
+
+# every pairing of the named strategies, and the strategies ranked by pairings won (half a point for a tie or unsettled)
+def run_tournament(names: list[str], seed: int = 0, sampling: str = INDEPENDENT, **options) -> tuple:
+    pairings = []
+    for pairing_id, (first, second) in enumerate(itertools.combinations(names, 2)):
+        pairings.append(run_pairing(Pairing(first, second, sampling), seed, pairing_id, **options))
+
+    points = {name: 0.0 for name in names}
+    for pairing in pairings:
+        if pairing.verdict in points:
+            points[pairing.verdict] += 1
+        else:
+            points[pairing.first] += 0.5
+            points[pairing.second] += 0.5
+    ranking = sorted(names, key=lambda name: -points[name])
+    return pairings, ranking, points
+
+# the results as text, intervals at the nominal alpha (the stopping rule used the stricter per-check level)
+def format_report(pairings: list[Pairing], ranking: list[str], points: dict, alpha: float = 0.05) -> str:
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    lines = []
+    for pairing in pairings:
+        lines.append(
+            f"{pairing.first} vs {pairing.second}: {pairing.verdict} after {pairing.games:,} games" +
+            (" (stopped early)" if pairing.stopped_early else "") + "\n" +
+            f"    win rate {pairing.wins.mean:.3f} ± {pairing.wins.half_width(z):.3f}, " +
+            f"balance difference {pairing.difference.mean:+,.0f} ± {pairing.difference.half_width(z):,.0f} dollars" +
+            (f", variance reduction {pairing.variance_reduction():.1f}x" if pairing.sampling != INDEPENDENT else "")
+        )
+    lines.append("Ranking:")
+    for place, name in enumerate(ranking, 1):
+        lines.append(f"    {place}. {name} ({points[name]:g} points)")
+    return '\n'.join(lines)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Play decision strategies against each other until the ranking is settled')
+    parser.add_argument('strategies', nargs='*', default=list(STRATEGIES), help=f"from: {', '.join(STRATEGIES)} (default: all)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--seats', type=int, default=2, help='players per game, split between the two strategies')
+    parser.add_argument('--alpha', type=float, default=0.05, help='chance of a wrong verdict per pairing')
+    parser.add_argument('--batch', type=int, default=200, help='games played between checks of the interval')
+    parser.add_argument('--max-games', type=int, default=100000, help='games per pairing before giving up')
+    parser.add_argument('--measure', choices=[BALANCE, WINS], default=BALANCE, help='what decides who is ahead')
+    parser.add_argument('--sampling', choices=list(GAMES_PER_SAMPLE), default=INDEPENDENT,
+                        help='common and antithetic replay the same dice and cards under both strategies')
+    parser.add_argument('--tolerance', type=float, default=0.0,
+                        help='a difference this small counts as a tie (dollars, or win rate above 0.5)')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)}")
+    if args.seats < (2 if args.sampling == INDEPENDENT else 1):
+        parser.error('independent sampling needs at least 2 seats')
+
+    pairings, ranking, points = run_tournament(
+        args.strategies, args.seed, seats=args.seats, alpha=args.alpha, batch=args.batch,
+        max_games=args.max_games, measure=args.measure, tolerance=args.tolerance, sampling=args.sampling,
+    )
+    print(format_report(pairings, ranking, points, args.alpha))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
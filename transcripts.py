@@ -0,0 +1,294 @@
+# Description:  Transcript driver for the interactive game. A transcript is a text file of what a user typed, one line per
+#               input() call, played through the real menus (players_init, player_creation, action_handler, end_game) with
+#               input() answered from the file and everything printed captured in a buffer. The captured output is
+#               compared against a golden file next to the transcript, so a whole directory of sessions is a regression
+#               test, run in parallel on a process pool. The time the menu code takes between an answer and the next
+#               prompt is measured per prompt. A corpus file (transcript_corpus.json, kept in the repo) pins a set of
+#               generated sessions without storing them: the arguments they were generated with and a digest of every
+#               session's output.
+#
+#               python transcripts.py generate sessions --count 2000
+#               python transcripts.py record sessions
+#               python transcripts.py check sessions --workers 8
+#               python transcripts.py check-corpus transcript_corpus.json
+#               python transcripts.py record-corpus transcript_corpus.json --count 1000
+
+import argparse
+import contextlib
+import difflib
+import glob
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import game_of_life as life
+
+# a transcript is <name>.txt and its golden output is <name>.out
+TRANSCRIPT = '.txt'
+GOLDEN = '.out'
+# header lines at the top of a transcript start with this, the only one so far is "# seed: N" for the random module
+HEADER = '# '
+
+# how a transcript finished
+EXITED = 'exited'           # end_game was confirmed
+COMPLETED = 'completed'     # every player retired
+EXHAUSTED = 'exhausted'     # the transcript ran out of lines first
+
+# what the check of one transcript found
+PASSED = 'passed'
+FAILED = 'failed'
+MISSING = 'missing'         # no golden file yet
+RECORDED = 'recorded'
+
+# a transcript's seed and lines
+def read_transcript(path: str) -> tuple:
+    with open(path) as transcript:
+        lines = transcript.read().splitlines()
+    seed = 0
+    while lines and lines[0].startswith(HEADER):
+        key, _, value = lines.pop(0)[len(HEADER):].partition(':')
+        if key.strip() == 'seed':
+            seed = int(value)
+    return seed, lines
+
+def write_transcript(path: str, lines: list[str], seed: int = 0) -> None:
+    with open(path, 'w') as transcript:
+        transcript.write(f'{HEADER}seed: {seed}\n')
+        for line in lines:
+            transcript.write(line + '\n')
+
+# stands in for input(): shows the prompt, echoes the next line as if it had been typed, and times how long the
+# menu code took from the previous answer to this prompt (that time belongs to the previous prompt)
+class ScriptedInput:
+    def __init__(self, lines: list[str], out):
+        self.lines = lines
+        self.out = out
+        self.used = 0
+        self.prompt = None
+        self.answered = 0.0
+        # prompt: [count, total seconds, max seconds]
+        self.latency = {}
+
+    def __call__(self, prompt: str = '') -> str:
+        now = time.perf_counter()
+        if self.prompt is not None:
+            totals = self.latency.setdefault(self.prompt, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += now - self.answered
+            totals[2] = max(totals[2], now - self.answered)
+        self.out.write(prompt)
+        if self.used == len(self.lines):
+            self.prompt = None
+            raise EOFError('end of transcript')
+        line = self.lines[self.used]
+        self.used += 1
+        self.out.write(line + '\n')
+        # prompts are told apart by their first line (some start with a blank one)
+        self.prompt = prompt.strip().split('\n')[0] or '(blank)'
+        self.answered = time.perf_counter()
+        return line
+
+# plays a transcript through life.main(), returns (captured output, how it finished, per prompt latency)
+def play_transcript(lines: list[str], seed: int = 0) -> tuple:
+    out = io.StringIO()
+    scripted = ScriptedInput(lines, out)
+    # the game keeps its players in a module list and draws from the random module
+    life.player_list.clear()
+    random.seed(seed)
+    life.input = scripted
+    try:
+        with contextlib.redirect_stdout(out):
+            life.main()
+        ended = COMPLETED
+    except SystemExit:
+        ended = EXITED
+    except EOFError:
+        ended = EXHAUSTED
+    finally:
+        del life.input
+    return out.getvalue(), ended, scripted.latency
+
+# runs one transcript file, and either writes its golden file or compares against it
+# returns (path, result, how it finished, unified diff or '', latency)
+def run_file(path: str, record: bool = False) -> tuple:
+    seed, lines = read_transcript(path)
+    output, ended, latency = play_transcript(lines, seed)
+    golden_path = os.path.splitext(path)[0] + GOLDEN
+    if record:
+        with open(golden_path, 'w') as golden:
+            golden.write(output)
+        return path, RECORDED, ended, '', latency
+    if not os.path.exists(golden_path):
+        return path, MISSING, ended, '', latency
+    with open(golden_path) as golden:
+        expected = golden.read()
+    if output == expected:
+        return path, PASSED, ended, '', latency
+    diff = difflib.unified_diff(expected.splitlines(True), output.splitlines(True), golden_path, 'output')
+    return path, FAILED, ended, ''.join(diff), latency
+
+def _run_recording(path: str) -> tuple:
+    return run_file(path, True)
+
+# runs every transcript in a directory on a process pool, returns the per transcript results in path order
+def run_directory(directory: str, record: bool = False, workers: int = None) -> list[tuple]:
+    paths = sorted(glob.glob(os.path.join(directory, '*' + TRANSCRIPT)))
+    workers = workers or os.cpu_count() or 1
+    run = _run_recording if record else run_file
+    # the map (and numpy with it) is set up before the first transcript so it doesn't count as a prompt's latency
+    if workers == 1 or len(paths) < 2:
+        life.initialize_board()
+        return [run(path) for path in paths]
+    with Pool(min(workers, len(paths)), life.initialize_board) as pool:
+        return pool.map(run, paths, chunksize=max(1, len(paths) // (workers * 8)))
+
+# the latency of every transcript added up per prompt
+def merge_latency(results: list[tuple]) -> dict:
+    merged = {}
+    for *_, latency in results:
+        for prompt, (count, total, most) in latency.items():
+            totals = merged.setdefault(prompt, [0, 0.0, 0.0])
+            totals[0] += count
+            totals[1] += total
+            totals[2] = max(totals[2], most)
+    return merged
+
+# random sessions for coverage: mostly menu answers, sometimes junk, leaning on moving and passing so games get
+# somewhere. Every session adds a few players, starts, and then types `length` more lines
+ANSWERS = ['1', '2', '3', '4', '0', 'X', 'Y', 'N', 'A', 'b', '', 'junk']
+WEIGHTS = [6, 10, 8, 2, 1, 1, 1, 1, 2, 1, 1, 1]
+
+def random_session(rng: random.Random, length: int = 300) -> list[str]:
+    lines = []
+    for number in range(rng.randint(1, 4)):
+        lines += ['1', f'player{number}']
+    lines += ['0', '1']
+    lines += rng.choices(ANSWERS, WEIGHTS, k=length)
+    return lines
+
+def generate(directory: str, count: int, seed: int = 0, length: int = 300) -> None:
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    for number in range(count):
+        path = os.path.join(directory, f'session{number:05}{TRANSCRIPT}')
+        write_transcript(path, random_session(rng, length), rng.randrange(1 << 32))
+
+####################
+# Corpus files
+####################
+
+# the corpus file kept in the repo
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transcript_corpus.json')
+
+# the (lines, seed) of every session of a corpus, the same sessions generate() writes for the same arguments
+def corpus_sessions(corpus: dict) -> list[tuple]:
+    rng = random.Random(corpus['seed'])
+    sessions = []
+    for _ in range(corpus['count']):
+        lines = random_session(rng, corpus['length'])
+        sessions.append((lines, rng.randrange(1 << 32)))
+    return sessions
+
+def _digest(session: tuple) -> str:
+    output, _, _ = play_transcript(*session)
+    return hashlib.sha256(output.encode()).hexdigest()
+
+# the digest of every session of a corpus, played on a process pool
+def corpus_digests(corpus: dict, workers: int = None) -> list[str]:
+    sessions = corpus_sessions(corpus)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sessions) < 2:
+        life.initialize_board()
+        return [_digest(session) for session in sessions]
+    with Pool(min(workers, len(sessions)), life.initialize_board) as pool:
+        return pool.map(_digest, sessions, chunksize=max(1, len(sessions) // (workers * 8)))
+
+def record_corpus(path: str, count: int, seed: int = 0, length: int = 300, workers: int = None) -> None:
+    corpus = {'count': count, 'seed': seed, 'length': length}
+    corpus['digests'] = corpus_digests(corpus, workers)
+    with open(path, 'w') as out:
+        json.dump(corpus, out, indent=0)
+        out.write('\n')
+
+# the numbers of the sessions of a corpus file whose output no longer matches
+def check_corpus(path: str = CORPUS, workers: int = None) -> list[int]:
+    with open(path) as corpus:
+        corpus = json.load(corpus)
+    digests = corpus_digests(corpus, workers)
+    return [number for number, (digest, expected) in enumerate(zip(digests, corpus['digests'])) if digest != expected]
+
+def format_report(results: list[tuple], elapsed: float, show_diffs: int = 3) -> str:
+    lines = []
+    counts = {}
+    for _, result, ended, _, _ in results:
+        counts[result] = counts.get(result, 0) + 1
+        counts[ended] = counts.get(ended, 0) + 1
+    lines.append(f"{len(results):,} transcripts in {elapsed:.2f}s: " +
+                 ', '.join(f"{counts[key]:,} {key}" for key in [PASSED, FAILED, MISSING, RECORDED] if key in counts) +
+                 " (" + ', '.join(f"{counts[key]:,} {key}" for key in [COMPLETED, EXITED, EXHAUSTED] if key in counts) + ")")
+    for path, result, _, diff, _ in [each for each in results if each[1] == FAILED][:show_diffs]:
+        lines.append(f"FAILED {path}\n{diff}")
+
+    lines.append("Latency per prompt (menu code between the answer and the next prompt):")
+    latency = merge_latency(results)
+    for prompt, (count, total, most) in sorted(latency.items(), key=lambda item: -item[1][1] / item[1][0]):
+        lines.append(f"    {total / count * 1e6:9.1f} us mean {most * 1e6:9.1f} us max {count:>9,}x  {prompt[:60]}")
+    return '\n'.join(lines)
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Play recorded input through the interactive game and compare the output')
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, text in [('check', 'compare every transcript against its golden file'),
+                       ('record', 'write (or overwrite) the golden files')]:
+        command = commands.add_parser(name, help=text)
+        command.add_argument('directory')
+        command.add_argument('--workers', type=int, help='processes to run on (default: all cores)')
+        command.add_argument('--diffs', type=int, default=3, help='failed transcripts to show the diff of')
+    command = commands.add_parser('generate', help='write random sessions to a directory')
+    command.add_argument('directory')
+    command.add_argument('--count', type=int, default=1000)
+    command.add_argument('--seed', type=int, default=0)
+    command.add_argument('--length', type=int, default=300, help='lines typed after the players are set up')
+    command = commands.add_parser('check-corpus', help="compare a corpus file's sessions against their digests")
+    command.add_argument('corpus', nargs='?', default=CORPUS)
+    command.add_argument('--workers', type=int, help='processes to run on (default: all cores)')
+    command = commands.add_parser('record-corpus', help='generate sessions and write (or overwrite) a corpus file of them')
+    command.add_argument('corpus', nargs='?', default=CORPUS)
+    command.add_argument('--count', type=int, default=1000)
+    command.add_argument('--seed', type=int, default=0)
+    command.add_argument('--length', type=int, default=300, help='lines typed after the players are set up')
+    command.add_argument('--workers', type=int, help='processes to run on (default: all cores)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        generate(args.directory, args.count, args.seed, args.length)
+        return 0
+    if args.command == 'record-corpus':
+        record_corpus(args.corpus, args.count, args.seed, args.length, args.workers)
+        print(f"recorded {args.count:,} sessions to {args.corpus}")
+        return 0
+    if args.command == 'check-corpus':
+        start = time.perf_counter()
+        failed = check_corpus(args.corpus, args.workers)
+        with open(args.corpus) as corpus:
+            corpus = json.load(corpus)
+        print(f"{corpus['count']:,} sessions in {time.perf_counter() - start:.2f}s: " +
+              f"{corpus['count'] - len(failed):,} passed, {len(failed):,} failed")
+        if failed:
+            print("failed: " + ', '.join(f'session{number:05}' for number in failed[:20]) + (' ...' if len(failed) > 20 else ''))
+            print(f"python transcripts.py generate <directory> --count {corpus['count']} --seed {corpus['seed']} " +
+                  f"--length {corpus['length']} writes them out")
+        return 1 if failed else 0
+
+    start = time.perf_counter()
+    results = run_directory(args.directory, args.command == 'record', args.workers)
+    print(format_report(results, time.perf_counter() - start, args.diffs))
+    return 1 if any(result in (FAILED, MISSING) for _, result, _, _, _ in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())